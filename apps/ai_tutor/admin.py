@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import AiConversation, AiMessage, AiMessageFeedback
+from .models import AiContextSnapshot, AiConversation, AiMessage, AiMessageFeedback
 
 
 @admin.register(AiConversation)
@@ -15,6 +15,13 @@ class AiMessageAdmin(admin.ModelAdmin):
     list_display = ('id', 'conversation', 'role', 'provider_name', 'model_name', 'created_at')
     search_fields = ('conversation__user__email', 'content')
     list_filter = ('role', 'provider_name', 'model_name')
+    raw_id_fields = ('conversation', 'context')
+
+
+@admin.register(AiContextSnapshot)
+class AiContextSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('digest', 'created_at')
+    search_fields = ('digest',)
 
 
 @admin.register(AiMessageFeedback)
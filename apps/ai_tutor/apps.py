@@ -5,3 +5,6 @@ class AiTutorConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.ai_tutor'
     verbose_name = 'AI Tutor'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,245 @@
+import re
+import threading
+import unicodedata
+import uuid
+from collections import deque
+
+from django.contrib.gis.db.models.functions import PointOnSurface
+from django.core.cache import cache
+
+from apps.gis_data.models import Boundary, PointOfInterest, VietnamProvince
+
+
+GAZETTEER_VERSION_KEY = 'ai_tutor:gazetteer-version'
+
+# Names shorter than this are too ambiguous to match inside free text; the
+# curated aliases below are exempt.
+MIN_NAME_LENGTH = 3
+
+ADMINISTRATIVE_PREFIXES = ('thanh pho ', 'tinh ', 'quan ', 'huyen ', 'thi xa ', 'phuong ', 'xa ')
+
+PLACE_ZOOM = {'province': 7.5, 'boundary': 9.5, 'point': 12}
+
+# Hand-tuned places outside the GIS tables; they win over database names that
+# normalize to the same alias.
+PLACE_ACTION_LOOKUP = [
+    {
+        'aliases': ['my', 'm?', 'hoa ky', 'hoa k?', 'united states', 'usa', 'us'],
+        'coordinates': [-98.5795, 39.8283],
+        'zoom': 3.6,
+        'title': 'Hoa K?',
+        'description': 'Hoa K? n?m ? B?c M?, gi?a ??i T?y D??ng v? Th?i B?nh D??ng.',
+    },
+    {
+        'aliases': ['viet nam', 'vi?t nam', 'vn'],
+        'coordinates': [105.83416, 21.027764],
+        'zoom': 5.2,
+        'title': 'Vi?t Nam',
+        'description': 'Vi?t Nam n?m ? r?a ph?a ??ng b?n ??o ??ng D??ng, thu?c ??ng Nam ?.',
+    },
+    {
+        'aliases': ['nhat ban', 'nh?t b?n', 'japan'],
+        'coordinates': [138.2529, 36.2048],
+        'zoom': 4.6,
+        'title': 'Nh?t B?n',
+        'description': 'Nh?t B?n l? qu?c gia qu?n ??o ? ??ng ?, n?m ph?a ??ng b?n ??o Tri?u Ti?n.',
+    },
+    {
+        'aliases': ['trung quoc', 'trung qu?c', 'china'],
+        'coordinates': [104.1954, 35.8617],
+        'zoom': 3.8,
+        'title': 'Trung Qu?c',
+        'description': 'Trung Qu?c n?m ? ??ng ? v? c? di?n t?ch r?t l?n tr?n l?c ??a ? - ?u.',
+    },
+    {
+        'aliases': ['ha noi', 'h? n?i', 'hanoi'],
+        'coordinates': [105.83416, 21.027764],
+        'zoom': 8.4,
+        'title': 'H? N?i',
+        'description': 'H? N?i l? th? ?? c?a Vi?t Nam, n?m ? ??ng b?ng s?ng H?ng.',
+    },
+    {
+        'aliases': ['th?nh ph? h? ch? minh', 'tp.hcm', 'tphcm', 's?i g?n', 'sai gon', 'ho chi minh city'],
+        'coordinates': [106.6297, 10.8231],
+        'zoom': 8.2,
+        'title': 'Th?nh ph? H? Ch? Minh',
+        'description': 'Th?nh ph? H? Ch? Minh n?m ? ??ng Nam B? v? l? trung t?m kinh t? l?n c?a Vi?t Nam.',
+    },
+]
+
+
+def normalize_lookup_text(value):
+    if not value:
+        return ''
+    normalized = unicodedata.normalize('NFD', str(value).lower())
+    normalized = ''.join(char for char in normalized if unicodedata.category(char) != 'Mn')
+    normalized = normalized.replace('\u0111', 'd').replace('\u0110', 'd')
+    return re.sub(r'\s+', ' ', normalized).strip()
+
+
+class Gazetteer:
+    """
+    Aho–Corasick automaton over normalized place names.
+
+    ``match`` finds every known name in a message in a single pass over its
+    characters, independent of how many names are loaded. A hit only counts
+    when it sits on word boundaries, so ``"an"`` never matches inside
+    ``"nam"``.
+    """
+
+    def __init__(self, places):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        self.size = 0
+
+        for place in places:
+            for alias in place['aliases']:
+                self._add(alias, place)
+        self._link()
+
+    def _add(self, alias, place):
+        state = 0
+        for char in alias:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        if not self._output[state]:
+            self._output[state].append((len(alias), place))
+            self.size += 1
+
+    def _link(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def find_all(self, text):
+        """Yield ``(start, end, place)`` for every name in normalized ``text``."""
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for length, place in self._output[state]:
+                start = index - length + 1
+                if _is_boundary(text, start - 1) and _is_boundary(text, index + 1):
+                    yield start, index + 1, place
+
+    def match(self, text):
+        """The longest place name in ``text``, the leftmost on ties."""
+        best = None
+        for start, end, place in self.find_all(text):
+            if best is None or (end - start, -start) > (best[1] - best[0], -best[0]):
+                best = (start, end, place)
+        return best[2] if best else None
+
+
+def _is_boundary(text, index):
+    return index < 0 or index >= len(text) or not text[index].isalnum()
+
+
+def _aliases(*names):
+    aliases = []
+    for name in names:
+        alias = normalize_lookup_text(name)
+        if not alias:
+            continue
+        aliases.append(alias)
+        for prefix in ADMINISTRATIVE_PREFIXES:
+            if alias.startswith(prefix) and len(alias) - len(prefix) >= MIN_NAME_LENGTH:
+                aliases.append(alias[len(prefix):])
+                break
+    return [alias for alias in aliases if len(alias) >= MIN_NAME_LENGTH]
+
+
+def _place(kind, title, aliases, point, description=''):
+    return {
+        'title': title,
+        'aliases': aliases,
+        'coordinates': [round(point.x, 6), round(point.y, 6)],
+        'zoom': PLACE_ZOOM[kind],
+        'description': description,
+    }
+
+
+def load_places():
+    """Curated places first, then provinces, boundaries and points of interest."""
+    places = [
+        {**entry, 'aliases': [normalize_lookup_text(alias) for alias in entry['aliases']]}
+        for entry in PLACE_ACTION_LOOKUP
+    ]
+
+    provinces = (
+        VietnamProvince.objects.annotate(point=PointOnSurface('geometry'))
+        .order_by('name')
+        .values_list('name', 'name_en', 'point')
+    )
+    for name, name_en, point in provinces:
+        places.append(_place('province', name, _aliases(name, name_en), point))
+
+    boundaries = (
+        Boundary.objects.filter(geometry__isnull=False)
+        .annotate(point=PointOnSurface('geometry'))
+        .order_by('name')
+        .values_list('name', 'point')
+    )
+    for name, point in boundaries:
+        places.append(_place('boundary', name, _aliases(name), point))
+
+    points = (
+        PointOfInterest.objects.filter(geometry__isnull=False)
+        .order_by('name')
+        .values_list('name', 'description', 'geometry')
+    )
+    for name, description, point in points:
+        places.append(_place('point', name, _aliases(name), point, description))
+
+    return places
+
+
+_state_lock = threading.Lock()
+_gazetteer = None
+_gazetteer_version = None
+
+
+def _current_version():
+    version = cache.get(GAZETTEER_VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.add(GAZETTEER_VERSION_KEY, version, timeout=None)
+        version = cache.get(GAZETTEER_VERSION_KEY, version)
+    return version
+
+
+def get_gazetteer():
+    """
+    Process-wide gazetteer, rebuilt when the shared version token changes so
+    every worker picks up place edits without a restart.
+    """
+    global _gazetteer, _gazetteer_version
+    version = _current_version()
+    if _gazetteer is not None and _gazetteer_version == version:
+        return _gazetteer
+
+    with _state_lock:
+        if _gazetteer is None or _gazetteer_version != version:
+            _gazetteer = Gazetteer(load_places())
+            _gazetteer_version = version
+    return _gazetteer
+
+
+def invalidate_gazetteer():
+    """Make every process rebuild its gazetteer on next use."""
+    cache.set(GAZETTEER_VERSION_KEY, uuid.uuid4().hex, timeout=None)
@@ -0,0 +1,132 @@
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+LIMIT_PREFIX = 'ai_tutor:limit'
+INFLIGHT_CALLS_KEY = f'{LIMIT_PREFIX}:inflight-calls'
+
+
+class AiTutorRateLimited(Exception):
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = max(int(math.ceil(retry_after)), 1)
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+def _interval_ms(rate_per_minute):
+    return max(60000 // rate_per_minute, 1)
+
+
+def _take_token(key, rate_per_minute, burst):
+    """
+    Take one token from a token bucket kept in the shared cache.
+
+    The bucket is stored as its "theoretical arrival time" (GCRA): every
+    request atomically pushes it forward by one emission interval with
+    ``cache.incr``, and the request is allowed while it stays within
+    ``burst`` intervals of now. Returns 0 when allowed, otherwise the seconds
+    until a token is available (the push is undone).
+    """
+    interval = _interval_ms(rate_per_minute)
+    now = _now_ms()
+    if cache.add(key, now + interval, timeout=math.ceil(interval / 1000) + 1):
+        return 0
+
+    try:
+        arrival = cache.incr(key, interval)
+    except ValueError:
+        # Expired between add() and incr(): the bucket is full again
+        cache.set(key, now + interval, timeout=math.ceil(interval / 1000) + 1)
+        return 0
+
+    if arrival - interval < now:
+        # Idle long enough to refill completely; restart from now
+        cache.set(key, now + interval, timeout=math.ceil(interval / 1000) + 1)
+        return 0
+
+    wait = arrival - now - burst * interval
+    if wait > 0:
+        cache.decr(key, interval)
+        return wait / 1000
+
+    cache.touch(key, math.ceil((arrival - now) / 1000) + 1)
+    return 0
+
+
+def _refund_token(key, rate_per_minute):
+    try:
+        cache.decr(key, _interval_ms(rate_per_minute))
+    except ValueError:
+        pass
+
+
+def check_rate_limits(user, classroom=None):
+    """
+    Spend one token from the user's bucket and, for classroom conversations,
+    from the classroom's. Raises AiTutorRateLimited without spending anything
+    when either bucket is empty.
+    """
+    buckets = [(
+        f'{LIMIT_PREFIX}:user:{user.pk}',
+        settings.AI_TUTOR_USER_RATE_PER_MINUTE,
+        settings.AI_TUTOR_USER_BURST,
+        'Em đang hỏi hơi nhanh, hãy thử lại sau ít giây.',
+    )]
+    if classroom is not None:
+        buckets.append((
+            f'{LIMIT_PREFIX}:classroom:{classroom.pk}',
+            settings.AI_TUTOR_CLASSROOM_RATE_PER_MINUTE,
+            settings.AI_TUTOR_CLASSROOM_BURST,
+            'Lớp học đang gửi quá nhiều câu hỏi cùng lúc, hãy thử lại sau ít giây.',
+        ))
+
+    taken = []
+    for key, rate, burst, message in buckets:
+        if rate <= 0:
+            continue
+        wait = _take_token(key, rate, burst)
+        if wait:
+            for taken_key, taken_rate in taken:
+                _refund_token(taken_key, taken_rate)
+            raise AiTutorRateLimited(message, wait)
+        taken.append((key, rate))
+
+
+def acquire_provider_slot():
+    """
+    Reserve one of AI_TUTOR_GLOBAL_MAX_INFLIGHT provider calls across all
+    workers, or raise AiTutorRateLimited at once instead of queueing. Pair
+    every successful call with release_provider_slot().
+    """
+    limit = settings.AI_TUTOR_GLOBAL_MAX_INFLIGHT
+    if limit <= 0:
+        return False
+
+    # The TTL only matters if a worker dies holding slots: the counter then
+    # resets once no call has started for that long.
+    timeout = settings.AI_TUTOR_TIMEOUT * (settings.AI_TUTOR_MAX_RETRIES + 1) * 2
+    cache.add(INFLIGHT_CALLS_KEY, 0, timeout=timeout)
+    try:
+        in_flight = cache.incr(INFLIGHT_CALLS_KEY)
+    except ValueError:
+        cache.add(INFLIGHT_CALLS_KEY, 1, timeout=timeout)
+        in_flight = 1
+
+    if in_flight > limit:
+        release_provider_slot()
+        raise AiTutorRateLimited('Trợ giảng AI đang bận, hãy thử lại sau ít giây.', 1)
+    cache.touch(INFLIGHT_CALLS_KEY, timeout)
+    return True
+
+
+def release_provider_slot():
+    try:
+        cache.decr(INFLIGHT_CALLS_KEY)
+    except ValueError:
+        pass
@@ -0,0 +1,27 @@
+"""
+Management command to delete unreferenced AI tutor context snapshots.
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from apps.ai_tutor.services import prune_context_snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete tutor context snapshots no message references any more, e.g. after '
+        'conversations were deleted; run it periodically'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age-hours',
+            type=float,
+            default=24.0,
+            help='Keep snapshots stored or reused within this many hours',
+        )
+
+    def handle(self, *args, **options):
+        deleted = prune_context_snapshots(min_age=timedelta(hours=options['min_age_hours']))
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} unreferenced context snapshots'))
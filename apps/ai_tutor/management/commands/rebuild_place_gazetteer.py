@@ -0,0 +1,18 @@
+"""
+Management command to rebuild the AI tutor place gazetteer.
+"""
+from django.core.management.base import BaseCommand
+
+from apps.ai_tutor.gazetteer import get_gazetteer, invalidate_gazetteer
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the place gazetteer in every worker, e.g. after loading provinces, '
+        'boundaries or points of interest with raw SQL'
+    )
+
+    def handle(self, *args, **options):
+        invalidate_gazetteer()
+        gazetteer = get_gazetteer()
+        self.stdout.write(self.style.SUCCESS(f'Gazetteer rebuilt with {gazetteer.size} place names'))
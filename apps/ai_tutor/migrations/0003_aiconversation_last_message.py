@@ -0,0 +1,41 @@
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef, Subquery
+from django.db.models.functions import Left
+
+
+def backfill_last_message(apps, schema_editor):
+    AiConversation = apps.get_model('ai_tutor', 'AiConversation')
+    AiMessage = apps.get_model('ai_tutor', 'AiMessage')
+
+    last = AiMessage.objects.filter(conversation=OuterRef('pk')).order_by('-created_at', '-id')
+    AiConversation.objects.filter(Exists(last)).update(
+        last_message_role=Subquery(last.values('role')[:1]),
+        last_message_preview=Subquery(last.annotate(preview=Left('content', 200)).values('preview')[:1]),
+        last_message_at=Subquery(last.values('created_at')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_tutor', '0002_aiconversation_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aiconversation',
+            name='last_message_role',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='aiconversation',
+            name='last_message_preview',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='aiconversation',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_last_message, migrations.RunPython.noop),
+    ]
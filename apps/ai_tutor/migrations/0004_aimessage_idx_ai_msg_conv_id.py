@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_tutor', '0003_aiconversation_last_message'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='aimessage',
+            index=models.Index(fields=['conversation', 'id'], name='idx_ai_msg_conv_id'),
+        ),
+    ]
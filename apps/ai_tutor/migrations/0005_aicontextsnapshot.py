@@ -0,0 +1,87 @@
+import hashlib
+import json
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+BATCH_SIZE = 2000
+
+
+def snapshot_digest(payload):
+    # Same canonical form as services.context_fingerprint, frozen here
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def backfill_snapshots(apps, schema_editor):
+    AiContextSnapshot = apps.get_model('ai_tutor', 'AiContextSnapshot')
+    AiMessage = apps.get_model('ai_tutor', 'AiMessage')
+
+    last_id = 0
+    while True:
+        rows = list(
+            AiMessage.objects.filter(id__gt=last_id)
+            .exclude(context_snapshot={})
+            .order_by('id')
+            .values_list('id', 'context_snapshot')[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        snapshots = {}
+        messages = []
+        for message_id, payload in rows:
+            digest = snapshot_digest(payload)
+            snapshots.setdefault(digest, payload)
+            messages.append(AiMessage(id=message_id, context_id=digest))
+
+        AiContextSnapshot.objects.bulk_create(
+            [AiContextSnapshot(digest=digest, payload=payload) for digest, payload in snapshots.items()],
+            ignore_conflicts=True,
+        )
+        AiMessage.objects.bulk_update(messages, ['context'])
+
+
+def restore_snapshots(apps, schema_editor):
+    AiMessage = apps.get_model('ai_tutor', 'AiMessage')
+
+    messages = AiMessage.objects.filter(context__isnull=False).select_related('context')
+    for message in messages.iterator(chunk_size=BATCH_SIZE):
+        message.context_snapshot = message.context.payload
+        message.save(update_fields=['context_snapshot'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_tutor', '0004_aimessage_idx_ai_msg_conv_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AiContextSnapshot',
+            fields=[
+                ('digest', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('payload', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'ai_context_snapshots',
+            },
+        ),
+        migrations.AddField(
+            model_name='aimessage',
+            name='context',
+            field=models.ForeignKey(
+                blank=True,
+                db_column='context_digest',
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name='messages',
+                to='ai_tutor.aicontextsnapshot',
+            ),
+        ),
+        migrations.RunPython(backfill_snapshots, restore_snapshots),
+    ]
@@ -0,0 +1,17 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # Separate from 0005 so the column is dropped outside the transaction that
+    # wrote the deferred foreign key checks of the backfill.
+
+    dependencies = [
+        ('ai_tutor', '0005_aicontextsnapshot'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='aimessage',
+            name='context_snapshot',
+        ),
+    ]
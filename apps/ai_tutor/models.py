@@ -34,6 +34,11 @@ class AiConversation(models.Model):
     semester = models.CharField(max_length=10)
     textbook_series = models.CharField(max_length=50)
     module_code = models.CharField(max_length=30, blank=True)
+    summary = models.TextField(blank=True, default='')
+    summarized_message_id = models.BigIntegerField(null=True, blank=True)
+    last_message_role = models.CharField(max_length=20, blank=True)
+    last_message_preview = models.CharField(max_length=200, blank=True)
+    last_message_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -49,6 +54,20 @@ class AiConversation(models.Model):
         return self.title or f'Conversation {self.pk}'
 
 
+class AiContextSnapshot(models.Model):
+    """Tutor context sent with a message, stored once per distinct content."""
+
+    digest = models.CharField(max_length=64, primary_key=True)
+    payload = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'ai_context_snapshots'
+
+    def __str__(self):
+        return self.digest[:12]
+
+
 class AiMessage(models.Model):
     ROLE_CHOICES = [
         ('system', 'System'),
@@ -63,7 +82,14 @@ class AiMessage(models.Model):
     )
     role = models.CharField(max_length=20, choices=ROLE_CHOICES)
     content = models.TextField()
-    context_snapshot = models.JSONField(default=dict, blank=True)
+    context = models.ForeignKey(
+        AiContextSnapshot,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='messages',
+        db_column='context_digest',
+    )
     guardrail_flags = models.JSONField(default=list, blank=True)
     model_name = models.CharField(max_length=100, blank=True)
     provider_name = models.CharField(max_length=100, blank=True)
@@ -74,6 +100,7 @@ class AiMessage(models.Model):
         ordering = ['created_at']
         indexes = [
             models.Index(fields=['conversation', 'created_at'], name='idx_ai_msg_conv_created'),
+            models.Index(fields=['conversation', 'id'], name='idx_ai_msg_conv_id'),
         ]
 
     def __str__(self):
@@ -1,14 +1,190 @@
+import asyncio
 import json
-import socket
-from urllib import error, request
+import random
+import threading
+import time
+import weakref
 
+import httpx
 from django.conf import settings
 
 
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
 class AiProviderError(Exception):
     pass
 
 
+class AiProviderUnavailable(AiProviderError):
+    """Raised without calling the provider while its circuit is open or the pool is saturated."""
+
+
+class CircuitBreaker:
+    """
+    Per-process circuit breaker for the provider endpoint.
+
+    After ``failure_threshold`` consecutive failed calls the circuit opens and
+    calls fail fast for ``reset_timeout`` seconds. The first call after that
+    is let through as a probe: success closes the circuit, failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def before_call(self):
+        """Raise AiProviderUnavailable while open; returns True when this call is the probe."""
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+            if remaining > 0 or self._probing:
+                raise AiProviderUnavailable(
+                    f'AI provider temporarily unavailable, retry in {max(int(remaining), 1)}s'
+                )
+            self._probing = True
+            return True
+
+    def end_probe(self):
+        """
+        Called once the probe has finished, however it ended. A probe that
+        raised before recording an outcome counts as a failure, so the circuit
+        re-opens instead of staying half-open for good.
+        """
+        with self._lock:
+            if self._probing:
+                self._probing = False
+                self._opened_at = time.monotonic()
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+
+_state_lock = threading.Lock()
+_http_client = None
+_concurrency = None
+_breakers = {}
+
+
+def _client_options():
+    try:
+        import h2  # noqa: F401
+        http2 = settings.AI_TUTOR_HTTP2
+    except ImportError:
+        http2 = False
+    return {
+        'http2': http2,
+        'limits': httpx.Limits(
+            max_connections=settings.AI_TUTOR_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.AI_TUTOR_MAX_CONNECTIONS,
+            keepalive_expiry=30,
+        ),
+        'timeout': httpx.Timeout(settings.AI_TUTOR_TIMEOUT, connect=settings.AI_TUTOR_CONNECT_TIMEOUT),
+    }
+
+
+def _get_http_client():
+    """Process-wide pooled client; connections are kept alive between messages."""
+    global _http_client
+    if _http_client is None:
+        with _state_lock:
+            if _http_client is None:
+                _http_client = httpx.Client(**_client_options())
+    return _http_client
+
+
+# httpx.AsyncClient and asyncio.Semaphore belong to the event loop that
+# created them, so async views get one pool per loop (one per ASGI worker).
+_async_state = weakref.WeakKeyDictionary()
+
+
+def _get_async_state():
+    loop = asyncio.get_running_loop()
+    state = _async_state.get(loop)
+    if state is None:
+        state = _async_state[loop] = (
+            httpx.AsyncClient(**_client_options()),
+            asyncio.Semaphore(settings.AI_TUTOR_MAX_CONCURRENCY),
+        )
+    return state
+
+
+def _get_concurrency_limit():
+    global _concurrency
+    if _concurrency is None:
+        with _state_lock:
+            if _concurrency is None:
+                _concurrency = threading.BoundedSemaphore(settings.AI_TUTOR_MAX_CONCURRENCY)
+    return _concurrency
+
+
+def _get_breaker(base_url):
+    with _state_lock:
+        breaker = _breakers.get(base_url)
+        if breaker is None:
+            breaker = _breakers[base_url] = CircuitBreaker(
+                settings.AI_TUTOR_CIRCUIT_FAILURE_THRESHOLD,
+                settings.AI_TUTOR_CIRCUIT_RESET_TIMEOUT,
+            )
+        return breaker
+
+
+def reset_provider_state():
+    """Close the pooled client and forget breaker state (tests, settings changes)."""
+    global _http_client, _concurrency
+    with _state_lock:
+        if _http_client is not None:
+            _http_client.close()
+        _http_client = None
+        _concurrency = None
+        _async_state.clear()
+        _breakers.clear()
+
+
+def _retry_delay(attempt, response=None):
+    """Full-jitter exponential backoff, honouring a numeric Retry-After when given."""
+    cap = settings.AI_TUTOR_RETRY_BACKOFF_MAX
+    if response is not None:
+        try:
+            return min(float(response.headers['Retry-After']), cap)
+        except (KeyError, ValueError):
+            pass
+    return random.uniform(0, min(cap, settings.AI_TUTOR_RETRY_BACKOFF * (2 ** attempt)))
+
+
+def max_call_seconds():
+    """
+    Longest one chat call can legitimately take: waiting for a pool slot,
+    every attempt running into its connect and read timeouts, and the
+    longest backoff between attempts.
+    """
+    attempts = settings.AI_TUTOR_MAX_RETRIES + 1
+    return (
+        settings.AI_TUTOR_QUEUE_TIMEOUT
+        + attempts * (settings.AI_TUTOR_CONNECT_TIMEOUT + settings.AI_TUTOR_TIMEOUT)
+        + settings.AI_TUTOR_MAX_RETRIES * settings.AI_TUTOR_RETRY_BACKOFF_MAX
+    )
+
+
 class AiProviderClient:
     def __init__(self):
         self.base_url = settings.AI_TUTOR_BASE_URL.rstrip('/')
@@ -16,8 +192,9 @@ class AiProviderClient:
         self.model = settings.AI_TUTOR_MODEL
         self.provider_name = settings.AI_TUTOR_PROVIDER_NAME
         self.timeout = settings.AI_TUTOR_TIMEOUT
+        self.max_retries = settings.AI_TUTOR_MAX_RETRIES
 
-    def chat(self, messages):
+    def _payload(self, messages, stream=False):
         if not self.api_key:
             raise AiProviderError('AI_TUTOR_API_KEY is not configured')
 
@@ -26,29 +203,243 @@ class AiProviderClient:
             'messages': messages,
             'temperature': 0.4,
         }
-        req = request.Request(
-            url=f'{self.base_url}/chat/completions',
-            data=json.dumps(payload).encode('utf-8'),
-            headers={
-                'Content-Type': 'application/json',
-                'Authorization': f'Bearer {self.api_key}',
-            },
-            method='POST',
+        if stream:
+            payload['stream'] = True
+        return payload
+
+    def _headers(self, stream=False):
+        return {
+            'Content-Type': 'application/json',
+            'Authorization': f'Bearer {self.api_key}',
+            'Accept': 'text/event-stream' if stream else 'application/json',
+        }
+
+    def _send(self, payload, stream=False):
+        """
+        Send a completion request through the shared pool.
+
+        Retries 429/5xx responses and connection failures with jittered
+        backoff, and feeds the outcome to the circuit breaker. Returns an
+        open response with a 2xx status; the caller must close it.
+        """
+        client = _get_http_client()
+        request = client.build_request(
+            'POST',
+            f'{self.base_url}/chat/completions',
+            content=json.dumps(payload).encode('utf-8'),
+            headers=self._headers(stream),
         )
+        breaker = _get_breaker(self.base_url)
+        is_probe = breaker.before_call()
+
+        try:
+            for attempt in range(self.max_retries + 1):
+                is_last = attempt == self.max_retries
+                try:
+                    response = client.send(request, stream=True)
+                except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout, httpx.RemoteProtocolError) as exc:
+                    if is_last:
+                        breaker.record_failure()
+                        raise AiProviderError(f'AI provider unavailable: {exc}') from exc
+                    time.sleep(_retry_delay(attempt))
+                    continue
+                except httpx.TimeoutException as exc:
+                    # A read timeout means the provider is alive but slow; retrying
+                    # would only double the wait.
+                    breaker.record_failure()
+                    raise AiProviderError('AI provider timed out') from exc
+                except httpx.HTTPError as exc:
+                    breaker.record_failure()
+                    raise AiProviderError(f'AI provider unavailable: {exc}') from exc
+
+                if response.status_code < 400:
+                    breaker.record_success()
+                    return response
+
+                response.read()
+                response.close()
+                if response.status_code in RETRYABLE_STATUS_CODES and not is_last:
+                    time.sleep(_retry_delay(attempt, response))
+                    continue
+
+                if response.status_code in RETRYABLE_STATUS_CODES:
+                    breaker.record_failure()
+                else:
+                    # Client errors (bad key, bad payload) say nothing about provider health
+                    breaker.record_success()
+                raise AiProviderError(f'AI provider returned HTTP {response.status_code}: {response.text}')
+        finally:
+            if is_probe:
+                breaker.end_probe()
+
+    def _acquire_slot(self):
+        slot = _get_concurrency_limit()
+        if not slot.acquire(timeout=settings.AI_TUTOR_QUEUE_TIMEOUT):
+            raise AiProviderUnavailable('AI provider is busy, please retry shortly')
+        return slot
+
+    def chat(self, messages):
+        payload = self._payload(messages)
 
+        slot = self._acquire_slot()
         try:
-            with request.urlopen(req, timeout=self.timeout) as response:
+            response = self._send(payload)
+            try:
                 body = json.loads(response.read().decode('utf-8'))
-        except error.HTTPError as exc:
-            detail = exc.read().decode('utf-8', errors='ignore')
-            raise AiProviderError(f'AI provider returned HTTP {exc.code}: {detail}') from exc
-        except (error.URLError, socket.timeout) as exc:
-            reason = getattr(exc, 'reason', str(exc))
-            raise AiProviderError(f'AI provider unavailable: {reason}') from exc
-        except (json.JSONDecodeError, TimeoutError) as exc:
-            raise AiProviderError('AI provider returned malformed response') from exc
+            except httpx.HTTPError as exc:
+                raise AiProviderError('AI provider connection dropped mid-response') from exc
+            except json.JSONDecodeError as exc:
+                raise AiProviderError('AI provider returned malformed response') from exc
+            finally:
+                response.close()
+        finally:
+            slot.release()
+
+        try:
+            return body['choices'][0]['message']['content']
+        except (KeyError, IndexError, TypeError) as exc:
+            raise AiProviderError('AI provider response missing assistant content') from exc
+
+    def stream_chat(self, messages):
+        """Yield assistant content deltas from a ``stream: true`` completion."""
+        payload = self._payload(messages, stream=True)
+
+        slot = self._acquire_slot()
+        try:
+            response = self._send(payload, stream=True)
+            try:
+                for line in response.iter_lines():
+                    delta = _parse_stream_line(line)
+                    if delta is _STREAM_DONE:
+                        return
+                    if delta:
+                        yield delta
+            except httpx.TimeoutException as exc:
+                raise AiProviderError('AI provider timed out') from exc
+            except httpx.HTTPError as exc:
+                raise AiProviderError(f'AI provider unavailable: {exc}') from exc
+            finally:
+                response.close()
+        finally:
+            slot.release()
+
+    # Async counterparts for ASGI views: same retries, breaker and limits, but
+    # waiting on the provider never holds a thread.
+
+    async def _asend(self, client, payload, stream=False):
+        request = client.build_request(
+            'POST',
+            f'{self.base_url}/chat/completions',
+            content=json.dumps(payload).encode('utf-8'),
+            headers=self._headers(stream),
+        )
+        breaker = _get_breaker(self.base_url)
+        is_probe = breaker.before_call()
+
+        try:
+            for attempt in range(self.max_retries + 1):
+                is_last = attempt == self.max_retries
+                try:
+                    response = await client.send(request, stream=True)
+                except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout, httpx.RemoteProtocolError) as exc:
+                    if is_last:
+                        breaker.record_failure()
+                        raise AiProviderError(f'AI provider unavailable: {exc}') from exc
+                    await asyncio.sleep(_retry_delay(attempt))
+                    continue
+                except httpx.TimeoutException as exc:
+                    breaker.record_failure()
+                    raise AiProviderError('AI provider timed out') from exc
+                except httpx.HTTPError as exc:
+                    breaker.record_failure()
+                    raise AiProviderError(f'AI provider unavailable: {exc}') from exc
+
+                if response.status_code < 400:
+                    breaker.record_success()
+                    return response
+
+                await response.aread()
+                await response.aclose()
+                if response.status_code in RETRYABLE_STATUS_CODES and not is_last:
+                    await asyncio.sleep(_retry_delay(attempt, response))
+                    continue
+
+                if response.status_code in RETRYABLE_STATUS_CODES:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                raise AiProviderError(f'AI provider returned HTTP {response.status_code}: {response.text}')
+        finally:
+            if is_probe:
+                breaker.end_probe()
+
+    async def _aacquire_slot(self, semaphore):
+        try:
+            await asyncio.wait_for(semaphore.acquire(), settings.AI_TUTOR_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError as exc:
+            raise AiProviderUnavailable('AI provider is busy, please retry shortly') from exc
+
+    async def achat(self, messages):
+        payload = self._payload(messages)
+        client, semaphore = _get_async_state()
+
+        await self._aacquire_slot(semaphore)
+        try:
+            response = await self._asend(client, payload)
+            try:
+                body = json.loads((await response.aread()).decode('utf-8'))
+            except httpx.HTTPError as exc:
+                raise AiProviderError('AI provider connection dropped mid-response') from exc
+            except json.JSONDecodeError as exc:
+                raise AiProviderError('AI provider returned malformed response') from exc
+            finally:
+                await response.aclose()
+        finally:
+            semaphore.release()
 
         try:
             return body['choices'][0]['message']['content']
         except (KeyError, IndexError, TypeError) as exc:
             raise AiProviderError('AI provider response missing assistant content') from exc
+
+    async def astream_chat(self, messages):
+        """Async iterator over assistant content deltas."""
+        payload = self._payload(messages, stream=True)
+        client, semaphore = _get_async_state()
+
+        await self._aacquire_slot(semaphore)
+        try:
+            response = await self._asend(client, payload, stream=True)
+            try:
+                async for line in response.aiter_lines():
+                    delta = _parse_stream_line(line)
+                    if delta is _STREAM_DONE:
+                        return
+                    if delta:
+                        yield delta
+            except httpx.TimeoutException as exc:
+                raise AiProviderError('AI provider timed out') from exc
+            except httpx.HTTPError as exc:
+                raise AiProviderError(f'AI provider unavailable: {exc}') from exc
+            finally:
+                await response.aclose()
+        finally:
+            semaphore.release()
+
+
+_STREAM_DONE = object()
+
+
+def _parse_stream_line(line):
+    """The content delta of one SSE line, None for other lines, or _STREAM_DONE."""
+    line = line.strip()
+    if not line.startswith('data:'):
+        return None
+    data = line[len('data:'):].strip()
+    if data == '[DONE]':
+        return _STREAM_DONE
+    try:
+        delta = json.loads(data)['choices'][0].get('delta') or {}
+    except (json.JSONDecodeError, KeyError, IndexError, TypeError, AttributeError) as exc:
+        raise AiProviderError('AI provider returned malformed stream chunk') from exc
+    return delta.get('content')
@@ -10,7 +10,6 @@ class AiMessageSerializer(serializers.ModelSerializer):
             'id',
             'role',
             'content',
-            'context_snapshot',
             'guardrail_flags',
             'model_name',
             'provider_name',
@@ -37,19 +36,16 @@ class AiConversationListSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
     def get_last_message(self, obj):
-        message = obj.messages.order_by('-created_at').first()
-        if not message:
+        if not obj.last_message_at:
             return None
         return {
-            'role': message.role,
-            'content': message.content,
-            'created_at': message.created_at,
+            'role': obj.last_message_role,
+            'content': obj.last_message_preview,
+            'created_at': obj.last_message_at,
         }
 
 
 class AiConversationDetailSerializer(serializers.ModelSerializer):
-    messages = AiMessageSerializer(many=True, read_only=True)
-
     class Meta:
         model = AiConversation
         fields = (
@@ -63,11 +59,25 @@ class AiConversationDetailSerializer(serializers.ModelSerializer):
             'quiz_id',
             'classroom_id',
             'updated_at',
-            'messages',
         )
         read_only_fields = fields
 
 
+class AiConversationMessagesQuerySerializer(serializers.Serializer):
+    DEFAULT_LIMIT = 50
+    MAX_LIMIT = 200
+
+    before = serializers.IntegerField(required=False, min_value=1, help_text='Return messages older than this message id')
+    after = serializers.IntegerField(required=False, min_value=1, help_text='Return messages newer than this message id')
+    limit = serializers.IntegerField(required=False, default=DEFAULT_LIMIT, min_value=1, max_value=MAX_LIMIT)
+    include_context = serializers.BooleanField(required=False, default=True)
+
+    def validate(self, attrs):
+        if 'before' in attrs and 'after' in attrs:
+            raise serializers.ValidationError('Use either before or after, not both.')
+        return attrs
+
+
 class AiTutorRespondSerializer(serializers.Serializer):
     conversation_id = serializers.IntegerField(required=False, allow_null=True)
     message = serializers.CharField()
@@ -1,11 +1,29 @@
+import asyncio
+import hashlib
+import json
+import math
 import re
-import unicodedata
+import threading
+import time
+import uuid
+import weakref
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Prefetch
+from django.utils import timezone
 
 from apps.classrooms.models import Classroom
 from apps.gis_data.models import MapLayer
-from apps.lessons.models import Lesson
+from apps.lessons.models import Lesson, LessonStep
 from apps.quizzes.models import Quiz
 
+from .gazetteer import get_gazetteer, normalize_lookup_text
+from .models import AiContextSnapshot, AiMessage
+from .providers import max_call_seconds
+
 
 CURRICULUM_GUARDRAILS = {
     'grade_level': '10',
@@ -18,6 +36,24 @@ class AiTutorContextError(Exception):
     pass
 
 
+SUMMARY_VERSION_KEY = 'ai_tutor:summary-version'
+
+
+def _summary_cache_key(kind, *parts):
+    # Every key embeds the current version, so bumping it drops all summaries at once
+    version = cache.get(SUMMARY_VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.add(SUMMARY_VERSION_KEY, version, timeout=None)
+        version = cache.get(SUMMARY_VERSION_KEY, version)
+    return f"ai_tutor:{kind}-summary:{version}:{':'.join(parts)}"
+
+
+def invalidate_curriculum_summaries():
+    """Drop the cached module and semester summaries of every curriculum."""
+    cache.set(SUMMARY_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+
 class AiTutorContextBuilder:
     def __init__(self, user):
         self.user = user
@@ -70,14 +106,17 @@ class AiTutorContextBuilder:
     def _get_lesson(self, lesson_id):
         if not lesson_id:
             return None
-        lesson = Lesson.objects.prefetch_related('steps__map_action', 'layers').filter(id=lesson_id).first()
+        lesson = Lesson.objects.prefetch_related(
+            Prefetch('steps', queryset=LessonStep.objects.select_related('map_action').order_by('order')),
+            'layers',
+        ).filter(id=lesson_id).first()
         self._validate_record_curriculum(lesson)
         return lesson
 
     def _get_quiz(self, quiz_id):
         if not quiz_id:
             return None
-        quiz = Quiz.objects.prefetch_related('questions__answers').filter(id=quiz_id).first()
+        quiz = Quiz.objects.annotate(question_count=Count('questions')).filter(id=quiz_id).first()
         self._validate_record_curriculum(quiz)
         return quiz
 
@@ -106,7 +145,7 @@ class AiTutorContextBuilder:
             raise AiTutorContextError('Ngữ cảnh hiện tại không thuộc bộ Cánh Diều.')
 
     def _lesson_context(self, lesson, lesson_step):
-        steps = list(lesson.steps.all().order_by('order'))
+        steps = list(lesson.steps.all())
         current_step = None
         if lesson_step is not None:
             try:
@@ -145,7 +184,7 @@ class AiTutorContextBuilder:
             'title': quiz.title,
             'description': quiz.description,
             'module_code': quiz.module_code,
-            'question_count': quiz.questions.count(),
+            'question_count': quiz.question_count,
             'question_context': payload.get('question_context') or [],
         }
 
@@ -179,6 +218,20 @@ class AiTutorContextBuilder:
         if not module_code:
             return None
 
+        cache_key = _summary_cache_key(
+            'module',
+            CURRICULUM_GUARDRAILS['grade_level'],
+            CURRICULUM_GUARDRAILS['semester'],
+            CURRICULUM_GUARDRAILS['textbook_series'],
+            module_code,
+        )
+        summary = cache.get(cache_key)
+        if summary is None:
+            summary = self._build_module_summary(module_code)
+            cache.set(cache_key, summary, timeout=settings.AI_TUTOR_SUMMARY_CACHE_TIMEOUT)
+        return summary
+
+    def _build_module_summary(self, module_code):
         lessons = list(
             Lesson.objects.filter(
                 grade_level=CURRICULUM_GUARDRAILS['grade_level'],
@@ -215,11 +268,19 @@ class AiTutorContextBuilder:
         }
 
     def _semester_summary(self, payload):
+        cache_key = _summary_cache_key('semester', payload['grade_level'], payload['semester'], payload['textbook_series'])
+        summary = cache.get(cache_key)
+        if summary is None:
+            summary = self._build_semester_summary(payload['grade_level'], payload['semester'], payload['textbook_series'])
+            cache.set(cache_key, summary, timeout=settings.AI_TUTOR_SUMMARY_CACHE_TIMEOUT)
+        return summary
+
+    def _build_semester_summary(self, grade_level, semester, textbook_series):
         lessons = list(
             Lesson.objects.filter(
-                grade_level=payload['grade_level'],
-                semester=payload['semester'],
-                textbook_series=payload['textbook_series'],
+                grade_level=grade_level,
+                semester=semester,
+                textbook_series=textbook_series,
                 is_published=True,
             ).order_by('module_code', 'id')[:12]
         )
@@ -242,7 +303,155 @@ class AiTutorContextBuilder:
         }
 
 
-def build_prompt(message, used_context):
+# Rough token budget for the context block of the prompt, per tutor mode.
+PROMPT_CONTEXT_BUDGETS = {
+    'lesson_explainer': 700,
+    'map_explainer': 500,
+    'quiz_remediation': 600,
+    'module_summary': 700,
+    'semester_review': 600,
+}
+DEFAULT_PROMPT_CONTEXT_BUDGET = 600
+
+# Context sections per mode, most important first. When the context is over
+# budget, sections are dropped from the end (the first one is always kept).
+PROMPT_CONTEXT_SECTIONS = {
+    'lesson_explainer': ('curriculum', 'lesson', 'map', 'quiz', 'classroom', 'module_summary', 'semester_summary'),
+    'map_explainer': ('curriculum', 'map', 'lesson', 'classroom', 'module_summary', 'quiz', 'semester_summary'),
+    'quiz_remediation': ('curriculum', 'quiz', 'lesson', 'classroom', 'module_summary', 'map', 'semester_summary'),
+    'module_summary': ('curriculum', 'module_summary', 'lesson', 'quiz', 'map', 'classroom', 'semester_summary'),
+    'semester_review': ('curriculum', 'semester_summary', 'module_summary', 'lesson', 'quiz', 'map', 'classroom'),
+}
+
+# Steps kept on each side of the current step when the lesson must be trimmed
+PROMPT_STEP_WINDOW = 2
+
+
+def estimate_tokens(text):
+    # About 3 characters per token for Vietnamese text with diacritics
+    return len(text) // 3 + 1
+
+
+def _prune_empty(value):
+    if isinstance(value, dict):
+        pruned = {key: _prune_empty(item) for key, item in value.items()}
+        return {key: item for key, item in pruned.items() if item is not None} or None
+    if isinstance(value, (list, tuple)):
+        pruned = [_prune_empty(item) for item in value]
+        return [item for item in pruned if item is not None] or None
+    if value is None or value == '':
+        return None
+    return value
+
+
+def _compact_map_action(map_action):
+    if not map_action:
+        return None
+    return {'action_type': map_action.get('action_type'), 'payload': map_action.get('payload')}
+
+
+def _compact_section(name, value):
+    """Keep only what the model can use; database ids are meaningless to it."""
+    if not value:
+        return None
+    if name == 'lesson':
+        current_step = value.get('current_step')
+        return {
+            'title': value.get('title'),
+            'description': value.get('description'),
+            'module_code': value.get('module_code'),
+            'lesson_type': value.get('lesson_type'),
+            'step_count': value.get('step_count'),
+            'current_step': {
+                'order': current_step.get('order'),
+                'popup_text': current_step.get('popup_text'),
+                'map_action': _compact_map_action(current_step.get('map_action')),
+            } if current_step else None,
+            'steps': [f"{step['order']}. {step['popup_text']}" for step in value.get('steps') or []],
+            'layer_names': value.get('layer_names'),
+        }
+    if name == 'quiz':
+        return {key: item for key, item in value.items() if key != 'id'}
+    if name == 'classroom':
+        return {'name': value.get('name'), 'module_code': value.get('module_code')}
+    if name == 'map':
+        return {
+            'active_layers': [
+                {key: item for key, item in layer.items() if key != 'id'}
+                for layer in value.get('active_layers') or []
+            ],
+            'selected_feature': value.get('selected_feature'),
+            'map_state': value.get('map_state'),
+        }
+    if name == 'module_summary':
+        return {
+            **value,
+            'lessons': [
+                {key: item for key, item in lesson.items() if key != 'id'}
+                for lesson in value.get('lessons') or []
+            ],
+        }
+    return value
+
+
+def _trim_lesson_steps(lesson):
+    steps = lesson.get('steps')
+    if not steps:
+        return lesson
+    current_order = (lesson.get('current_step') or {}).get('order')
+    if current_order is None:
+        kept = steps[:PROMPT_STEP_WINDOW + 1]
+    else:
+        kept = [
+            step for step in steps
+            if abs(int(step.split('.', 1)[0]) - current_order) <= PROMPT_STEP_WINDOW
+        ]
+    return {**lesson, 'steps': kept or None}
+
+
+def _context_text(sections):
+    return '\n'.join(
+        f'{name}: {json.dumps(value, ensure_ascii=False, separators=(",", ":"))}'
+        for name, value in sections
+    )
+
+
+def compact_context(used_context, budget=None):
+    """
+    Serialize ``used_context`` for the prompt.
+
+    Emits one ``section: {compact json}`` line per non-empty section in the
+    mode's priority order, without ids, empty fields or the mode (already
+    stated in the system prompt). If the result exceeds the mode's token
+    budget, lesson steps are narrowed to the current step's neighbourhood
+    and then the least important sections are dropped.
+    """
+    mode = used_context.get('mode')
+    budget = budget or PROMPT_CONTEXT_BUDGETS.get(mode, DEFAULT_PROMPT_CONTEXT_BUDGET)
+    order = PROMPT_CONTEXT_SECTIONS.get(mode, PROMPT_CONTEXT_SECTIONS['semester_review'])
+
+    sections = []
+    for name in order:
+        value = _prune_empty(_compact_section(name, used_context.get(name)))
+        if value is not None:
+            sections.append((name, value))
+
+    text = _context_text(sections)
+    if estimate_tokens(text) <= budget:
+        return text
+
+    sections = [
+        (name, _trim_lesson_steps(value) if name == 'lesson' else value)
+        for name, value in sections
+    ]
+    text = _context_text(sections)
+    while estimate_tokens(text) > budget and len(sections) > 1:
+        sections.pop()
+        text = _context_text(sections)
+    return text
+
+
+def build_prompt(message, used_context, history=(), summary=''):
     mode = used_context.get('mode')
     mode_instruction = {
         'lesson_explainer': 'Tập trung giải thích bài học hiện tại và các bước trong bài.',
@@ -261,8 +470,10 @@ def build_prompt(message, used_context):
         'Nếu thiếu dữ liệu thì nói rõ phần nào đang thiếu. '
         f'{mode_instruction}'
     )
+    if summary:
+        system_prompt += f'\n\nTóm tắt các lượt trao đổi trước với học sinh:\n{summary}'
     user_prompt = (
-        f'Ngữ cảnh hiện tại: {used_context}\n\n'
+        f'Ngữ cảnh hiện tại:\n{compact_context(used_context)}\n\n'
         f'Câu hỏi của học sinh: {message}\n\n'
         'Hãy trả lời bằng tiếng Việt, ưu tiên 2-4 đoạn ngắn. '
         'Nếu phù hợp, trình bày theo 2-4 mục có icon ở đầu dòng như: 📘, 🧠, 🗺️, 💡, ❓. '
@@ -273,10 +484,351 @@ def build_prompt(message, used_context):
     )
     return [
         {'role': 'system', 'content': system_prompt},
+        *history,
         {'role': 'user', 'content': user_prompt},
     ]
 
 
+HISTORY_ROLES = ('user', 'assistant')
+HISTORY_SUMMARY_LABELS = {'user': 'HS hỏi', 'assistant': 'Trợ giảng'}
+HISTORY_SUMMARY_LINE_CHARS = 200
+_MARKDOWN_NOISE_RE = re.compile(r'[*_#`>]+')
+_SENTENCE_END_RE = re.compile(r'(?<=[.!?])\s')
+
+
+def _clip(text, limit):
+    text = ' '.join(text.split())
+    if len(text) <= limit:
+        return text
+    return text[:limit - 1].rstrip() + '…'
+
+
+def load_conversation_history(conversation):
+    """
+    Return ``(summary, history)`` for continuing ``conversation``.
+
+    ``history`` holds the last AI_TUTOR_HISTORY_WINDOW user/assistant messages
+    as provider chat messages; anything older is only represented by the
+    rolling summary kept on the conversation.
+    """
+    window = settings.AI_TUTOR_HISTORY_WINDOW
+    if window <= 0:
+        return conversation.summary, []
+
+    rows = list(
+        AiMessage.objects.filter(conversation=conversation, role__in=HISTORY_ROLES)
+        .order_by('-id')
+        .values_list('role', 'content')[:window]
+    )
+    limit = settings.AI_TUTOR_HISTORY_MESSAGE_CHARS
+    history = [{'role': role, 'content': _clip(content, limit)} for role, content in reversed(rows)]
+    return conversation.summary, history
+
+
+def _summary_line(role, content):
+    text = _clip(_MARKDOWN_NOISE_RE.sub('', content), HISTORY_SUMMARY_LINE_CHARS * 2)
+    if role == 'assistant':
+        # The opening sentence of an answer usually carries its gist
+        text = _SENTENCE_END_RE.split(text, maxsplit=1)[0]
+    return f'- {HISTORY_SUMMARY_LABELS[role]}: {_clip(text, HISTORY_SUMMARY_LINE_CHARS)}'
+
+
+def fold_into_summary(summary, messages, max_chars=None):
+    """
+    Append one line per ``(role, content)`` message to ``summary`` and drop the
+    oldest lines until it fits in ``max_chars``.
+    """
+    if max_chars is None:
+        max_chars = settings.AI_TUTOR_HISTORY_SUMMARY_CHARS
+    lines = summary.splitlines() if summary else []
+    lines.extend(_summary_line(role, content) for role, content in messages)
+    while lines and len('\n'.join(lines)) > max_chars:
+        lines.pop(0)
+    return '\n'.join(lines)
+
+
+def update_conversation_summary(conversation):
+    """
+    Fold messages that have slid out of the history window into the rolling
+    summary. Only messages newer than ``summarized_message_id`` are read, so
+    the work per turn stays bounded by the window size.
+    """
+    rows = AiMessage.objects.filter(conversation=conversation, role__in=HISTORY_ROLES)
+    if conversation.summarized_message_id:
+        rows = rows.filter(id__gt=conversation.summarized_message_id)
+    rows = list(rows.order_by('id').values_list('id', 'role', 'content'))
+
+    window = max(settings.AI_TUTOR_HISTORY_WINDOW, 0)
+    evicted = rows[:len(rows) - window] if len(rows) > window else []
+    if not evicted:
+        return False
+
+    conversation.summary = fold_into_summary(conversation.summary, [(role, content) for _, role, content in evicted])
+    conversation.summarized_message_id = evicted[-1][0]
+    conversation.save(update_fields=['summary', 'summarized_message_id'])
+    return True
+
+
+RESPONSE_CACHE_PREFIX = 'ai_tutor:response'
+
+
+def _curriculum_namespace_key(curriculum):
+    return 'ai_tutor:response-ns:{grade_level}:{semester}:{textbook_series}'.format(**curriculum)
+
+
+def _curriculum_namespace(curriculum):
+    key = _curriculum_namespace_key(curriculum)
+    namespace = cache.get(key)
+    if namespace is None:
+        namespace = uuid.uuid4().hex
+        cache.add(key, namespace, timeout=None)
+        namespace = cache.get(key, namespace)
+    return namespace
+
+
+def invalidate_response_cache(curriculum):
+    """Drop every cached answer of a curriculum by rotating its namespace."""
+    cache.set(_curriculum_namespace_key(curriculum), uuid.uuid4().hex, timeout=None)
+
+
+def context_fingerprint(used_context):
+    canonical = json.dumps(used_context, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def store_context_snapshot(used_context):
+    """
+    Store ``used_context`` once, keyed by its fingerprint, and return the key.
+
+    A repeated context only refreshes ``created_at`` in the same
+    ``INSERT ... ON CONFLICT``. That row lock and the fresh timestamp keep
+    prune_context_snapshots from deleting a snapshot that the caller's
+    transaction is about to reference.
+    """
+    digest = context_fingerprint(used_context)
+    AiContextSnapshot.objects.bulk_create(
+        [AiContextSnapshot(digest=digest, payload=used_context)],
+        update_conflicts=True,
+        unique_fields=['digest'],
+        update_fields=['created_at'],
+    )
+    return digest
+
+
+PRUNE_CONTEXT_SNAPSHOTS_SQL = """
+    DELETE FROM ai_context_snapshots AS snapshot
+    WHERE snapshot.created_at < %s
+      AND NOT EXISTS (
+          SELECT 1 FROM ai_messages AS message WHERE message.context_digest = snapshot.digest
+      )
+"""
+
+
+def prune_context_snapshots(min_age=timedelta(days=1)):
+    """
+    Delete context snapshots that no message references any more, e.g. after
+    their conversations were deleted. Snapshots stored or reused within
+    ``min_age`` are kept. Returns the number of snapshots deleted.
+    """
+    # One statement, so a row refreshed by a concurrent store_context_snapshot
+    # is re-checked against the cutoff instead of being deleted by primary key
+    with connection.cursor() as cursor:
+        cursor.execute(PRUNE_CONTEXT_SNAPSHOTS_SQL, [timezone.now() - min_age])
+        return cursor.rowcount
+
+
+def get_response_cache_key(message, used_context, model_name, history=(), summary=''):
+    """
+    Cache key for a tutor answer.
+
+    Questions that only differ in case, accents or spacing share an entry, but
+    any difference in the context sent to the provider (lesson step, layers,
+    selected feature, ...), in the conversation history or in the model
+    produces a different key.
+    """
+    normalized = normalize_lookup_text(message)
+    fingerprint = context_fingerprint(used_context)
+    if history or summary:
+        fingerprint += context_fingerprint({'history': list(history), 'summary': summary})
+    digest = hashlib.sha256(
+        f'{model_name}\n{normalized}\n{fingerprint}'.encode('utf-8')
+    ).hexdigest()
+    curriculum = used_context['curriculum']
+    return f'{RESPONSE_CACHE_PREFIX}:{_curriculum_namespace(curriculum)}:{digest}'
+
+
+def get_cached_response(cache_key):
+    if not settings.AI_TUTOR_RESPONSE_CACHE_TIMEOUT:
+        return None
+    return cache.get(cache_key)
+
+
+def store_cached_response(cache_key, assistant_message):
+    if settings.AI_TUTOR_RESPONSE_CACHE_TIMEOUT and assistant_message:
+        cache.set(cache_key, assistant_message, timeout=settings.AI_TUTOR_RESPONSE_CACHE_TIMEOUT)
+
+
+INFLIGHT_PREFIX = 'ai_tutor:inflight'
+# How long a finished call's answer stays available to requests that were
+# waiting on it in other workers.
+INFLIGHT_RESULT_TIMEOUT = 15
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def _single_flight_wait():
+    """How long a request waits for an identical in-flight call before making its own."""
+    return settings.AI_TUTOR_SINGLE_FLIGHT_WAIT or max_call_seconds()
+
+
+def _inflight_lock_timeout(wait):
+    # The lock must outlive the slowest call it guards (or another worker
+    # would start a duplicate mid-call) and every waiter's deadline
+    return math.ceil(max(wait, max_call_seconds())) + 1
+
+
+def coalesce_provider_call(cache_key, call):
+    """
+    Run ``call()`` once for concurrent requests sharing ``cache_key``.
+
+    Threads of this process wait on the in-flight call directly; other
+    workers are kept out by a lock in the shared cache and poll for the
+    answer it publishes. Returns ``(answer, shared)``, where ``shared`` is
+    true when the answer came from a call made for another request. An
+    error raised by the call reaches every request of this process waiting
+    on it; other workers retry once the lock is released.
+    """
+    with _flights_lock:
+        flight = _flights.get(cache_key)
+        is_leader = flight is None
+        if is_leader:
+            flight = _flights[cache_key] = _Flight()
+
+    if not is_leader:
+        if not flight.done.wait(_single_flight_wait()):
+            return call(), False
+        if flight.error is not None:
+            raise flight.error
+        return flight.result, True
+
+    try:
+        flight.result, shared = _coalesce_across_workers(cache_key, call)
+        return flight.result, shared
+    except Exception as exc:
+        flight.error = exc
+        raise
+    finally:
+        with _flights_lock:
+            _flights.pop(cache_key, None)
+        flight.done.set()
+
+
+def _coalesce_across_workers(cache_key, call):
+    lock_key = f'{INFLIGHT_PREFIX}:lock:{cache_key}'
+    result_key = f'{INFLIGHT_PREFIX}:result:{cache_key}'
+    wait = _single_flight_wait()
+    lock_timeout = _inflight_lock_timeout(wait)
+    deadline = time.monotonic() + wait
+
+    while time.monotonic() < deadline:
+        # The lock expires on its own so a crashed leader cannot block the key for good
+        if cache.add(lock_key, 1, timeout=lock_timeout):
+            try:
+                result = call()
+                cache.set(result_key, result, timeout=INFLIGHT_RESULT_TIMEOUT)
+                return result, False
+            finally:
+                cache.delete(lock_key)
+
+        while time.monotonic() < deadline:
+            time.sleep(settings.AI_TUTOR_SINGLE_FLIGHT_POLL_INTERVAL)
+            result = cache.get(result_key)
+            if result is not None:
+                return result, True
+            if cache.get(lock_key) is None:
+                # The other call failed without an answer; race to take over
+                break
+
+    return call(), False
+
+
+_async_flights = weakref.WeakKeyDictionary()
+
+
+async def acoalesce_provider_call(cache_key, call):
+    """
+    Async counterpart of coalesce_provider_call for ASGI views: ``call`` is a
+    coroutine function, requests on the same event loop await one future and
+    other workers are coordinated through the same cache lock.
+    """
+    loop = asyncio.get_running_loop()
+    flights = _async_flights.setdefault(loop, {})
+    flight = flights.get(cache_key)
+
+    if flight is not None:
+        try:
+            return await asyncio.wait_for(asyncio.shield(flight), _single_flight_wait()), True
+        except asyncio.TimeoutError:
+            return await call(), False
+        except asyncio.CancelledError:
+            # Only take over when the leading request was cancelled, not this one
+            if not flight.cancelled():
+                raise
+            return await call(), False
+
+    flight = flights[cache_key] = loop.create_future()
+    try:
+        result, shared = await _acoalesce_across_workers(cache_key, call)
+    except Exception as exc:
+        flight.set_exception(exc)
+        # Mark it retrieved so an unawaited error is not logged again by asyncio
+        flight.exception()
+        raise
+    else:
+        flight.set_result(result)
+        return result, shared
+    finally:
+        flights.pop(cache_key, None)
+        if not flight.done():
+            flight.cancel()
+
+
+async def _acoalesce_across_workers(cache_key, call):
+    lock_key = f'{INFLIGHT_PREFIX}:lock:{cache_key}'
+    result_key = f'{INFLIGHT_PREFIX}:result:{cache_key}'
+    wait = _single_flight_wait()
+    lock_timeout = _inflight_lock_timeout(wait)
+    deadline = time.monotonic() + wait
+
+    while time.monotonic() < deadline:
+        if await cache.aadd(lock_key, 1, timeout=lock_timeout):
+            try:
+                result = await call()
+                await cache.aset(result_key, result, timeout=INFLIGHT_RESULT_TIMEOUT)
+                return result, False
+            finally:
+                await cache.adelete(lock_key)
+
+        while time.monotonic() < deadline:
+            await asyncio.sleep(settings.AI_TUTOR_SINGLE_FLIGHT_POLL_INTERVAL)
+            result = await cache.aget(result_key)
+            if result is not None:
+                return result, True
+            if await cache.aget(lock_key) is None:
+                break
+
+    return await call(), False
+
+
 def build_followups(used_context):
     mode = used_context.get('mode')
     prompts = []
@@ -313,63 +865,8 @@ def build_followups(used_context):
     return prompts[:3]
 
 
-PLACE_ACTION_LOOKUP = [
-    {
-        'aliases': ['my', 'm?', 'hoa ky', 'hoa k?', 'united states', 'usa', 'us'],
-        'coordinates': [-98.5795, 39.8283],
-        'zoom': 3.6,
-        'title': 'Hoa K?',
-        'description': 'Hoa K? n?m ? B?c M?, gi?a ??i T?y D??ng v? Th?i B?nh D??ng.',
-    },
-    {
-        'aliases': ['viet nam', 'vi?t nam', 'vn'],
-        'coordinates': [105.83416, 21.027764],
-        'zoom': 5.2,
-        'title': 'Vi?t Nam',
-        'description': 'Vi?t Nam n?m ? r?a ph?a ??ng b?n ??o ??ng D??ng, thu?c ??ng Nam ?.',
-    },
-    {
-        'aliases': ['nhat ban', 'nh?t b?n', 'japan'],
-        'coordinates': [138.2529, 36.2048],
-        'zoom': 4.6,
-        'title': 'Nh?t B?n',
-        'description': 'Nh?t B?n l? qu?c gia qu?n ??o ? ??ng ?, n?m ph?a ??ng b?n ??o Tri?u Ti?n.',
-    },
-    {
-        'aliases': ['trung quoc', 'trung qu?c', 'china'],
-        'coordinates': [104.1954, 35.8617],
-        'zoom': 3.8,
-        'title': 'Trung Qu?c',
-        'description': 'Trung Qu?c n?m ? ??ng ? v? c? di?n t?ch r?t l?n tr?n l?c ??a ? - ?u.',
-    },
-    {
-        'aliases': ['ha noi', 'h? n?i', 'hanoi'],
-        'coordinates': [105.83416, 21.027764],
-        'zoom': 8.4,
-        'title': 'H? N?i',
-        'description': 'H? N?i l? th? ?? c?a Vi?t Nam, n?m ? ??ng b?ng s?ng H?ng.',
-    },
-    {
-        'aliases': ['th?nh ph? h? ch? minh', 'tp.hcm', 'tphcm', 's?i g?n', 'sai gon', 'ho chi minh city'],
-        'coordinates': [106.6297, 10.8231],
-        'zoom': 8.2,
-        'title': 'Th?nh ph? H? Ch? Minh',
-        'description': 'Th?nh ph? H? Ch? Minh n?m ? ??ng Nam B? v? l? trung t?m kinh t? l?n c?a Vi?t Nam.',
-    },
-]
-
-
-def _normalize_lookup_text(value):
-    if not value:
-        return ''
-    normalized = unicodedata.normalize('NFD', str(value).lower())
-    normalized = ''.join(char for char in normalized if unicodedata.category(char) != 'Mn')
-    normalized = normalized.replace('\u0111', 'd').replace('\u0110', 'd')
-    return re.sub(r'\s+', ' ', normalized).strip()
-
-
 def build_map_actions(message, used_context):
-    normalized_message = _normalize_lookup_text(message)
+    normalized_message = normalize_lookup_text(message)
 
     actions = []
     actions.extend(_extract_lesson_step_actions(used_context))
@@ -428,13 +925,7 @@ def _infer_place_action(normalized_message):
     actions = []
     wants_location = any(token in normalized_message for token in ['? ??u', 'o dau', 'n?m ? ??u', 'nam o dau', 'ch? tr?n b?n ??', 'chi tren ban do'])
 
-    matched_place = None
-    for entry in PLACE_ACTION_LOOKUP:
-        normalized_aliases = [_normalize_lookup_text(alias) for alias in entry['aliases']]
-        if any(alias and alias in normalized_message for alias in normalized_aliases):
-            matched_place = entry
-            break
-
+    matched_place = get_gazetteer().match(normalized_message)
     if not matched_place:
         return actions
 
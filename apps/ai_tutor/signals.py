@@ -0,0 +1,58 @@
+"""
+Signal handlers that keep cached AI tutor curriculum summaries, cached
+answers and the place gazetteer in sync.
+"""
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from apps.gis_data.models import Boundary, MapLayer, PointOfInterest, VietnamProvince
+from apps.lessons.models import Lesson
+from apps.quizzes.models import Quiz
+from .gazetteer import invalidate_gazetteer
+from .services import invalidate_curriculum_summaries, invalidate_response_cache
+
+
+def _curriculum_of(instance):
+    return {
+        'grade_level': instance.grade_level,
+        'semester': instance.semester,
+        'textbook_series': instance.textbook_series,
+    }
+
+
+def _invalidate_answers_of(lessons):
+    """Drop the cached answers of every curriculum the lessons belong to."""
+    curricula = {tuple(_curriculum_of(lesson).items()) for lesson in lessons}
+    for curriculum in curricula:
+        invalidate_response_cache(dict(curriculum))
+
+
+@receiver([post_save, post_delete], sender=Lesson)
+@receiver([post_save, post_delete], sender=Quiz)
+def invalidate_summaries_on_content_change(sender, instance, **kwargs):
+    """Lesson and quiz titles, descriptions and publication feed the summaries."""
+    invalidate_curriculum_summaries()
+    invalidate_response_cache(_curriculum_of(instance))
+
+
+@receiver(m2m_changed, sender=Lesson.layers.through)
+def invalidate_summaries_on_lesson_layers_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Module summaries list the layer names of each lesson."""
+    if action not in {'post_add', 'post_remove', 'post_clear'}:
+        return
+    invalidate_curriculum_summaries()
+    lessons = Lesson.objects.filter(id__in=pk_set or ()) if reverse else [instance]
+    _invalidate_answers_of(lessons)
+
+
+@receiver(post_save, sender=MapLayer)
+def invalidate_summaries_on_layer_rename(sender, instance, **kwargs):
+    invalidate_curriculum_summaries()
+    _invalidate_answers_of(instance.lessons.all())
+
+
+@receiver([post_save, post_delete], sender=VietnamProvince)
+@receiver([post_save, post_delete], sender=Boundary)
+@receiver([post_save, post_delete], sender=PointOfInterest)
+def invalidate_gazetteer_on_place_change(sender, instance, **kwargs):
+    invalidate_gazetteer()
@@ -1,13 +1,46 @@
-from unittest.mock import patch
-
+import json
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.gis.geos import Point
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
-
-from apps.ai_tutor.models import AiConversation, AiMessage, AiMessageFeedback
-from apps.ai_tutor.services import normalize_assistant_message
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.ai_tutor.gazetteer import Gazetteer, normalize_lookup_text
+from apps.ai_tutor.limits import INFLIGHT_CALLS_KEY, acquire_provider_slot, release_provider_slot
+from apps.ai_tutor.models import AiContextSnapshot, AiConversation, AiMessage, AiMessageFeedback
+from apps.ai_tutor.providers import (
+    AiProviderClient,
+    AiProviderError,
+    AiProviderUnavailable,
+    _get_breaker,
+    reset_provider_state,
+)
+from apps.ai_tutor.services import (
+    AiTutorContextBuilder,
+    coalesce_provider_call,
+    compact_context,
+    estimate_tokens,
+    fold_into_summary,
+    normalize_assistant_message,
+    prune_context_snapshots,
+    store_context_snapshot,
+)
+from apps.ai_tutor.views import _stream_response
 from apps.classrooms.models import Classroom
-from apps.gis_data.models import MapLayer
+from apps.gis_data.models import MapLayer, PointOfInterest
 from apps.lessons.models import Lesson, LessonStep, MapAction
 from apps.quizzes.models import Quiz
 
@@ -15,8 +48,14 @@ from apps.quizzes.models import Quiz
 User = get_user_model()
 
 
+async def async_chunks(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
 class AiTutorApiTests(APITestCase):
     def setUp(self):
+        cache.clear()
         self.student = User.objects.create_user(
             email='student-ai@example.com',
             password='password123',
@@ -102,6 +141,40 @@ class AiTutorApiTests(APITestCase):
         self.assertEqual(second.status_code, status.HTTP_200_OK)
         conversation = AiConversation.objects.get(id=first.data['conversation_id'])
         self.assertEqual(conversation.messages.count(), 4)
+        self.assertEqual(AiContextSnapshot.objects.count(), 1)
+        self.assertEqual(conversation.messages.values('context_id').distinct().count(), 1)
+
+        prompt = mock_chat.call_args_list[1].args[0]
+        self.assertEqual([m['role'] for m in prompt], ['system', 'user', 'assistant', 'user'])
+        self.assertEqual(prompt[1]['content'], self.base_payload()['message'])
+        self.assertEqual(prompt[2]['content'], 'Giải thích tiếp theo.')
+
+    @override_settings(AI_TUTOR_HISTORY_WINDOW=2)
+    @patch('apps.ai_tutor.views.AiProviderClient.chat', return_value='Câu trả lời. Phần giải thích thêm.')
+    def test_older_turns_are_folded_into_rolling_summary(self, mock_chat):
+        payload = self.base_payload()
+        for index in range(3):
+            payload['message'] = f'Câu hỏi số {index}'
+            response = self.client.post(self.url, payload, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            payload['conversation_id'] = response.data['conversation_id']
+
+        conversation = AiConversation.objects.get(id=payload['conversation_id'])
+        self.assertEqual(conversation.summary.splitlines(), [
+            '- HS hỏi: Câu hỏi số 0',
+            '- Trợ giảng: Câu trả lời.',
+            '- HS hỏi: Câu hỏi số 1',
+            '- Trợ giảng: Câu trả lời.',
+        ])
+        self.assertEqual(
+            conversation.summarized_message_id,
+            conversation.messages.order_by('-id').values_list('id', flat=True)[2],
+        )
+
+        prompt = mock_chat.call_args_list[2].args[0]
+        self.assertEqual([m['role'] for m in prompt], ['system', 'user', 'assistant', 'user'])
+        self.assertEqual(prompt[1]['content'], 'Câu hỏi số 1')
+        self.assertIn('- HS hỏi: Câu hỏi số 0', prompt[0]['content'])
 
     def test_rejects_wrong_curriculum(self):
         payload = self.base_payload()
@@ -171,6 +244,21 @@ class AiTutorApiTests(APITestCase):
         self.assertIn('fly_to_place', action_types)
         self.assertIn('open_popup', action_types)
 
+    @patch('apps.ai_tutor.views.AiProviderClient.chat', return_value='Vịnh nằm ở Quảng Ninh.')
+    def test_place_actions_follow_gis_data_changes(self, mock_chat):
+        payload = self.base_payload()
+        payload['message'] = 'Vịnh Hạ Long nằm ở đâu?'
+        first = self.client.post(self.url, payload, format='json')
+        self.assertNotIn('fly_to_place', [action['type'] for action in first.data['map_actions']])
+
+        PointOfInterest.objects.create(name='Vịnh Hạ Long', category='landmark', geometry=Point(107.08, 20.91))
+        payload['message'] = 'Thế còn vịnh Hạ Long thì nằm ở đâu?'
+        second = self.client.post(self.url, payload, format='json')
+
+        fly_to = next(action for action in second.data['map_actions'] if action['type'] == 'fly_to_place')
+        self.assertEqual(fly_to['label'], 'Vịnh Hạ Long')
+        self.assertEqual(fly_to['coordinates'], [107.08, 20.91])
+
     @patch('apps.ai_tutor.views.AiProviderClient.chat', return_value='Em xem ?i?m tr?ng t?m n?y nh?.')
     def test_returns_step_map_action_when_lesson_step_has_map_action(self, mock_chat):
         step_action = MapAction.objects.create(
@@ -187,6 +275,202 @@ class AiTutorApiTests(APITestCase):
         self.assertEqual(response.data['used_context']['lesson']['current_step']['map_action']['action_type'], 'flyTo')
         self.assertTrue(any(action['type'] == 'fly_to_place' for action in response.data['map_actions']))
 
+    @patch('apps.ai_tutor.views.AiProviderClient.chat', return_value='Bài này nói về bản đồ.')
+    def test_same_question_and_context_is_served_from_cache(self, mock_chat):
+        first = self.client.post(self.url, self.base_payload(), format='json')
+
+        other_student = User.objects.create_user(
+            email='student-ai-2@example.com',
+            password='password123',
+            role='student',
+        )
+        self.client.force_authenticate(user=other_student)
+        payload = self.base_payload()
+        payload['message'] = '  bai nay NOI ve gi? '
+        second = self.client.post(self.url, payload, format='json')
+
+        self.assertFalse(first.data['cached'])
+        self.assertTrue(second.data['cached'])
+        self.assertEqual(second.data['assistant_message'], 'Bài này nói về bản đồ.')
+        mock_chat.assert_called_once()
+        conversation = AiConversation.objects.get(user=other_student)
+        self.assertEqual(conversation.messages.count(), 2)
+
+    @patch('apps.ai_tutor.views.AiProviderClient.chat', return_value='Giải thích bước khác.')
+    def test_different_lesson_step_bypasses_cache(self, mock_chat):
+        LessonStep.objects.create(lesson=self.lesson, order=2, popup_text='Nội dung bước 2')
+        self.client.post(self.url, self.base_payload(), format='json')
+        payload = self.base_payload()
+        payload['lesson_step'] = 1
+
+        response = self.client.post(self.url, payload, format='json')
+
+        self.assertFalse(response.data['cached'])
+        self.assertEqual(mock_chat.call_count, 2)
+
+    @patch('apps.ai_tutor.views.AiProviderClient.chat', return_value='Bài này nói về bản đồ.')
+    def test_content_edit_drops_cached_answers(self, mock_chat):
+        self.client.post(self.url, self.base_payload(), format='json')
+        self.quiz.save()
+
+        response = self.client.post(self.url, self.base_payload(), format='json')
+
+        self.assertFalse(response.data['cached'])
+        self.assertEqual(mock_chat.call_count, 2)
+
+    @patch('apps.ai_tutor.views.AiProviderClient.chat', return_value='Tóm tắt module.')
+    def test_module_summary_is_cached_until_lessons_change(self, mock_chat):
+        payload = {
+            'message': 'Tóm tắt module này giúp em',
+            'grade_level': '10',
+            'semester': '1',
+            'textbook_series': 'canh-dieu',
+            'module_code': 'CD10-HK1-M1',
+        }
+        builder = AiTutorContextBuilder(self.student)
+        builder.build(payload)
+        with self.assertNumQueries(0):
+            _, _, _, cached_context = builder.build(payload)
+        self.assertEqual(cached_context['module_summary']['lesson_count'], 1)
+
+        Lesson.objects.create(
+            title='Bài 2',
+            description='Giới thiệu bài 2',
+            grade_level='10',
+            semester='1',
+            textbook_series='canh-dieu',
+            module_code='CD10-HK1-M1',
+        )
+        _, _, _, fresh_context = builder.build(payload)
+
+        self.assertEqual(fresh_context['module_summary']['lesson_count'], 2)
+        self.assertEqual(fresh_context['semester_summary']['lesson_count'], 2)
+
+    @patch('apps.ai_tutor.views.AiProviderClient.chat', return_value='Trả lời ' + 'rất dài ' * 60)
+    def test_conversation_list_uses_denormalized_last_message_and_keyset_pages(self, mock_chat):
+        for index in range(3):
+            payload = self.base_payload()
+            payload['message'] = f'Câu hỏi {index}'
+            self.client.post(self.url, payload, format='json')
+
+        with CaptureQueriesContext(connection) as queries:
+            first = self.client.get('/api/v1/ai-tutor/conversations/', {'page_size': 2})
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertFalse(any('ai_messages' in query['sql'] for query in queries.captured_queries))
+
+        self.assertEqual([item['title'] for item in first.data['results']], ['Câu hỏi 2', 'Câu hỏi 1'])
+        last_message = first.data['results'][0]['last_message']
+        self.assertEqual(last_message['role'], 'assistant')
+        self.assertEqual(len(last_message['content']), 200)
+
+        second = self.client.get(first.data['next'])
+        self.assertEqual([item['title'] for item in second.data['results']], ['Câu hỏi 0'])
+        self.assertIsNone(second.data['next'])
+
+    def test_prune_deletes_snapshots_of_deleted_conversations(self):
+        conversation = AiConversation.objects.create(
+            user=self.student,
+            grade_level='10',
+            semester='1',
+            textbook_series='canh-dieu',
+        )
+        kept = store_context_snapshot({'mode': 'lesson_explainer', 'lesson': {'id': 1}})
+        orphaned = store_context_snapshot({'mode': 'lesson_explainer', 'lesson': {'id': 2}})
+        fresh = store_context_snapshot({'mode': 'lesson_explainer', 'lesson': {'id': 3}})
+        AiMessage.objects.create(conversation=conversation, role='user', content='Câu hỏi', context_id=kept)
+        deleted = AiConversation.objects.create(
+            user=self.student,
+            grade_level='10',
+            semester='1',
+            textbook_series='canh-dieu',
+        )
+        AiMessage.objects.create(conversation=deleted, role='user', content='Câu hỏi', context_id=orphaned)
+        deleted.delete()
+        AiContextSnapshot.objects.exclude(digest=fresh).update(created_at=timezone.now() - timedelta(days=2))
+
+        self.assertEqual(prune_context_snapshots(), 1)
+        self.assertEqual(set(AiContextSnapshot.objects.values_list('digest', flat=True)), {kept, fresh})
+
+    def test_conversation_detail_pages_messages_and_shares_snapshots(self):
+        conversation = AiConversation.objects.create(
+            user=self.student,
+            grade_level='10',
+            semester='1',
+            textbook_series='canh-dieu',
+        )
+        snapshot = {'mode': 'lesson_explainer', 'lesson': {'id': self.lesson.id}}
+        digest = store_context_snapshot(snapshot)
+        messages = [
+            AiMessage.objects.create(
+                conversation=conversation,
+                role='user' if index % 2 == 0 else 'assistant',
+                content=f'Tin nhắn {index}',
+                context_id=digest,
+            )
+            for index in range(5)
+        ]
+        url = f'/api/v1/ai-tutor/conversations/{conversation.id}/'
+
+        latest = self.client.get(url, {'limit': 2})
+        self.assertEqual([m['id'] for m in latest.data['messages']], [messages[3].id, messages[4].id])
+        self.assertTrue(latest.data['has_more'])
+        self.assertEqual(len(latest.data['context_snapshots']), 1)
+        ref = latest.data['messages'][0]['context_ref']
+        self.assertEqual(latest.data['context_snapshots'][ref], snapshot)
+
+        older = self.client.get(url, {'before': messages[3].id, 'limit': 3, 'include_context': 'false'})
+        self.assertEqual([m['id'] for m in older.data['messages']], [m.id for m in messages[:3]])
+        self.assertFalse(older.data['has_more'])
+        self.assertNotIn('context_snapshots', older.data)
+        self.assertNotIn('context_ref', older.data['messages'][0])
+
+        newer = self.client.get(url, {'after': messages[1].id, 'limit': 2})
+        self.assertEqual([m['id'] for m in newer.data['messages']], [messages[2].id, messages[3].id])
+        self.assertTrue(newer.data['has_more'])
+
+        invalid = self.client.get(url, {'before': messages[3].id, 'after': messages[1].id})
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(AI_TUTOR_USER_RATE_PER_MINUTE=6, AI_TUTOR_USER_BURST=1)
+    @patch('apps.ai_tutor.views.AiProviderClient.chat', return_value='Trả lời.')
+    def test_user_over_rate_limit_gets_429_with_retry_after(self, mock_chat):
+        first = self.client.post(self.url, self.base_payload(), format='json')
+        payload = self.base_payload()
+        payload['message'] = 'Câu hỏi tiếp theo'
+        second = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertTrue(1 <= int(second['Retry-After']) <= 10)
+        self.assertEqual(AiConversation.objects.filter(user=self.student).count(), 1)
+        mock_chat.assert_called_once()
+
+    @override_settings(AI_TUTOR_USER_RATE_PER_MINUTE=6, AI_TUTOR_USER_BURST=1)
+    @patch('apps.ai_tutor.views.AiProviderClient.chat', return_value='Trả lời.')
+    def test_cached_answers_are_not_rate_limited(self, mock_chat):
+        first = self.client.post(self.url, self.base_payload(), format='json')
+        repeat = self.client.post(self.url, self.base_payload(), format='json')
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(repeat.status_code, status.HTTP_200_OK)
+        self.assertTrue(repeat.data['cached'])
+        mock_chat.assert_called_once()
+
+    @override_settings(AI_TUTOR_GLOBAL_MAX_INFLIGHT=1)
+    @patch('apps.ai_tutor.views.AiProviderClient.chat', return_value='Trả lời.')
+    def test_provider_concurrency_cap_fails_fast(self, mock_chat):
+        acquire_provider_slot()
+        try:
+            busy = self.client.post(self.url, self.base_payload(), format='json')
+        finally:
+            release_provider_slot()
+        free = self.client.post(self.url, self.base_payload(), format='json')
+
+        self.assertEqual(busy.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(busy['Retry-After'], '1')
+        self.assertEqual(free.status_code, status.HTTP_200_OK)
+        mock_chat.assert_called_once()
+
     @patch('apps.ai_tutor.views.AiProviderClient.chat', side_effect=Exception('boom'))
     def test_provider_unexpected_error_returns_502(self, mock_chat):
         response = self.client.post(self.url, self.base_payload(), format='json')
@@ -206,6 +490,62 @@ class AiTutorApiTests(APITestCase):
         self.assertEqual(AiMessageFeedback.objects.count(), 1)
 
 
+    def read_events(self, response):
+        body = b''.join(response.streaming_content).decode('utf-8')
+        events = []
+        for block in body.strip().split('\n\n'):
+            event_line, data_line = block.split('\n')
+            events.append((event_line[len('event: '):], json.loads(data_line[len('data: '):])))
+        return events
+
+    @patch('apps.ai_tutor.views.AiProviderClient.astream_chat', return_value=async_chunks('Bài này ', 'nói về ', 'bản đồ.'))
+    def test_stream_relays_tokens_and_persists_messages(self, mock_stream):
+        response = self.client.post(
+            '/api/v1/ai-tutor/respond/stream/',
+            json.dumps(self.base_payload()),
+            content_type='application/json',
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.student)}',
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream; charset=utf-8')
+        events = self.read_events(response)
+        self.assertEqual(events[0][0], 'meta')
+        self.assertEqual([data['delta'] for name, data in events if name == 'token'], ['Bài này ', 'nói về ', 'bản đồ.'])
+        name, done = events[-1]
+        self.assertEqual(name, 'done')
+        self.assertEqual(done['assistant_message'], 'Bài này nói về bản đồ.')
+        assistant = AiMessage.objects.get(id=done['message_id'])
+        self.assertEqual(assistant.content, 'Bài này nói về bản đồ.')
+        self.assertEqual(assistant.conversation.messages.count(), 2)
+
+    @patch('apps.ai_tutor.views.AiProviderClient.achat', new_callable=AsyncMock, return_value='Trả lời bất đồng bộ.')
+    def test_async_respond_matches_sync_respond(self, mock_achat):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.student)}'}
+        url = '/api/v1/ai-tutor/respond/async/'
+        first = self.client.post(url, json.dumps(self.base_payload()), content_type='application/json', **headers)
+        second = self.client.post(url, json.dumps(self.base_payload()), content_type='application/json', **headers)
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        body = first.json()
+        self.assertEqual(body['assistant_message'], 'Trả lời bất đồng bộ.')
+        self.assertFalse(body['cached'])
+        self.assertEqual(AiMessage.objects.filter(conversation_id=body['conversation_id']).count(), 2)
+        self.assertTrue(second.json()['cached'])
+        mock_achat.assert_awaited_once()
+
+    def test_stream_requires_authentication(self):
+        self.client.force_authenticate(user=None)
+
+        response = self.client.post(
+            '/api/v1/ai-tutor/respond/stream/',
+            json.dumps(self.base_payload()),
+            content_type='application/json',
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
 class AiTutorOutputFormattingTests(APITestCase):
     def test_normalize_assistant_message_removes_excessive_bold(self):
         raw = '**Bước 1**: xem **lớp** và **chú giải** rồi trả lời.'
@@ -214,3 +554,287 @@ class AiTutorOutputFormattingTests(APITestCase):
         self.assertIn('Bước 1', cleaned)
         self.assertNotIn('**lớp**', cleaned)
         self.assertNotIn('**chú giải**', cleaned)
+
+
+class AiTutorPromptContextTests(SimpleTestCase):
+    def used_context(self):
+        return {
+            'mode': 'lesson_explainer',
+            'curriculum': {'grade_level': '10', 'semester': '1', 'textbook_series': 'canh-dieu', 'module_code': ''},
+            'lesson': {
+                'id': 7,
+                'title': 'Bài 1',
+                'description': '',
+                'module_code': 'CD10-HK1-M1',
+                'lesson_type': None,
+                'step_count': 9,
+                'current_step': {'order': 5, 'popup_text': 'Bước 5', 'map_action': None},
+                'steps': [
+                    {'order': order, 'popup_text': f'Nội dung chi tiết của bước {order} ' * 8, 'map_action': None}
+                    for order in range(1, 10)
+                ],
+                'layer_names': [],
+            },
+            'quiz': None,
+            'classroom': {'id': 3, 'name': 'Lớp 10A1', 'module_code': ''},
+            'map': {'active_layers': [], 'selected_feature': None, 'map_state': None},
+            'module_summary': None,
+            'semester_summary': {'lesson_count': 12, 'module_count': 2, 'modules': []},
+        }
+
+    def test_drops_ids_and_empty_fields(self):
+        text = compact_context(self.used_context(), budget=10000)
+
+        self.assertEqual(
+            [line.split(':', 1)[0] for line in text.splitlines()],
+            ['curriculum', 'lesson', 'classroom', 'semester_summary'],
+        )
+        self.assertNotIn('"id"', text)
+        self.assertNotIn('null', text)
+        self.assertNotIn('""', text)
+        self.assertEqual(text, compact_context(self.used_context(), budget=10000))
+
+    def test_trims_steps_then_low_priority_sections_to_fit_budget(self):
+        full = compact_context(self.used_context(), budget=10000)
+        budget = estimate_tokens(full) - 1
+
+        text = compact_context(self.used_context(), budget=budget)
+
+        self.assertLessEqual(estimate_tokens(text), budget)
+        self.assertIn('"3. Nội dung', text)
+        self.assertNotIn('"1. Nội dung', text)
+        self.assertTrue(text.startswith('curriculum:'))
+
+
+class AiTutorHistorySummaryTests(SimpleTestCase):
+    def test_summary_keeps_newest_lines_within_limit(self):
+        summary = ''
+        for index in range(20):
+            summary = fold_into_summary(summary, [('user', f'**Câu hỏi** số {index}')], max_chars=100)
+
+        self.assertLessEqual(len(summary), 100)
+        self.assertTrue(summary.endswith('- HS hỏi: Câu hỏi số 19'))
+        self.assertNotIn('số 0\n', summary)
+
+
+class ProviderCallCoalescingTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_concurrent_identical_requests_share_one_call(self):
+        calls = []
+        release = threading.Event()
+
+        def call():
+            calls.append(1)
+            release.wait(5)
+            return 'Một câu trả lời'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(coalesce_provider_call('same-question', call)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.2)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(shared for _, shared in results), [False, True, True, True, True])
+        self.assertEqual({answer for answer, _ in results}, {'Một câu trả lời'})
+
+    @override_settings(AI_TUTOR_SINGLE_FLIGHT_POLL_INTERVAL=0.01)
+    def test_waits_for_call_running_in_another_worker(self):
+        lock_key = 'ai_tutor:inflight:lock:other-worker'
+        cache.add(lock_key, 1)
+        threading.Timer(0.1, lambda: cache.set('ai_tutor:inflight:result:other-worker', 'Từ worker khác')).start()
+
+        answer, shared = coalesce_provider_call('other-worker', lambda: self.fail('provider called twice'))
+
+        self.assertEqual((answer, shared), ('Từ worker khác', True))
+
+    @override_settings(
+        AI_TUTOR_SINGLE_FLIGHT_WAIT=0,
+        AI_TUTOR_QUEUE_TIMEOUT=2,
+        AI_TUTOR_CONNECT_TIMEOUT=5,
+        AI_TUTOR_TIMEOUT=30,
+        AI_TUTOR_MAX_RETRIES=2,
+        AI_TUTOR_RETRY_BACKOFF_MAX=8,
+    )
+    def test_lock_outlives_the_slowest_provider_call(self):
+        with patch('apps.ai_tutor.services.cache.add', wraps=cache.add) as add:
+            coalesce_provider_call('slow-question', lambda: 'Trả lời')
+
+        # 2s queue + 3 attempts x (5s connect + 30s read) + 2 backoffs x 8s
+        self.assertEqual(add.call_args.kwargs['timeout'], 124)
+        with override_settings(AI_TUTOR_SINGLE_FLIGHT_WAIT=10):
+            with patch('apps.ai_tutor.services.cache.add', wraps=cache.add) as add:
+                coalesce_provider_call('slow-question-2', lambda: 'Trả lời')
+        self.assertEqual(add.call_args.kwargs['timeout'], 124)
+
+
+@override_settings(AI_TUTOR_GLOBAL_MAX_INFLIGHT=1)
+class StreamProviderSlotTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def prepared(self):
+        provider = SimpleNamespace(astream_chat=lambda messages: async_chunks('Một ', 'hai ', 'ba.'))
+        return SimpleNamespace(
+            conversation=SimpleNamespace(id=1), user=SimpleNamespace(id=1), provider=provider,
+            prompt_messages=[], cached_message=None,
+        )
+
+    async def test_stream_closed_early_releases_its_slot(self):
+        stream = _stream_response(self.prepared())
+        self.assertTrue((await stream.__anext__()).startswith('event: meta'))
+        self.assertTrue((await stream.__anext__()).startswith('event: token'))
+        self.assertEqual(cache.get(INFLIGHT_CALLS_KEY), 1)
+
+        await stream.aclose()
+
+        self.assertEqual(cache.get(INFLIGHT_CALLS_KEY), 0)
+
+    async def test_stream_at_capacity_reports_retry_after(self):
+        acquire_provider_slot()
+        try:
+            events = [event async for event in _stream_response(self.prepared())]
+        finally:
+            release_provider_slot()
+
+        self.assertEqual(len(events), 2)
+        self.assertTrue(events[1].startswith('event: error'))
+        self.assertEqual(json.loads(events[1].split('data: ', 1)[1])['retry_after'], 1)
+        self.assertEqual(cache.get(INFLIGHT_CALLS_KEY), 0)
+
+
+class GazetteerTests(SimpleTestCase):
+    def place(self, title, *aliases):
+        return {'title': title, 'aliases': [normalize_lookup_text(alias) for alias in aliases]}
+
+    def test_prefers_longest_name_on_word_boundaries(self):
+        gazetteer = Gazetteer([
+            self.place('Hồ Chí Minh (người)', 'Hồ Chí Minh'),
+            self.place('TP. Hồ Chí Minh', 'Thành phố Hồ Chí Minh'),
+            self.place('An Giang', 'An Giang'),
+        ])
+
+        self.assertEqual(gazetteer.match(normalize_lookup_text('Thành phố Hồ Chí Minh ở đâu?'))['title'], 'TP. Hồ Chí Minh')
+        self.assertEqual(gazetteer.match(normalize_lookup_text('Bác Hồ Chí Minh'))['title'], 'Hồ Chí Minh (người)')
+        self.assertIsNone(gazetteer.match(normalize_lookup_text('Nam Giang')))
+        self.assertIsNone(gazetteer.match(normalize_lookup_text('Lan Giang')))
+
+    def test_first_place_keeps_a_shared_alias(self):
+        gazetteer = Gazetteer([self.place('Curated', 'Hà Nội'), self.place('Province', 'Hà Nội')])
+
+        self.assertEqual(gazetteer.size, 1)
+        self.assertEqual(gazetteer.match('ha noi')['title'], 'Curated')
+
+
+class StubProviderHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        server = self.server
+        server.requests += 1
+        server.connections.add(self.client_address)
+        self.rfile.read(int(self.headers['Content-Length']))
+
+        status_code = server.statuses.pop(0) if server.statuses else 200
+        if status_code == 200:
+            body = json.dumps({'choices': [{'message': {'content': 'Trả lời từ máy chủ giả lập'}}]}).encode('utf-8')
+        else:
+            body = b'{"error": "unavailable"}'
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class AiProviderClientTests(SimpleTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubProviderHandler)
+        self.server.requests = 0
+        self.server.connections = set()
+        self.server.statuses = []
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        overrides = self.settings(
+            AI_TUTOR_BASE_URL=f'http://127.0.0.1:{self.server.server_port}/v1',
+            AI_TUTOR_API_KEY='test-key',
+            AI_TUTOR_MAX_RETRIES=2,
+            AI_TUTOR_RETRY_BACKOFF=0.01,
+            AI_TUTOR_CIRCUIT_FAILURE_THRESHOLD=2,
+            AI_TUTOR_CIRCUIT_RESET_TIMEOUT=60,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        reset_provider_state()
+        self.addCleanup(reset_provider_state)
+
+    def chat(self):
+        return AiProviderClient().chat([{'role': 'user', 'content': 'Xin chào'}])
+
+    def test_reuses_pooled_connection(self):
+        self.chat()
+        self.chat()
+
+        self.assertEqual(self.server.requests, 2)
+        self.assertEqual(len(self.server.connections), 1)
+
+    def test_retries_server_errors(self):
+        self.server.statuses = [503, 429]
+
+        self.assertEqual(self.chat(), 'Trả lời từ máy chủ giả lập')
+        self.assertEqual(self.server.requests, 3)
+
+    async def test_async_client_retries_and_reuses_connection(self):
+        self.server.statuses = [503]
+        messages = [{'role': 'user', 'content': 'Xin chào'}]
+
+        first = await AiProviderClient().achat(messages)
+        second = await AiProviderClient().achat(messages)
+
+        self.assertEqual((first, second), ('Trả lời từ máy chủ giả lập', 'Trả lời từ máy chủ giả lập'))
+        self.assertEqual(self.server.requests, 3)
+        self.assertEqual(len(self.server.connections), 1)
+
+    def test_circuit_opens_after_repeated_failures(self):
+        self.server.statuses = [500] * 6
+
+        for _ in range(2):
+            with self.assertRaises(AiProviderError):
+                self.chat()
+        with self.assertRaises(AiProviderUnavailable):
+            self.chat()
+
+        self.assertEqual(self.server.requests, 6)
+
+    def test_probe_that_raises_unexpectedly_does_not_wedge_the_circuit(self):
+        self.server.statuses = [500] * 6
+        for _ in range(2):
+            with self.assertRaises(AiProviderError):
+                self.chat()
+        breaker = _get_breaker(settings.AI_TUTOR_BASE_URL.rstrip('/'))
+        breaker._opened_at -= 61
+
+        with patch('httpx.Client.send', side_effect=RuntimeError('unexpected')):
+            with self.assertRaises(RuntimeError):
+                self.chat()
+        self.assertTrue(breaker.is_open)
+        with self.assertRaises(AiProviderUnavailable):
+            self.chat()
+
+        breaker._opened_at -= 61
+        self.assertEqual(self.chat(), 'Trả lời từ máy chủ giả lập')
+        self.assertFalse(breaker.is_open)
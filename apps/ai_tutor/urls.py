@@ -5,12 +5,16 @@ from .views import (
     AiConversationListView,
     AiMessageFeedbackView,
     AiTutorRespondView,
+    ai_tutor_respond_async,
+    ai_tutor_respond_stream,
 )
 
 app_name = 'ai_tutor'
 
 urlpatterns = [
     path('respond/', AiTutorRespondView.as_view(), name='respond'),
+    path('respond/async/', ai_tutor_respond_async, name='respond-async'),
+    path('respond/stream/', ai_tutor_respond_stream, name='respond-stream'),
     path('conversations/', AiConversationListView.as_view(), name='conversation-list'),
     path('conversations/<int:pk>/', AiConversationDetailView.as_view(), name='conversation-detail'),
     path('messages/<int:pk>/feedback/', AiMessageFeedbackView.as_view(), name='message-feedback'),
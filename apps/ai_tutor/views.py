@@ -1,20 +1,31 @@
+import json
 import logging
 
+from asgiref.sync import sync_to_async
 from django.db import transaction
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from drf_spectacular.utils import extend_schema
 from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
 from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication
 
-from .models import AiConversation, AiMessage, AiMessageFeedback
-from .providers import AiProviderClient, AiProviderError
+from apps.core.pagination import RecentActivityCursorPagination
+
+from .limits import AiTutorRateLimited, acquire_provider_slot, check_rate_limits, release_provider_slot
+from .models import AiContextSnapshot, AiConversation, AiMessage, AiMessageFeedback
+from .providers import AiProviderClient, AiProviderError, AiProviderUnavailable
 from .serializers import (
     AiConversationDetailSerializer,
     AiConversationListSerializer,
+    AiConversationMessagesQuerySerializer,
     AiMessageFeedbackCreateSerializer,
     AiMessageFeedbackSerializer,
+    AiMessageSerializer,
     AiTutorRespondSerializer,
 )
 from .services import (
@@ -22,14 +33,106 @@ from .services import (
     AiTutorContextError,
     build_followups,
     build_map_actions,
+    acoalesce_provider_call,
     build_prompt,
+    coalesce_provider_call,
+    get_cached_response,
+    get_response_cache_key,
+    load_conversation_history,
     normalize_assistant_message,
+    store_cached_response,
+    store_context_snapshot,
+    update_conversation_summary,
 )
 
 
 logger = logging.getLogger(__name__)
 
 
+GUARDRAIL_FLAGS = ['curriculum_locked', 'grounded_context_only']
+LAST_MESSAGE_PREVIEW_LENGTH = AiConversation._meta.get_field('last_message_preview').max_length
+
+
+def _get_conversation(user, payload):
+    conversation_id = payload.get('conversation_id')
+    if conversation_id:
+        return get_object_or_404(AiConversation, id=conversation_id, user=user)
+    return None
+
+
+def _create_conversation(user, payload, lesson, quiz, classroom):
+    return AiConversation.objects.create(
+        user=user,
+        lesson=lesson,
+        quiz=quiz,
+        classroom=classroom,
+        title=payload['message'][:80],
+        grade_level=payload['grade_level'],
+        semester=payload['semester'],
+        textbook_series=payload['textbook_series'],
+        module_code=payload.get('module_code', ''),
+    )
+
+
+def _record_exchange(conversation, message, assistant_message, used_context, provider):
+    with transaction.atomic():
+        context_digest = store_context_snapshot(used_context)
+        AiMessage.objects.create(
+            conversation=conversation,
+            role='user',
+            content=message,
+            context_id=context_digest,
+            guardrail_flags=GUARDRAIL_FLAGS,
+            model_name=provider.model,
+            provider_name=provider.provider_name,
+        )
+        assistant = AiMessage.objects.create(
+            conversation=conversation,
+            role='assistant',
+            content=assistant_message,
+            context_id=context_digest,
+            guardrail_flags=GUARDRAIL_FLAGS,
+            model_name=provider.model,
+            provider_name=provider.provider_name,
+        )
+        conversation.title = conversation.title or message[:80]
+        conversation.last_message_role = assistant.role
+        conversation.last_message_preview = assistant.content[:LAST_MESSAGE_PREVIEW_LENGTH]
+        conversation.last_message_at = assistant.created_at
+        conversation.save(update_fields=[
+            'title', 'last_message_role', 'last_message_preview', 'last_message_at', 'updated_at',
+        ])
+        update_conversation_summary(conversation)
+    return assistant
+
+
+def _conversation_history(conversation, payload):
+    if not payload.get('conversation_id'):
+        return '', []
+    return load_conversation_history(conversation)
+
+
+def _respond_payload(conversation, assistant, message, used_context, cached):
+    return {
+        'conversation_id': conversation.id,
+        'assistant_message': assistant.content,
+        'used_context': used_context,
+        'guardrail_flags': GUARDRAIL_FLAGS,
+        'suggested_followups': build_followups(used_context),
+        'map_actions': build_map_actions(message, used_context),
+        'message_id': assistant.id,
+        'cached': cached,
+    }
+
+
+def _rate_limited_response(exc):
+    return Response(
+        {'detail': str(exc)},
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={'Retry-After': str(exc.retry_after)},
+    )
+
+
 class AiTutorRespondView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -46,96 +149,348 @@ class AiTutorRespondView(APIView):
             logger.warning('AI Tutor context rejected for user=%s: %s', request.user.id, exc)
             return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
 
-        conversation = self._get_or_create_conversation(request.user, payload, lesson, quiz, classroom)
+        conversation = _get_conversation(request.user, payload)
         provider = AiProviderClient()
-        prompt_messages = build_prompt(payload['message'], used_context)
-        guardrail_flags = ['curriculum_locked', 'grounded_context_only']
+        summary, history = _conversation_history(conversation, payload)
+        prompt_messages = build_prompt(payload['message'], used_context, history, summary)
 
-        try:
-            assistant_message = provider.chat(prompt_messages)
-        except AiProviderError as exc:
-            logger.exception('AI Tutor provider error for user=%s conversation=%s', request.user.id, conversation.id)
-            return Response({'detail': str(exc)}, status=status.HTTP_502_BAD_GATEWAY)
-        except Exception:
-            logger.exception('AI Tutor unexpected provider failure for user=%s conversation=%s', request.user.id, conversation.id)
-            return Response({'detail': 'AI provider failed unexpectedly.'}, status=status.HTTP_502_BAD_GATEWAY)
-
-        assistant_message = normalize_assistant_message(assistant_message)
-
-        with transaction.atomic():
-            AiMessage.objects.create(
-                conversation=conversation,
-                role='user',
-                content=payload['message'],
-                context_snapshot=used_context,
-                guardrail_flags=guardrail_flags,
-                model_name=provider.model,
-                provider_name=provider.provider_name,
-            )
-            assistant = AiMessage.objects.create(
-                conversation=conversation,
-                role='assistant',
-                content=assistant_message,
-                context_snapshot=used_context,
-                guardrail_flags=guardrail_flags,
-                model_name=provider.model,
-                provider_name=provider.provider_name,
-            )
-            conversation.title = conversation.title or payload['message'][:80]
-            conversation.save(update_fields=['title', 'updated_at'])
+        cache_key = get_response_cache_key(payload['message'], used_context, provider.model, history, summary)
+        assistant_message = get_cached_response(cache_key)
+        cached = assistant_message is not None
+
+        # Only questions that may need a provider call spend rate-limit tokens
+        if not cached:
+            try:
+                check_rate_limits(request.user, classroom)
+            except AiTutorRateLimited as exc:
+                return _rate_limited_response(exc)
+        if conversation is None:
+            conversation = _create_conversation(request.user, payload, lesson, quiz, classroom)
+
+        if not cached:
+            def generate():
+                acquired = acquire_provider_slot()
+                try:
+                    answer = normalize_assistant_message(provider.chat(prompt_messages))
+                finally:
+                    if acquired:
+                        release_provider_slot()
+                store_cached_response(cache_key, answer)
+                return answer
 
-        map_actions = build_map_actions(payload['message'], used_context)
+            try:
+                # A classroom asking the same question at once shares one provider call
+                assistant_message, cached = coalesce_provider_call(cache_key, generate)
+            except AiTutorRateLimited as exc:
+                return _rate_limited_response(exc)
+            except AiProviderUnavailable as exc:
+                logger.warning('AI Tutor provider unavailable for user=%s: %s', request.user.id, exc)
+                return Response({'detail': str(exc)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            except AiProviderError as exc:
+                logger.exception('AI Tutor provider error for user=%s conversation=%s', request.user.id, conversation.id)
+                return Response({'detail': str(exc)}, status=status.HTTP_502_BAD_GATEWAY)
+            except Exception:
+                logger.exception('AI Tutor unexpected provider failure for user=%s conversation=%s', request.user.id, conversation.id)
+                return Response({'detail': 'AI provider failed unexpectedly.'}, status=status.HTTP_502_BAD_GATEWAY)
 
+        assistant = _record_exchange(conversation, payload['message'], assistant_message, used_context, provider)
         return Response(
-            {
-                'conversation_id': conversation.id,
-                'assistant_message': assistant.content,
-                'used_context': used_context,
-                'guardrail_flags': guardrail_flags,
-                'suggested_followups': build_followups(used_context),
-                'map_actions': map_actions,
-                'message_id': assistant.id,
-            },
+            _respond_payload(conversation, assistant, payload['message'], used_context, cached),
             status=status.HTTP_200_OK,
         )
 
-    def _get_or_create_conversation(self, user, payload, lesson, quiz, classroom):
-        conversation_id = payload.get('conversation_id')
-        if conversation_id:
-            return get_object_or_404(AiConversation, id=conversation_id, user=user)
-
-        return AiConversation.objects.create(
-            user=user,
-            lesson=lesson,
-            quiz=quiz,
-            classroom=classroom,
-            title=payload['message'][:80],
-            grade_level=payload['grade_level'],
-            semester=payload['semester'],
-            textbook_series=payload['textbook_series'],
-            module_code=payload.get('module_code', ''),
+
+def _sse_event(event, data):
+    return f'event: {event}\ndata: {json.dumps(data, ensure_ascii=False, cls=JSONEncoder)}\n\n'
+
+
+def _authenticate(request):
+    try:
+        result = JWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+
+def _rate_limited_json_response(exc):
+    response = JsonResponse({'detail': str(exc)}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+    response['Retry-After'] = str(exc.retry_after)
+    return response
+
+
+def _json_response(data, status_code=status.HTTP_200_OK):
+    return JsonResponse(data, status=status_code, encoder=JSONEncoder, json_dumps_params={'ensure_ascii': False})
+
+
+class _AsyncRespondRequest:
+    """Everything the async respond views need once a request is accepted."""
+
+    def __init__(self, user, payload, used_context, conversation, provider, prompt_messages, cache_key, cached_message):
+        self.user = user
+        self.payload = payload
+        self.used_context = used_context
+        self.conversation = conversation
+        self.prompt_messages = prompt_messages
+        self.cache_key = cache_key
+        self.cached_message = cached_message
+        self.provider = provider
+
+
+async def _prepare_async_respond(request):
+    """
+    Shared front half of the async respond views. Returns ``(error_response,
+    None)`` when the request is rejected, else ``(None, _AsyncRespondRequest)``.
+    All ORM work runs through sync_to_async.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=status.HTTP_405_METHOD_NOT_ALLOWED), None
+
+    user = await sync_to_async(_authenticate)(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=status.HTTP_401_UNAUTHORIZED), None
+
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'detail': 'Malformed JSON request body.'}, status=status.HTTP_400_BAD_REQUEST), None
+
+    serializer = AiTutorRespondSerializer(data=data)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST), None
+    payload = serializer.validated_data
+
+    try:
+        lesson, quiz, classroom, used_context = await sync_to_async(AiTutorContextBuilder(user).build)(payload)
+    except AiTutorContextError as exc:
+        logger.warning('AI Tutor context rejected for user=%s: %s', user.id, exc)
+        return JsonResponse({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST), None
+
+    conversation = await sync_to_async(_get_conversation)(user, payload)
+    provider = AiProviderClient()
+    summary, history = await sync_to_async(_conversation_history)(conversation, payload)
+    prompt_messages = build_prompt(payload['message'], used_context, history, summary)
+    cache_key = get_response_cache_key(payload['message'], used_context, provider.model, history, summary)
+    cached_message = await sync_to_async(get_cached_response)(cache_key)
+
+    if cached_message is None:
+        try:
+            await sync_to_async(check_rate_limits)(user, classroom)
+        except AiTutorRateLimited as exc:
+            return _rate_limited_json_response(exc), None
+    if conversation is None:
+        conversation = await sync_to_async(_create_conversation)(user, payload, lesson, quiz, classroom)
+    return None, _AsyncRespondRequest(
+        user, payload, used_context, conversation, provider, prompt_messages, cache_key, cached_message
+    )
+
+
+async def ai_tutor_respond_async(request):
+    """
+    POST /api/v1/ai-tutor/respond/async/
+
+    Async-native ``respond/``: same request and response bodies, but the
+    provider call is awaited on the event loop (httpx.AsyncClient), so a
+    slow answer occupies no thread while it is generated. Only useful when
+    served through ASGI (config/asgi.py); under WSGI use ``respond/``.
+    """
+    error, prepared = await _prepare_async_respond(request)
+    if error is not None:
+        return error
+
+    assistant_message = prepared.cached_message
+    cached = assistant_message is not None
+    if not cached:
+        async def generate():
+            acquired = await sync_to_async(acquire_provider_slot)()
+            try:
+                answer = normalize_assistant_message(await prepared.provider.achat(prepared.prompt_messages))
+            finally:
+                if acquired:
+                    await sync_to_async(release_provider_slot)()
+            await sync_to_async(store_cached_response)(prepared.cache_key, answer)
+            return answer
+
+        user_id, conversation_id = prepared.user.id, prepared.conversation.id
+        try:
+            assistant_message, cached = await acoalesce_provider_call(prepared.cache_key, generate)
+        except AiTutorRateLimited as exc:
+            return _rate_limited_json_response(exc)
+        except AiProviderUnavailable as exc:
+            logger.warning('AI Tutor provider unavailable for user=%s: %s', user_id, exc)
+            return JsonResponse({'detail': str(exc)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        except AiProviderError as exc:
+            logger.exception('AI Tutor provider error for user=%s conversation=%s', user_id, conversation_id)
+            return JsonResponse({'detail': str(exc)}, status=status.HTTP_502_BAD_GATEWAY)
+        except Exception:
+            logger.exception('AI Tutor unexpected provider failure for user=%s conversation=%s', user_id, conversation_id)
+            return JsonResponse({'detail': 'AI provider failed unexpectedly.'}, status=status.HTTP_502_BAD_GATEWAY)
+
+    assistant = await sync_to_async(_record_exchange)(
+        prepared.conversation, prepared.payload['message'], assistant_message, prepared.used_context, prepared.provider
+    )
+    body = await sync_to_async(_respond_payload)(
+        prepared.conversation, assistant, prepared.payload['message'], prepared.used_context, cached
+    )
+    return _json_response(body)
+
+
+async def _stream_response(prepared):
+    # The provider slot is taken and released inside the generator: a stream
+    # the server never iterates, or closes early, cannot leak it
+    conversation = prepared.conversation
+    holds_slot = False
+    try:
+        yield _sse_event('meta', {'conversation_id': conversation.id})
+
+        if prepared.cached_message is not None:
+            assistant_message = prepared.cached_message
+            yield _sse_event('token', {'delta': assistant_message})
+        else:
+            try:
+                holds_slot = await sync_to_async(acquire_provider_slot)()
+            except AiTutorRateLimited as exc:
+                yield _sse_event('error', {'detail': str(exc), 'retry_after': exc.retry_after})
+                return
+
+            chunks = []
+            try:
+                async for chunk in prepared.provider.astream_chat(prepared.prompt_messages):
+                    chunks.append(chunk)
+                    yield _sse_event('token', {'delta': chunk})
+            except AiProviderError as exc:
+                logger.exception('AI Tutor provider stream error for user=%s conversation=%s', prepared.user.id, conversation.id)
+                yield _sse_event('error', {'detail': str(exc)})
+                return
+            except Exception:
+                logger.exception('AI Tutor unexpected stream failure for user=%s conversation=%s', prepared.user.id, conversation.id)
+                yield _sse_event('error', {'detail': 'AI provider failed unexpectedly.'})
+                return
+
+            if holds_slot:
+                holds_slot = False
+                await sync_to_async(release_provider_slot)()
+
+            assistant_message = normalize_assistant_message(''.join(chunks))
+            if not assistant_message:
+                yield _sse_event('error', {'detail': 'AI provider response missing assistant content'})
+                return
+            await sync_to_async(store_cached_response)(prepared.cache_key, assistant_message)
+
+        message = prepared.payload['message']
+        assistant = await sync_to_async(_record_exchange)(
+            conversation, message, assistant_message, prepared.used_context, prepared.provider
+        )
+        body = await sync_to_async(_respond_payload)(
+            conversation, assistant, message, prepared.used_context, prepared.cached_message is not None
         )
+        yield _sse_event('done', body)
+    finally:
+        if holds_slot:
+            await sync_to_async(release_provider_slot)()
+
+
+async def ai_tutor_respond_stream(request):
+    """
+    POST /api/v1/ai-tutor/respond/stream/
+
+    Same request body as ``respond/``; the answer is relayed as server-sent
+    events while the provider generates it:
+
+        event: meta   {"conversation_id": ...}
+        event: token  {"delta": "..."}            (repeated)
+        event: done   same body as the respond/ response
+        event: error  {"detail": "..."}     (plus "retry_after" when the
+                                             provider is at capacity)
+
+    The messages are persisted once the stream completes. Tokens are only
+    flushed incrementally when served through ASGI (config/asgi.py).
+    """
+    error, prepared = await _prepare_async_respond(request)
+    if error is not None:
+        return error
+
+    response = StreamingHttpResponse(
+        _stream_response(prepared),
+        content_type='text/event-stream; charset=utf-8',
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Stop reverse proxies from buffering the event stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# Plain Django async views: mark them exempt the way APIView.as_view() does
+ai_tutor_respond_async.csrf_exempt = True
+ai_tutor_respond_stream.csrf_exempt = True
 
 
 class AiConversationListView(APIView):
     permission_classes = [IsAuthenticated]
+    pagination_class = RecentActivityCursorPagination
 
+    @extend_schema(responses=AiConversationListSerializer(many=True))
     def get(self, request):
-        queryset = AiConversation.objects.filter(user=request.user).prefetch_related('messages')
-        serializer = AiConversationListSerializer(queryset, many=True)
-        return Response(serializer.data)
+        # The last message is denormalized onto the conversation, so the list
+        # never touches ai_messages or the (large) rolling summary.
+        queryset = AiConversation.objects.filter(user=request.user).only(
+            'id', 'title', 'grade_level', 'semester', 'textbook_series', 'module_code', 'updated_at',
+            'last_message_role', 'last_message_preview', 'last_message_at',
+        )
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = AiConversationListSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
 
 class AiConversationDetailView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @extend_schema(parameters=[AiConversationMessagesQuerySerializer])
     def get(self, request, pk):
+        """
+        Conversation metadata plus one page of messages, oldest first.
+
+        Without a cursor the latest ``limit`` messages are returned; ``before``
+        pages back through older messages and ``after`` fetches only what was
+        added since the client last loaded. ``has_more`` tells whether another
+        page exists in that direction. Context snapshots are returned once per
+        distinct context in ``context_snapshots`` and referenced from each
+        message by ``context_ref`` (the AiContextSnapshot digest);
+        ``include_context=false`` skips them.
+        """
+        # dict(): BooleanField treats a missing key in a QueryDict as false
+        query = AiConversationMessagesQuerySerializer(data=request.query_params.dict())
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+
         conversation = get_object_or_404(
-            AiConversation.objects.filter(user=request.user).prefetch_related('messages'),
+            AiConversation.objects.filter(user=request.user).defer('summary'),
             pk=pk,
         )
-        serializer = AiConversationDetailSerializer(conversation)
-        return Response(serializer.data)
+        messages = AiMessage.objects.filter(conversation=conversation)
+        limit = params['limit']
+        if 'after' in params:
+            rows = list(messages.filter(id__gt=params['after']).order_by('id')[:limit + 1])
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+        else:
+            if 'before' in params:
+                messages = messages.filter(id__lt=params['before'])
+            rows = list(messages.order_by('-id')[:limit + 1])
+            has_more = len(rows) > limit
+            rows = rows[:limit][::-1]
+
+        data = AiConversationDetailSerializer(conversation).data
+        data['messages'] = AiMessageSerializer(rows, many=True).data
+        data['has_more'] = has_more
+        if params['include_context']:
+            for message, item in zip(rows, data['messages']):
+                item['context_ref'] = message.context_id
+            refs = {message.context_id for message in rows if message.context_id}
+            data['context_snapshots'] = dict(
+                AiContextSnapshot.objects.filter(digest__in=refs).values_list('digest', 'payload')
+            )
+        return Response(data)
 
 
 class AiMessageFeedbackView(APIView):
@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('classrooms', '0005_classroom_curriculum_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LessonProgressEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('classroom_id', models.PositiveIntegerField(help_text='Classroom the progress is for')),
+                ('lesson_id', models.PositiveIntegerField(help_text='Lesson the progress is for')),
+                ('current_step', models.PositiveIntegerField(default=0)),
+                ('progress_percent', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('status', models.CharField(choices=[('not_started', 'Not Started'), ('in_progress', 'In Progress'), ('completed', 'Completed')], default='in_progress', max_length=20)),
+                ('viewed_at', models.DateTimeField()),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('student', models.ForeignKey(help_text='Student who sent the beacon', on_delete=django.db.models.deletion.CASCADE, related_name='lesson_progress_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Lesson Progress Event',
+                'verbose_name_plural': 'Lesson Progress Events',
+                'db_table': 'lesson_progress_events',
+                'ordering': ['id'],
+            },
+        ),
+    ]
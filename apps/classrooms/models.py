@@ -435,3 +435,46 @@ class LessonProgress(models.Model):
 
     def __str__(self):
         return f"{self.student.email} - {self.lesson.title} ({self.progress_percent}%)"
+
+
+class LessonProgressEvent(models.Model):
+    """
+    Append-only staging row for progress records sent by page-unload beacons.
+
+    Rows are inserted without further validation and folded into
+    LessonProgress in bulk by the ``merge_lesson_progress`` command, which
+    deletes them once merged.
+
+    Fields:
+        id: Auto-incrementing primary key
+        classroom_id: Classroom the progress is for (validated when merged)
+        lesson_id: Lesson the progress is for (validated when merged)
+        student: Student the beacon token was issued to
+        current_step: Lesson step index reached
+        progress_percent: Completion percent reported by the player
+        status: Progress status reported by the player
+        viewed_at: Client-side time of the record, clamped to the receive time
+        received_at: When the beacon was accepted
+    """
+    classroom_id = models.PositiveIntegerField(help_text='Classroom the progress is for')
+    lesson_id = models.PositiveIntegerField(help_text='Lesson the progress is for')
+    student = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='lesson_progress_events',
+        help_text='Student who sent the beacon'
+    )
+    current_step = models.PositiveIntegerField(default=0)
+    progress_percent = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    status = models.CharField(max_length=20, choices=LessonProgress.STATUS_CHOICES, default='in_progress')
+    viewed_at = models.DateTimeField()
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'lesson_progress_events'
+        verbose_name = 'Lesson Progress Event'
+        verbose_name_plural = 'Lesson Progress Events'
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.student_id} - lesson {self.lesson_id} step {self.current_step}"
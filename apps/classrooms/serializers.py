@@ -1,6 +1,10 @@
 """
 Serializers for classroom and enrollment management.
 """
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
 from rest_framework import serializers
 from django.utils import timezone
 from apps.users.serializers import UserSerializer
@@ -597,6 +601,89 @@ class LessonProgressUpsertSerializer(serializers.Serializer):
         return value
 
 
+class LessonProgressEventSerializer(serializers.Serializer):
+    """A single progress event inside a batched progress update."""
+    classroom_id = serializers.IntegerField()
+    lesson_id = serializers.IntegerField()
+    current_step = serializers.IntegerField(min_value=0, required=False, default=0)
+    progress_percent = serializers.DecimalField(
+        max_digits=5, decimal_places=2, min_value=0, max_value=100, required=False, default=0
+    )
+    status = serializers.ChoiceField(choices=LessonProgress.STATUS_CHOICES, required=False, default='in_progress')
+
+
+class LessonProgressBatchSerializer(serializers.Serializer):
+    """Serializer for batched progress updates from the lesson viewer."""
+    MAX_EVENTS = 200
+
+    events = LessonProgressEventSerializer(many=True, allow_empty=False, max_length=MAX_EVENTS)
+
+    def validate_events(self, events):
+        """Check every classroom and lesson with one query each."""
+        user = self.context['request'].user
+        classroom_ids = {event['classroom_id'] for event in events}
+        lesson_ids = {event['lesson_id'] for event in events}
+
+        accessible = set(
+            Classroom.objects.filter(id__in=classroom_ids, is_published=True)
+            .filter(Q(teacher=user) | Q(enrollments__student=user))
+            .values_list('id', flat=True)
+        )
+        missing = classroom_ids - accessible
+        if missing:
+            raise serializers.ValidationError(
+                f'You do not have access to classroom(s): {", ".join(map(str, sorted(missing)))}.'
+            )
+
+        published = set(Lesson.objects.filter(id__in=lesson_ids, is_published=True).values_list('id', flat=True))
+        missing = lesson_ids - published
+        if missing:
+            raise serializers.ValidationError(f'Lesson(s) not found: {", ".join(map(str, sorted(missing)))}.')
+        return events
+
+
+class LessonProgressBeaconSerializer(serializers.Serializer):
+    """
+    Serializer for compact progress beacons sent on page unload.
+
+    Each record is ``[classroom_id, lesson_id, current_step, progress_percent, status]``
+    with an optional trailing client timestamp in epoch milliseconds. Access
+    to classrooms and lessons is checked when the records are merged.
+    """
+    RECORD_FIELDS = (
+        ('classroom_id', serializers.IntegerField(min_value=1)),
+        ('lesson_id', serializers.IntegerField(min_value=1)),
+        ('current_step', serializers.IntegerField(min_value=0)),
+        ('progress_percent', serializers.DecimalField(max_digits=5, decimal_places=2, min_value=0, max_value=100)),
+        ('status', serializers.ChoiceField(choices=LessonProgress.STATUS_CHOICES)),
+    )
+
+    token = serializers.CharField()
+    records = serializers.ListField(
+        child=serializers.ListField(min_length=len(RECORD_FIELDS), max_length=len(RECORD_FIELDS) + 1),
+        allow_empty=False,
+    )
+
+    def validate_records(self, records):
+        max_records = settings.LESSON_PROGRESS_BEACON_MAX_RECORDS
+        if len(records) > max_records:
+            raise serializers.ValidationError(f'At most {max_records} records per beacon.')
+
+        now = timezone.now()
+        parsed = []
+        for record in records:
+            item = {name: field.run_validation(value) for (name, field), value in zip(self.RECORD_FIELDS, record)}
+            viewed_at = now
+            if len(record) > len(self.RECORD_FIELDS):
+                try:
+                    viewed_at = min(now, datetime.fromtimestamp(float(record[-1]) / 1000, tz=dt_timezone.utc))
+                except (TypeError, ValueError, OverflowError, OSError):
+                    raise serializers.ValidationError('Record timestamps must be epoch milliseconds.')
+            item['viewed_at'] = viewed_at
+            parsed.append(item)
+        return parsed
+
+
 class StudentProgressSummarySerializer(serializers.Serializer):
     """Aggregated classroom progress metrics for a student."""
     student_id = serializers.UUIDField()
@@ -5,3 +5,11 @@ class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.core'
     verbose_name = 'Core Utilities'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import checks  # noqa: F401
+
+        from .metrics import install_query_recorder
+        connection_created.connect(install_query_recorder, dispatch_uid='core.install_query_recorder')
@@ -0,0 +1,24 @@
+"""
+System checks for deployment settings the core features depend on.
+"""
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+
+PROCESS_LOCAL_CACHES = ('LocMemCache', 'DummyCache')
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    backend = settings.CACHES['default']['BACKEND']
+    if backend.rsplit('.', 1)[-1] not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Warning(
+        f'The default cache ({backend}) is local to each process.',
+        hint=(
+            'AI tutor rate limits and single-flight locks, replica read pins, /metrics counters '
+            'and cache invalidations are only shared between processes through the default '
+            'cache. Point CACHE_BACKEND/CACHE_LOCATION at Redis when running several workers.'
+        ),
+        id='core.W001',
+    )]
@@ -0,0 +1,151 @@
+"""
+Database router that serves read-heavy apps from read replicas.
+
+Reads of models in DATABASE_REPLICA_APPS go to a random alias from
+DATABASE_REPLICAS while a request is being handled. Everything else reads
+from the primary:
+
+- writes, and reads inside transaction.atomic()
+- reads after the current request has written anything or is not a safe
+  method
+- reads for a user who wrote within the last DATABASE_REPLICA_PIN_SECONDS,
+  so a student never misses their own submission because of replication lag
+- reads outside a request (management commands, the grader loop)
+- reads inside primary_reads(), which wraps code that caches or stores what
+  it reads (answer keys, analytics, deadline feeds, lesson bundles) so a
+  lagging replica is never saved as the current state
+
+ReplicaRoutingMiddleware publishes the current request to the router and
+records the per-user pin after unsafe requests.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PRIMARY_PIN_PREFIX = 'db:primary-pin:user'
+
+_current_request = ContextVar('replica_routing_request', default=None)
+_force_primary = ContextVar('replica_routing_force_primary', default=False)
+
+
+@contextmanager
+def primary_reads():
+    """Route every read inside the block (or decorated function) to the primary."""
+    token = _force_primary.set(True)
+    try:
+        yield
+    finally:
+        _force_primary.reset(token)
+
+
+def primary_pin_key(user_id):
+    return f'{PRIMARY_PIN_PREFIX}:{user_id}'
+
+
+def pin_user_to_primary(user):
+    """Send the user's reads to the primary until replicas have caught up."""
+    cache.set(primary_pin_key(user.pk), True, timeout=settings.DATABASE_REPLICA_PIN_SECONDS)
+
+
+def _reads_from_primary(request):
+    if _force_primary.get() or request is None or request.method not in SAFE_METHODS:
+        return True
+    if getattr(request, '_db_primary_pinned', False) or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return True
+
+    # DRF copies the authenticated (JWT) user onto the Django request, so the
+    # user is only known once the view has started; check its pin once.
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return False
+    if getattr(request, '_db_pin_checked_for', None) != user.pk:
+        request._db_pin_checked_for = user.pk
+        request._db_primary_pinned = bool(cache.get(primary_pin_key(user.pk)))
+    return request._db_primary_pinned
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas or model._meta.app_label not in settings.DATABASE_REPLICA_APPS:
+            return None
+        if _reads_from_primary(_current_request.get()):
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        request = _current_request.get()
+        if request is not None:
+            request._db_primary_pinned = True
+            request._db_wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Make the current request visible to ReplicaRouter and, after a user's
+    unsafe request (or any request that wrote), pin that user's reads to the
+    primary for DATABASE_REPLICA_PIN_SECONDS.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        token = _current_request.set(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_request.reset(token)
+
+        if self.wrote(request):
+            self.pin_writer(request)
+        return response
+
+    async def __acall__(self, request):
+        token = _current_request.set(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_request.reset(token)
+
+        if self.wrote(request):
+            # request.user may still be the lazy session user, which queries
+            await sync_to_async(self.pin_writer)(request)
+        return response
+
+    def wrote(self, request):
+        return bool(settings.DATABASE_REPLICAS) and (
+            request.method not in SAFE_METHODS or getattr(request, '_db_wrote', False)
+        )
+
+    def pin_writer(self, request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            pin_user_to_primary(user)
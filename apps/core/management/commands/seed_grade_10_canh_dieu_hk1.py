@@ -11,9 +11,11 @@ from django.core.management.base import BaseCommand
 from django.db import transaction
 from django.utils import timezone
 
+from apps.ai_tutor.services import invalidate_curriculum_summaries, invalidate_response_cache
 from apps.classrooms.models import Assignment, Classroom, Enrollment
 from apps.gis_data.models import Boundary, LineFeature, MapLayer, PointOfInterest, PolygonFeature, Route, VietnamProvince
 from apps.lessons.models import Lesson, LessonStep, MapAction
+from apps.lessons.services import rebuild_lesson_bundle
 from apps.quizzes.models import Quiz, QuizAnswer, QuizQuestion
 from apps.users.models import User
 
@@ -644,3 +646,10 @@ class Command(BaseCommand):
                 assignment.resource_type = ''
                 assignment.resource_id = None
                 assignment.save(update_fields=['resource_type', 'resource_id'])
+
+        # The bulk updates above bypass the signals that keep lesson bundles,
+        # AI tutor summaries and cached answers current
+        for lesson_id in curated_lesson_ids:
+            rebuild_lesson_bundle(lesson_id)
+        invalidate_curriculum_summaries()
+        invalidate_response_cache(CURRICULUM)
@@ -0,0 +1,188 @@
+"""
+Per-endpoint request metrics in the Prometheus text format.
+
+RequestMetricsMiddleware measures every request and adds it to integer
+counters kept per (view, method, status class) in the default cache, so all
+gunicorn/uvicorn workers add to the same series and any of them can answer
+/metrics. Each process buffers its increments and adds them to the cache at
+most every METRICS_FLUSH_INTERVAL seconds, keeping cache round trips off the
+request path.
+
+SQL queries are timed by an execute wrapper installed on every database
+connection when it is created; it records into the list of the request
+currently being measured, which is carried in a context variable so queries
+run through sync_to_async from async views are counted as well.
+"""
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+
+
+METRICS_PREFIX = 'metrics'
+SERIES_INDEX_KEY = f'{METRICS_PREFIX}:series'
+DURATION_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+KNOWN_METHODS = {'GET', 'HEAD', 'OPTIONS', 'POST', 'PUT', 'PATCH', 'DELETE'}
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Durations are counted in microseconds so they can be added with cache.incr
+MICROSECONDS = 1_000_000
+METRICS = (
+    ('http_request_duration_seconds', 'histogram', 'Time spent handling the request.'),
+    ('http_response_size_bytes_total', 'counter', 'Bytes of (non-streaming) response bodies.'),
+    ('db_queries_total', 'counter', 'SQL queries run while handling requests.'),
+    ('db_query_duration_seconds_total', 'counter', 'Time spent in SQL queries while handling requests.'),
+)
+SECONDS_COUNTERS = {'http_request_duration_seconds_sum', 'db_query_duration_seconds_total'}
+
+_current_queries = ContextVar('request_metrics_queries', default=None)
+
+_pending = Counter()
+_pending_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+def record_query(execute, sql, params, many, context):
+    queries = _current_queries.get()
+    if queries is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        queries.append((time.perf_counter() - started, sql))
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """connection_created receiver: time the queries run on ``connection``."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def start_collecting_queries():
+    """Collect the (seconds, sql) of queries run from this context on; returns (queries, token)."""
+    queries = []
+    return queries, _current_queries.set(queries)
+
+
+def stop_collecting_queries(token):
+    _current_queries.reset(token)
+
+
+def record_request(view, method, status_code, duration, query_count, query_seconds, response_bytes=None):
+    """
+    Buffer one request's measurements. Returns True when the buffer is due
+    to be flushed with flush_metrics().
+    """
+    labels = (view, method if method in KNOWN_METHODS else 'other', f'{status_code // 100}xx')
+    with _pending_lock:
+        _pending[('http_request_duration_seconds_count', labels, None)] += 1
+        _pending[('http_request_duration_seconds_sum', labels, None)] += int(duration * MICROSECONDS)
+        for bucket in DURATION_BUCKETS:
+            if duration <= bucket:
+                _pending[('http_request_duration_seconds_bucket', labels, bucket)] += 1
+        _pending[('db_queries_total', labels, None)] += query_count
+        _pending[('db_query_duration_seconds_total', labels, None)] += int(query_seconds * MICROSECONDS)
+        if response_bytes is not None:
+            _pending[('http_response_size_bytes_total', labels, None)] += response_bytes
+        return time.monotonic() - _last_flush >= settings.METRICS_FLUSH_INTERVAL
+
+
+def _counter_key(name, labels, bucket=None):
+    key = ':'.join((METRICS_PREFIX, name, *labels))
+    return key if bucket is None else f'{key}:{bucket:g}'
+
+
+def flush_metrics():
+    """Add this process's buffered increments to the shared counters."""
+    global _pending, _last_flush
+    with _pending_lock:
+        pending, _pending = _pending, Counter()
+        _last_flush = time.monotonic()
+    if not pending:
+        return
+
+    # Register new series; re-checked on every flush, so a series lost to a
+    # concurrent update from another worker is added back the next time
+    index = set(cache.get(SERIES_INDEX_KEY) or ())
+    series = {labels for _, labels, _ in pending}
+    if not series <= index:
+        cache.set(SERIES_INDEX_KEY, sorted(index | series), timeout=None)
+
+    for (name, labels, bucket), value in pending.items():
+        if not value:
+            continue
+        key = _counter_key(name, labels, bucket)
+        try:
+            cache.incr(key, value)
+        except ValueError:
+            if not cache.add(key, value, timeout=None):
+                cache.incr(key, value)
+
+
+def _format_labels(labels, bucket=None):
+    names = ('view', 'method', 'status')
+    pairs = [
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in zip(names, labels)
+    ]
+    if bucket is not None:
+        pairs.append(('le', bucket))
+    return '{' + ','.join(f'{name}="{value}"' for name, value in pairs) + '}'
+
+
+def _format_value(name, value):
+    return f'{value / MICROSECONDS:.6f}' if name in SECONDS_COUNTERS else str(value)
+
+
+def render_metrics():
+    """Return every series in the Prometheus text exposition format."""
+    flush_metrics()
+    index = cache.get(SERIES_INDEX_KEY) or []
+
+    keys = []
+    for labels in index:
+        keys.append(_counter_key('http_request_duration_seconds_count', labels))
+        keys.append(_counter_key('http_request_duration_seconds_sum', labels))
+        keys.extend(_counter_key('http_request_duration_seconds_bucket', labels, bucket) for bucket in DURATION_BUCKETS)
+        keys.extend(_counter_key(name, labels) for name, kind, _ in METRICS if kind == 'counter')
+    values = cache.get_many(keys)
+
+    lines = []
+    for name, kind, description in METRICS:
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels in index:
+            if kind == 'counter':
+                lines.append(f'{name}{_format_labels(labels)} '
+                             f'{_format_value(name, values.get(_counter_key(name, labels), 0))}')
+                continue
+
+            for bucket in DURATION_BUCKETS:
+                count = values.get(_counter_key(f'{name}_bucket', labels, bucket), 0)
+                lines.append(f'{name}_bucket{_format_labels(labels, f"{bucket:g}")} {count}')
+            count = values.get(_counter_key(f'{name}_count', labels), 0)
+            lines.append(f'{name}_bucket{_format_labels(labels, "+Inf")} {count}')
+            total = values.get(_counter_key(f'{name}_sum', labels), 0)
+            lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(f"{name}_sum", total)}')
+            lines.append(f'{name}_count{_format_labels(labels)} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """
+    GET /metrics
+
+    Prometheus scrape endpoint. When METRICS_TOKEN is set the scraper must
+    send it as ``Authorization: Bearer <token>``.
+    """
+    token = settings.METRICS_TOKEN
+    if token and not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse('Unauthorized\n', status=401, content_type='text/plain')
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE)
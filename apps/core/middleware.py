@@ -0,0 +1,100 @@
+"""
+Request instrumentation middleware.
+"""
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+
+from .metrics import flush_metrics, record_request, start_collecting_queries, stop_collecting_queries
+
+logger = logging.getLogger(__name__)
+
+
+def _top_queries(queries, limit):
+    """Group identical SQL (parameters are separate) and return the most expensive."""
+    totals = {}
+    for seconds, sql in queries:
+        count, total = totals.get(sql, (0, 0.0))
+        totals[sql] = (count + 1, total + seconds)
+    return sorted(totals.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+
+
+class RequestMetricsMiddleware:
+    """
+    Measure every request: SQL query count and time, total time and response
+    size. The numbers go to the /metrics counters and to a Server-Timing
+    header; requests slower than REQUEST_SLOW_THRESHOLD_MS or running at
+    least REQUEST_SLOW_QUERY_COUNT queries (usually an N+1) are logged with
+    their most expensive queries.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        queries, token = start_collecting_queries()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            stop_collecting_queries(token)
+
+        if self.finish(request, response, time.perf_counter() - started, queries):
+            flush_metrics()
+        return response
+
+    async def __acall__(self, request):
+        queries, token = start_collecting_queries()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            stop_collecting_queries(token)
+
+        if self.finish(request, response, time.perf_counter() - started, queries):
+            await sync_to_async(flush_metrics)()
+        return response
+
+    def finish(self, request, response, duration, queries):
+        """Report one request; returns True when the metrics buffer should be flushed."""
+        query_seconds = sum(seconds for seconds, _ in queries)
+        response_bytes = None if response.streaming else len(response.content)
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+
+        if settings.REQUEST_SERVER_TIMING:
+            timing = (
+                f'db;desc="{len(queries)} queries";dur={query_seconds * 1000:.1f}, '
+                f'app;dur={(duration - query_seconds) * 1000:.1f}, '
+                f'total;dur={duration * 1000:.1f}'
+            )
+            if response.has_header('Server-Timing'):
+                timing = f'{response["Server-Timing"]}, {timing}'
+            response['Server-Timing'] = timing
+
+        if (duration * 1000 >= settings.REQUEST_SLOW_THRESHOLD_MS
+                or len(queries) >= settings.REQUEST_SLOW_QUERY_COUNT):
+            top = '\n'.join(
+                f'  {count}x {total * 1000:.1f} ms  {sql[:500]}'
+                for sql, (count, total) in _top_queries(queries, settings.REQUEST_SLOW_TOP_QUERIES)
+            )
+            logger.warning(
+                'Slow request %s %s (%s) -> %s: %.0f ms, %d queries in %.0f ms\n%s',
+                request.method, request.path, view, response.status_code,
+                duration * 1000, len(queries), query_seconds * 1000, top,
+            )
+
+        return record_request(
+            view, request.method, response.status_code, duration,
+            len(queries), query_seconds, response_bytes,
+        )
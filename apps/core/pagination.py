@@ -1,7 +1,7 @@
 """
 Custom pagination classes for API responses.
 """
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 from rest_framework.response import Response
 
 
@@ -29,3 +29,22 @@ class LargeResultsSetPagination(PageNumberPagination):
     page_size = 100
     page_size_query_param = 'page_size'
     max_page_size = 1000
+
+
+class RecentActivityCursorPagination(CursorPagination):
+    """
+    Keyset pagination for feeds ordered by most recent activity.
+
+    Pages are selected with ``WHERE updated_at < <cursor>`` instead of an
+    OFFSET, so later pages cost the same as the first and rows touched while
+    paging do not shift the results:
+    {
+        "next": "http://api.example.com/items/?cursor=cD0yMDI0...",
+        "previous": null,
+        "results": [...]
+    }
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-updated_at', '-id')
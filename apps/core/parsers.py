@@ -0,0 +1,14 @@
+"""
+Custom parser classes for API requests.
+"""
+from rest_framework.parsers import JSONParser
+
+
+class PlainTextJSONParser(JSONParser):
+    """
+    Parse JSON bodies sent as text/plain.
+
+    navigator.sendBeacon can only send CORS-safelisted content types without
+    a preflight, so beacon clients post their JSON payload as text/plain.
+    """
+    media_type = 'text/plain'
@@ -0,0 +1,172 @@
+from types import SimpleNamespace
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from apps.ai_tutor.models import AiConversation
+from apps.core.checks import check_shared_cache
+from apps.core.db_routers import ReplicaRouter, ReplicaRoutingMiddleware, primary_reads
+from apps.core.metrics import flush_metrics, metrics_view, record_query, render_metrics
+from apps.core.middleware import RequestMetricsMiddleware
+from apps.gis_data.models import MapLayer
+from apps.quizzes.models import QuizSubmission
+
+
+@override_settings(
+    DATABASE_REPLICAS=['replica_1'],
+    DATABASE_REPLICA_APPS=['gis_data', 'lessons', 'quizzes'],
+    DATABASE_REPLICA_PIN_SECONDS=10,
+)
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+        self.student = SimpleNamespace(pk=7, is_authenticated=True)
+
+    def route(self, request, *steps):
+        """Run ``steps`` (callables returning a value) inside the middleware."""
+        results = []
+
+        def view(request):
+            results.extend(step() for step in steps)
+            return SimpleNamespace()
+
+        ReplicaRoutingMiddleware(view)(request)
+        return results
+
+    def test_safe_requests_read_replicated_apps_from_replicas(self):
+        request = self.factory.get('/api/v1/layers/')
+        self.assertEqual(self.route(
+            request,
+            lambda: self.router.db_for_read(MapLayer),
+            lambda: self.router.db_for_read(QuizSubmission),
+            lambda: self.router.db_for_read(AiConversation),
+        ), ['replica_1', 'replica_1', None])
+
+    def test_reads_outside_a_request_use_the_primary(self):
+        self.assertEqual(self.router.db_for_read(QuizSubmission), 'default')
+
+    def test_unsafe_requests_and_writes_read_from_the_primary(self):
+        post = self.factory.post('/api/v1/quizzes/quiz_submissions/')
+        self.assertEqual(self.route(post, lambda: self.router.db_for_read(QuizSubmission)), ['default'])
+
+        get = self.factory.get('/api/v1/lessons/1/bundle/')
+        self.assertEqual(self.route(
+            get,
+            lambda: self.router.db_for_read(MapLayer),
+            lambda: self.router.db_for_write(QuizSubmission),
+            lambda: self.router.db_for_read(MapLayer),
+        ), ['replica_1', 'default', 'default'])
+
+    def test_user_reads_stick_to_the_primary_after_their_post(self):
+        post = self.factory.post('/api/v1/quizzes/quiz_submissions/')
+        post.user = self.student
+        self.route(post, lambda: self.router.db_for_write(QuizSubmission))
+
+        get = self.factory.get('/api/v1/quizzes/1/')
+        get.user = self.student
+        self.assertEqual(self.route(get, lambda: self.router.db_for_read(QuizSubmission)), ['default'])
+
+        other = self.factory.get('/api/v1/quizzes/1/')
+        other.user = SimpleNamespace(pk=8, is_authenticated=True)
+        self.assertEqual(self.route(other, lambda: self.router.db_for_read(QuizSubmission)), ['replica_1'])
+
+        cache.clear()
+        get = self.factory.get('/api/v1/quizzes/1/')
+        get.user = self.student
+        self.assertEqual(self.route(get, lambda: self.router.db_for_read(QuizSubmission)), ['replica_1'])
+
+    def test_primary_reads_block_overrides_replica_routing(self):
+        def read_for_cache():
+            with primary_reads():
+                return self.router.db_for_read(QuizSubmission)
+
+        request = self.factory.get('/api/v1/quizzes/1/analytics/')
+        self.assertEqual(self.route(
+            request,
+            read_for_cache,
+            lambda: self.router.db_for_read(QuizSubmission),
+        ), ['default', 'replica_1'])
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_the_router_defers_to_the_default(self):
+        request = self.factory.get('/api/v1/layers/')
+        self.assertEqual(self.route(request, lambda: self.router.db_for_read(MapLayer)), [None])
+
+    def test_replicas_are_never_migrated(self):
+        self.assertFalse(self.router.allow_migrate('replica_1', 'gis_data'))
+        self.assertIsNone(self.router.allow_migrate('default', 'gis_data'))
+
+
+def run_fake_query(sql):
+    return record_query(lambda sql, params, many, context: None, sql, (), False, {})
+
+
+@override_settings(
+    METRICS_FLUSH_INTERVAL=0,
+    METRICS_TOKEN='',
+    REQUEST_SERVER_TIMING=True,
+    REQUEST_SLOW_THRESHOLD_MS=60000,
+    REQUEST_SLOW_QUERY_COUNT=3,
+    REQUEST_SLOW_TOP_QUERIES=5,
+)
+class RequestMetricsMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        flush_metrics()
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def run_request(self, queries):
+        def view(request):
+            for sql in queries:
+                run_fake_query(sql)
+            return HttpResponse('{"ok": true}', content_type='application/json')
+
+        return RequestMetricsMiddleware(view)(self.factory.get('/api/v1/classrooms/1/students_progress/'))
+
+    def test_response_carries_server_timing_and_metrics_are_exported(self):
+        response = self.run_request(['SELECT 1', 'SELECT 2'])
+
+        self.assertRegex(response['Server-Timing'], r'^db;desc="2 queries";dur=[\d.]+, app;dur=[\d.]+, total;dur=[\d.]+$')
+        metrics = render_metrics()
+        labels = '{view="unmatched",method="GET",status="2xx"}'
+        self.assertIn(f'db_queries_total{labels} 2', metrics)
+        self.assertIn(f'http_response_size_bytes_total{labels} 12', metrics)
+        self.assertIn(f'http_request_duration_seconds_count{labels} 1', metrics)
+        self.assertIn('http_request_duration_seconds_bucket{view="unmatched",method="GET",status="2xx",le="+Inf"} 1', metrics)
+
+    def test_queries_outside_a_request_are_not_counted(self):
+        run_fake_query('SELECT 1')
+        self.run_request([])
+        self.assertIn('db_queries_total{view="unmatched",method="GET",status="2xx"} 0', render_metrics())
+
+    def test_request_with_many_queries_is_logged_with_top_queries(self):
+        with self.assertLogs('apps.core.middleware', level='WARNING') as logs:
+            self.run_request(['SELECT * FROM lesson_progress WHERE student_id = %s'] * 3 + ['SELECT 1'])
+
+        self.assertIn('4 queries', logs.output[0])
+        self.assertIn('3x', logs.output[0])
+        self.assertIn('lesson_progress', logs.output[0])
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_metrics_endpoint_requires_the_token_when_configured(self):
+        self.assertEqual(metrics_view(self.factory.get('/metrics')).status_code, 401)
+
+        response = metrics_view(self.factory.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-secret'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_process_local_cache_is_reported(self):
+        self.assertEqual([warning.id for warning in check_shared_cache(None)], ['core.W001'])
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://localhost:6379/0',
+    }})
+    def test_shared_cache_passes(self):
+        self.assertEqual(check_shared_cache(None), [])
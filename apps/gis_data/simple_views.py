@@ -1,12 +1,16 @@
 """
 Simple GIS API Views - Kh?ng c?n MapLayer model
 """
-from django.db import connection
+from asgiref.sync import sync_to_async
+from django.db import connections, router
+from django.http import JsonResponse
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 
+from .models import MapLayer
+
 TABLE_PROPERTY_FIELDS = {
     'points_of_interest': "'id', id, 'name', name, 'category', COALESCE(category, 'Unknown'), 'description', COALESCE(description, '')",
     'boundaries': "'id', id, 'name', name, 'category', COALESCE(type, 'Unknown'), 'code', COALESCE(code, ''), 'area_km2', COALESCE(area_km2, 0)",
@@ -39,7 +43,7 @@ class SimpleLayerViewSet(viewsets.ViewSet):
 
         where_sql = ' AND '.join(where_clauses)
 
-        with connection.cursor() as cursor:
+        with connections[router.db_for_read(MapLayer)].cursor() as cursor:
             cursor.execute(
                 """
                 SELECT id, name, data_source_table, geom_type, description, is_active,
@@ -70,7 +74,7 @@ class SimpleLayerViewSet(viewsets.ViewSet):
         return Response({'results': layers})
 
     def retrieve(self, request, pk=None):
-        with connection.cursor() as cursor:
+        with connections[router.db_for_read(MapLayer)].cursor() as cursor:
             cursor.execute(
                 """
                 SELECT id, name, data_source_table, geom_type, description, is_active,
@@ -102,53 +106,72 @@ class SimpleLayerViewSet(viewsets.ViewSet):
 
     @action(detail=True, methods=['get'], url_path='features')
     def features(self, request, pk=None):
-        with connection.cursor() as cursor:
-            cursor.execute(
-                """
-                SELECT data_source_table, filter_column, filter_value
-                FROM map_layers
-                WHERE id = %s
-                """,
-                [pk],
-            )
-            layer_info = cursor.fetchone()
+        body, status_code = load_layer_features(pk)
+        return Response(body, status=status_code)
 
-        if not layer_info:
-            return Response({'error': 'Layer not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        table_name, filter_column, filter_value = layer_info
-        if table_name not in TABLE_PROPERTY_FIELDS:
-            return Response({'error': f'Unsupported table: {table_name}'}, status=status.HTTP_400_BAD_REQUEST)
+async def layer_features_async(request, pk):
+    """
+    Async twin of SimpleLayerViewSet.features for ASGI workers: the GeoJSON
+    query runs in the sync_to_async thread pool, so a slow layer no longer
+    pins a server thread while the event loop keeps serving other requests.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
-        where_clause = 'WHERE geometry IS NOT NULL'
-        params = []
-        if filter_column and filter_value:
-            where_clause += f' AND {filter_column} = %s'
-            params.append(filter_value)
-
-        with connection.cursor() as cursor:
-            query = f"""
-                SELECT json_build_object(
-                    'type', 'FeatureCollection',
-                    'features', COALESCE(json_agg(
-                        json_build_object(
-                            'type', 'Feature',
-                            'id', id,
-                            'properties', json_build_object({TABLE_PROPERTY_FIELDS[table_name]}),
-                            'geometry', ST_AsGeoJSON(geometry)::json
-                        )
-                    ), '[]'::json)
-                ) AS geojson
-                FROM {table_name}
-                {where_clause};
-            """
-            try:
-                cursor.execute(query, params)
-                result = cursor.fetchone()
-            except Exception as exc:
-                return Response({'error': f'Database error: {exc}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    body, status_code = await sync_to_async(load_layer_features)(pk)
+    return JsonResponse(body, status=status_code)
 
-        if result and result[0]:
-            return Response(result[0])
 
-        return Response({'type': 'FeatureCollection', 'features': []})
+def load_layer_features(pk):
+    """Build a layer's FeatureCollection in PostGIS; returns (body, status code)."""
+    with connections[router.db_for_read(MapLayer)].cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT data_source_table, filter_column, filter_value
+            FROM map_layers
+            WHERE id = %s
+            """,
+            [pk],
+        )
+        layer_info = cursor.fetchone()
+
+    if not layer_info:
+        return {'error': 'Layer not found'}, status.HTTP_404_NOT_FOUND
+
+    table_name, filter_column, filter_value = layer_info
+    if table_name not in TABLE_PROPERTY_FIELDS:
+        return {'error': f'Unsupported table: {table_name}'}, status.HTTP_400_BAD_REQUEST
+
+    where_clause = 'WHERE geometry IS NOT NULL'
+    params = []
+    if filter_column and filter_value:
+        where_clause += f' AND {filter_column} = %s'
+        params.append(filter_value)
+
+    with connections[router.db_for_read(MapLayer)].cursor() as cursor:
+        query = f"""
+            SELECT json_build_object(
+                'type', 'FeatureCollection',
+                'features', COALESCE(json_agg(
+                    json_build_object(
+                        'type', 'Feature',
+                        'id', id,
+                        'properties', json_build_object({TABLE_PROPERTY_FIELDS[table_name]}),
+                        'geometry', ST_AsGeoJSON(geometry)::json
+                    )
+                ), '[]'::json)
+            ) AS geojson
+            FROM {table_name}
+            {where_clause};
+        """
+        try:
+            cursor.execute(query, params)
+            result = cursor.fetchone()
+        except Exception as exc:
+            return {'error': f'Database error: {exc}'}, status.HTTP_500_INTERNAL_SERVER_ERROR
+
+    if result and result[0]:
+        return result[0], status.HTTP_200_OK
+
+    return {'type': 'FeatureCollection', 'features': []}, status.HTTP_200_OK
@@ -3,7 +3,7 @@ URL configuration for gis_data app.
 """
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .simple_views import SimpleLayerViewSet
+from .simple_views import SimpleLayerViewSet, layer_features_async
 
 app_name = 'gis_data'
 
@@ -11,5 +11,6 @@ router = DefaultRouter()
 router.register(r'', SimpleLayerViewSet, basename='layer')
 
 urlpatterns = [
+    path('<int:pk>/features/async/', layer_features_async, name='layer-features-async'),
     path('', include(router.urls)),
 ]
@@ -2,7 +2,7 @@
 Admin configuration for lessons app.
 """
 from django.contrib import admin
-from .models import Lesson, LessonStep, MapAction
+from .models import Lesson, LessonBundle, LessonStep, MapAction
 
 
 class LessonStepInline(admin.TabularInline):
@@ -55,3 +55,15 @@ class MapActionAdmin(admin.ModelAdmin):
         payload_str = str(obj.payload)
         return payload_str[:50] + '...' if len(payload_str) > 50 else payload_str
     get_payload_preview.short_description = 'Payload Preview'
+
+
+@admin.register(LessonBundle)
+class LessonBundleAdmin(admin.ModelAdmin):
+    """Read-only view of compiled lesson bundles."""
+    list_display = ('lesson', 'version', 'content_hash', 'built_at')
+    search_fields = ('lesson__title',)
+    readonly_fields = ('lesson', 'version', 'content_hash', 'payload', 'built_at')
+
+    def has_add_permission(self, request):
+        """Bundles are compiled automatically from lesson content."""
+        return False
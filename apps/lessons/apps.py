@@ -5,3 +5,6 @@ class LessonsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.lessons'
     verbose_name = 'Interactive Lessons'
+
+    def ready(self):
+        from . import signals  # noqa: F401
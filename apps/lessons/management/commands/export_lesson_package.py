@@ -0,0 +1,47 @@
+"""
+Management command to export offline lesson packages.
+"""
+import shutil
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.lessons.models import Lesson
+from apps.lessons.offline import build_lesson_package
+
+
+class Command(BaseCommand):
+    help = 'Export published lessons as offline zip packages (bundle + clipped layer GeoJSON)'
+
+    def add_arguments(self, parser):
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument('--lesson-id', type=int, action='append', help='Lesson to export (repeatable)')
+        target.add_argument('--all', action='store_true', help='Export every published lesson')
+        parser.add_argument('--output', help='Directory to copy the packages into')
+        parser.add_argument('--force', action='store_true', help='Rebuild packages even if they are current')
+        parser.add_argument('--tolerance', type=float, help='Geometry simplification tolerance in degrees')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            lesson_ids = list(Lesson.objects.filter(is_published=True).order_by('id').values_list('id', flat=True))
+        else:
+            lesson_ids = options['lesson_id']
+
+        output = Path(options['output']) if options['output'] else None
+        if output:
+            output.mkdir(parents=True, exist_ok=True)
+
+        exported = 0
+        for lesson_id in lesson_ids:
+            path = build_lesson_package(lesson_id, tolerance=options['tolerance'], force=options['force'])
+            if path is None:
+                if not options['all']:
+                    raise CommandError(f'Lesson {lesson_id} does not exist or is not published')
+                continue
+
+            if output:
+                path = Path(shutil.copy2(path, output / f'lesson-{lesson_id}.zip'))
+            self.stdout.write(f'Lesson {lesson_id}: {path} ({path.stat().st_size} bytes)')
+            exported += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Exported {exported} lesson packages'))
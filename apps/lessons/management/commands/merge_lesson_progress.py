@@ -0,0 +1,49 @@
+"""
+Management command to merge staged lesson progress beacons.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.lessons.services import merge_progress_events
+
+
+class Command(BaseCommand):
+    help = 'Merge staged lesson progress beacon records into lesson progress'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Maximum number of staged records merged per transaction',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling the staging table instead of exiting once it is drained',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5.0,
+            help='Seconds to wait between polls when the staging table is empty (with --loop)',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        total = 0
+
+        while True:
+            processed = merge_progress_events(batch_size=batch_size)
+            total += processed
+
+            if processed:
+                self.stdout.write(f'Merged batch of {processed} progress records')
+                continue
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f'Merged {total} progress records'))
@@ -0,0 +1,28 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0003_lesson_curriculum_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LessonBundle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(default=1, help_text='Content version of the bundle')),
+                ('content_hash', models.CharField(help_text='SHA-256 of the canonical payload', max_length=64)),
+                ('payload', models.JSONField(default=dict, help_text='Compiled lesson content')),
+                ('built_at', models.DateTimeField(auto_now=True)),
+                ('lesson', models.OneToOneField(help_text='Lesson this bundle was compiled from', on_delete=django.db.models.deletion.CASCADE, related_name='bundle', to='lessons.lesson')),
+            ],
+            options={
+                'verbose_name': 'Lesson Bundle',
+                'verbose_name_plural': 'Lesson Bundles',
+                'db_table': 'lesson_bundles',
+            },
+        ),
+    ]
@@ -141,3 +141,37 @@ class LessonStep(models.Model):
 
     def __str__(self):
         return f"{self.lesson.title} - Step {self.order}"
+
+
+class LessonBundle(models.Model):
+    """
+    Precompiled playback payload for a lesson.
+
+    Rebuilt by lessons.signals whenever the lesson, its steps, map actions,
+    layers or linked quiz change, so detail requests only read one row.
+
+    Fields:
+        lesson: The lesson this bundle was compiled from
+        version: Incremented each time the compiled content changes
+        content_hash: SHA-256 of the canonical payload JSON (used as ETag)
+        payload: Steps, map actions, layer descriptors and linked quiz id
+        built_at: Timestamp of the last build
+    """
+    lesson = models.OneToOneField(
+        Lesson,
+        on_delete=models.CASCADE,
+        related_name='bundle',
+        help_text='Lesson this bundle was compiled from'
+    )
+    version = models.PositiveIntegerField(default=1, help_text='Content version of the bundle')
+    content_hash = models.CharField(max_length=64, help_text='SHA-256 of the canonical payload')
+    payload = models.JSONField(default=dict, help_text='Compiled lesson content')
+    built_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'lesson_bundles'
+        verbose_name = 'Lesson Bundle'
+        verbose_name_plural = 'Lesson Bundles'
+
+    def __str__(self):
+        return f"{self.lesson.title} bundle v{self.version}"
@@ -0,0 +1,255 @@
+"""
+Offline lesson packages.
+
+A package is a single zip archive holding everything a lesson needs to play
+without further API calls:
+
+    manifest.json           package metadata, extent and layer index
+    lesson.json             the compiled lesson bundle payload
+    layers/<layer_id>.geojson
+                            features of each linked layer, clipped to the
+                            lesson's map-action extent and simplified
+
+Archives are written under LESSON_PACKAGE_DIR and keyed by the bundle content
+hash and a shared GIS data version, so they are rebuilt whenever the lesson
+content or any packaged feature changes; a lesson's superseded archives are
+deleted once the new one is in place.
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+import uuid
+import zipfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router
+from django.utils import timezone
+
+from apps.core.db_routers import primary_reads
+from apps.gis_data.models import MapLayer
+from apps.gis_data.views import SUPPORTED_CUSTOM_TABLES
+from .services import get_lesson_bundle
+
+
+PACKAGE_FORMAT_VERSION = 1
+PACKAGE_DATA_VERSION_KEY = 'lessons:offline-package-data-version'
+PACKAGE_TABLES = SUPPORTED_CUSTOM_TABLES | {'vietnam_provinces'}
+IDENTIFIER_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+# Half the visible map width, in 512px tiles, around a flyTo center
+VIEWPORT_HALF_TILES = 1.5
+
+LAYER_FEATURES_SQL = """
+    SELECT json_build_object(
+        'type', 'FeatureCollection',
+        'features', COALESCE(json_agg(
+            json_build_object(
+                'type', 'Feature',
+                'id', src.id,
+                'properties', to_jsonb(src) - 'geometry' - 'packaged_geometry',
+                'geometry', ST_AsGeoJSON(src.packaged_geometry, %s)::json
+            )
+        ), '[]'::json)
+    )
+    FROM (
+        SELECT *,
+               ST_SimplifyPreserveTopology({geometry_expr}, %s) AS packaged_geometry
+        FROM {table}
+        WHERE {where_clause}
+    ) AS src
+    WHERE NOT ST_IsEmpty(src.packaged_geometry)
+"""
+
+
+def _action_extent(payload):
+    """Return the (xmin, ymin, xmax, ymax) a map action shows, if it has one."""
+    if not isinstance(payload, dict):
+        return None
+
+    bbox = payload.get('bbox')
+    if isinstance(bbox, (list, tuple)) and len(bbox) == 4:
+        return tuple(float(value) for value in bbox)
+
+    bounds = payload.get('bounds')
+    if isinstance(bounds, (list, tuple)) and len(bounds) == 2:
+        (xmin, ymin), (xmax, ymax) = bounds
+        return float(xmin), float(ymin), float(xmax), float(ymax)
+
+    center = payload.get('center')
+    if isinstance(center, (list, tuple)) and len(center) == 2:
+        zoom = float(payload.get('zoom') or 6)
+        half_width = 360.0 / (2 ** zoom) * VIEWPORT_HALF_TILES
+        lng, lat = float(center[0]), float(center[1])
+        return lng - half_width, lat - half_width, lng + half_width, lat + half_width
+
+    return None
+
+
+def lesson_extent(bundle_payload):
+    """
+    Union of the extents shown by the lesson's map actions.
+
+    Returns None when no step carries a usable extent, or when a step fits
+    the map to its layers (the player then ignores center/zoom and shows the
+    layers' full bounds), in which case layers are packaged unclipped.
+    """
+    extents = []
+    for step in bundle_payload.get('steps', []):
+        action = step.get('map_action') or {}
+        if isinstance(action.get('payload'), dict) and action['payload'].get('fit_to_layers'):
+            return None
+        try:
+            extent = _action_extent(action.get('payload'))
+        except (TypeError, ValueError):
+            extent = None
+        if extent:
+            extents.append(extent)
+
+    if not extents:
+        return None
+
+    return (
+        max(min(extent[0] for extent in extents), -180.0),
+        max(min(extent[1] for extent in extents), -90.0),
+        min(max(extent[2] for extent in extents), 180.0),
+        min(max(extent[3] for extent in extents), 90.0),
+    )
+
+
+def export_layer_features(layer, extent, tolerance, precision=6):
+    """
+    Export a layer as a GeoJSON FeatureCollection clipped to an extent.
+
+    Returns None for layers whose source table cannot be packaged.
+    """
+    table = layer.get('data_source_table')
+    if table not in PACKAGE_TABLES:
+        return None
+
+    where_clauses = ['geometry IS NOT NULL']
+    params = [precision, tolerance]
+    if extent:
+        geometry_expr = 'ST_Intersection(geometry, ST_MakeEnvelope(%s, %s, %s, %s, 4326))'
+        params[1:1] = list(extent)
+        where_clauses.append('geometry && ST_MakeEnvelope(%s, %s, %s, %s, 4326)')
+        params.extend(extent)
+    else:
+        geometry_expr = 'geometry'
+
+    filter_column = layer.get('filter_column')
+    if filter_column and layer.get('filter_value') and IDENTIFIER_RE.match(filter_column):
+        where_clauses.append(f'"{filter_column}" = %s')
+        params.append(layer['filter_value'])
+
+    query = LAYER_FEATURES_SQL.format(
+        geometry_expr=geometry_expr,
+        table=table,
+        where_clause=' AND '.join(where_clauses),
+    )
+    with connections[router.db_for_read(MapLayer)].cursor() as cursor:
+        cursor.execute(query, params)
+        row = cursor.fetchone()
+
+    return row[0] if row and row[0] else {'type': 'FeatureCollection', 'features': []}
+
+
+def package_data_version():
+    """Shared token that changes whenever a packaged feature table is edited."""
+    version = cache.get(PACKAGE_DATA_VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.add(PACKAGE_DATA_VERSION_KEY, version, timeout=None)
+        version = cache.get(PACKAGE_DATA_VERSION_KEY, version)
+    return version
+
+
+def invalidate_lesson_packages():
+    """Make the next request for any lesson build a fresh package."""
+    cache.set(PACKAGE_DATA_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+
+def package_path(lesson_id, content_hash, tolerance, data_version):
+    """Location of the archive for a given bundle version, feature data version and tolerance."""
+    key = f'{content_hash}:{data_version}:{tolerance}:{PACKAGE_FORMAT_VERSION}'
+    key = hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
+    return Path(settings.LESSON_PACKAGE_DIR) / f'lesson-{lesson_id}-{key}.zip'
+
+
+@primary_reads()
+def build_lesson_package(lesson_id, tolerance=None, force=False):
+    """
+    Build (or reuse) the offline package of a published lesson.
+
+    Features are read from the primary: an archive is stored under the
+    current data version, so it must not be built from a lagging replica.
+
+    Returns the archive path, or None if the lesson does not exist.
+    """
+    bundle = get_lesson_bundle(lesson_id)
+    if bundle is None:
+        return None
+
+    tolerance = settings.LESSON_PACKAGE_SIMPLIFY_TOLERANCE if tolerance is None else tolerance
+    data_version = package_data_version()
+    path = package_path(lesson_id, bundle.content_hash, tolerance, data_version)
+    if path.exists() and not force:
+        return path
+
+    extent = lesson_extent(bundle.payload)
+    manifest = {
+        'format_version': PACKAGE_FORMAT_VERSION,
+        'lesson_id': bundle.lesson_id,
+        'bundle_version': bundle.version,
+        'content_hash': bundle.content_hash,
+        'data_version': data_version,
+        'generated_at': timezone.now().isoformat(),
+        'extent': list(extent) if extent else None,
+        'simplify_tolerance': tolerance,
+        'layers': [],
+    }
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Concurrent first requests each build into their own temporary file in
+    # the same directory; the last complete archive atomically wins the rename
+    with tempfile.NamedTemporaryFile(dir=path.parent, prefix=f'.{path.stem}-', suffix='.tmp', delete=False) as tmp_file:
+        tmp_path = Path(tmp_file.name)
+    try:
+        with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=9) as archive:
+            archive.writestr('lesson.json', json.dumps(bundle.payload, ensure_ascii=False, separators=(',', ':')))
+
+            for layer in bundle.payload.get('layers', []):
+                collection = export_layer_features(layer, extent, tolerance)
+                if collection is None:
+                    manifest['layers'].append({'id': layer['id'], 'name': layer['name'], 'file': None, 'feature_count': 0})
+                    continue
+
+                file_name = f"layers/{layer['id']}.geojson"
+                archive.writestr(file_name, json.dumps(collection, ensure_ascii=False, separators=(',', ':')))
+                manifest['layers'].append({
+                    'id': layer['id'],
+                    'name': layer['name'],
+                    'file': file_name,
+                    'feature_count': len(collection.get('features') or []),
+                })
+
+            archive.writestr('manifest.json', json.dumps(manifest, ensure_ascii=False, indent=2))
+
+        with zipfile.ZipFile(tmp_path) as archive:
+            corrupt_member = archive.testzip()
+        if corrupt_member is not None:
+            raise zipfile.BadZipFile(f'Corrupt member {corrupt_member} in offline package {tmp_path.name}')
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+    # Archives of older bundle or data versions are never served again;
+    # every GIS edit would otherwise leave a full set behind
+    for stale in path.parent.glob(f'lesson-{lesson_id}-*.zip'):
+        if stale != path:
+            stale.unlink(missing_ok=True)
+    return path
@@ -95,3 +95,17 @@ class LessonProgressDetailSerializer(serializers.ModelSerializer):
             'last_viewed_at', 'completed_at'
         )
         read_only_fields = fields
+
+
+class LessonProgressRowSerializer(serializers.Serializer):
+    """Read serializer for progress rows returned by the batched upsert."""
+    id = serializers.IntegerField()
+    classroom = serializers.IntegerField()
+    lesson = serializers.IntegerField()
+    student = serializers.UUIDField()
+    current_step = serializers.IntegerField()
+    progress_percent = serializers.DecimalField(max_digits=5, decimal_places=2)
+    status = serializers.CharField()
+    started_at = serializers.DateTimeField(allow_null=True)
+    last_viewed_at = serializers.DateTimeField()
+    completed_at = serializers.DateTimeField(allow_null=True)
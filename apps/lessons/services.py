@@ -0,0 +1,250 @@
+"""
+Service helpers for the interactive lesson system.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core import signing
+from django.db import connection, transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+
+from apps.classrooms.models import Classroom, Enrollment, LessonProgressEvent
+from apps.core.db_routers import primary_reads
+from .models import Lesson, LessonBundle, LessonStep
+from .serializers import LessonDetailSerializer
+
+
+def compile_lesson_payload(lesson_id):
+    """
+    Compile the playback payload of a lesson.
+
+    Same shape as the lesson detail response minus the timestamps, so the
+    content hash only changes when the lesson content does. Returns None if
+    the lesson does not exist.
+    """
+    lesson = Lesson.objects.prefetch_related(
+        Prefetch('steps', queryset=LessonStep.objects.select_related('map_action').order_by('order')),
+        'layers',
+    ).filter(id=lesson_id).first()
+    if lesson is None:
+        return None
+
+    data = LessonDetailSerializer(lesson).data
+    data.pop('created_at', None)
+    data.pop('updated_at', None)
+    # Round-trip through JSON so the stored payload and the hash agree
+    return json.loads(json.dumps(data, cls=JSONEncoder))
+
+
+def hash_payload(payload):
+    """Return the SHA-256 of the canonical JSON form of a payload."""
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+@primary_reads()
+def rebuild_lesson_bundle(lesson_id):
+    """
+    Recompile a lesson bundle and store it if the content changed.
+
+    Returns the stored bundle, or None when the lesson no longer exists.
+    """
+    payload = compile_lesson_payload(lesson_id)
+    if payload is None:
+        return None
+
+    content_hash = hash_payload(payload)
+    bundle = LessonBundle.objects.filter(lesson_id=lesson_id).first()
+    if bundle is None:
+        return LessonBundle.objects.create(lesson_id=lesson_id, content_hash=content_hash, payload=payload)
+
+    if bundle.content_hash != content_hash:
+        bundle.version += 1
+        bundle.content_hash = content_hash
+        bundle.payload = payload
+        bundle.save(update_fields=['version', 'content_hash', 'payload', 'built_at'])
+    return bundle
+
+
+def get_lesson_bundle(lesson_id):
+    """Return the stored bundle of a published lesson, building it on first use."""
+    bundle = LessonBundle.objects.filter(lesson_id=lesson_id, lesson__is_published=True).first()
+    if bundle is None and Lesson.objects.filter(id=lesson_id, is_published=True).exists():
+        bundle = rebuild_lesson_bundle(lesson_id)
+    return bundle
+
+
+# Progress only moves forward: a later event never demotes the status.
+PROGRESS_STATUS_RANK = {'not_started': 0, 'in_progress': 1, 'completed': 2}
+
+PROGRESS_COLUMNS = (
+    'classroom_id', 'lesson_id', 'student_id', 'current_step', 'progress_percent',
+    'status', 'started_at', 'last_viewed_at', 'completed_at',
+)
+
+UPSERT_PROGRESS_SQL = """
+    INSERT INTO lesson_progress ({columns})
+    VALUES {values}
+    ON CONFLICT (classroom_id, lesson_id, student_id) DO UPDATE SET
+        current_step = GREATEST(lesson_progress.current_step, EXCLUDED.current_step),
+        progress_percent = GREATEST(lesson_progress.progress_percent, EXCLUDED.progress_percent),
+        status = CASE
+            WHEN 'completed' IN (lesson_progress.status, EXCLUDED.status) THEN 'completed'
+            WHEN 'in_progress' IN (lesson_progress.status, EXCLUDED.status) THEN 'in_progress'
+            ELSE lesson_progress.status
+        END,
+        started_at = COALESCE(lesson_progress.started_at, EXCLUDED.started_at),
+        last_viewed_at = GREATEST(lesson_progress.last_viewed_at, EXCLUDED.last_viewed_at),
+        completed_at = COALESCE(lesson_progress.completed_at, EXCLUDED.completed_at)
+    RETURNING id, {columns}
+"""
+
+
+def coalesce_progress_events(events):
+    """
+    Merge progress events into one record per (classroom, lesson, student).
+
+    Each event is a dict with classroom_id, lesson_id, student_id,
+    current_step, progress_percent, status and an optional viewed_at. The
+    merged record keeps the furthest step, the highest percent, the most
+    advanced status and the earliest/latest view times. Records come back
+    sorted by key so concurrent upserts lock rows in the same order.
+    """
+    merged = {}
+    for event in events:
+        key = (event['classroom_id'], event['lesson_id'], event['student_id'])
+        viewed_at = event.get('viewed_at')
+        record = merged.get(key)
+        if record is None:
+            merged[key] = {
+                'classroom_id': key[0],
+                'lesson_id': key[1],
+                'student_id': key[2],
+                'current_step': event['current_step'],
+                'progress_percent': event['progress_percent'],
+                'status': event['status'],
+                'first_viewed_at': viewed_at,
+                'last_viewed_at': viewed_at,
+            }
+            continue
+
+        record['current_step'] = max(record['current_step'], event['current_step'])
+        record['progress_percent'] = max(record['progress_percent'], event['progress_percent'])
+        if PROGRESS_STATUS_RANK[event['status']] > PROGRESS_STATUS_RANK[record['status']]:
+            record['status'] = event['status']
+        if viewed_at is not None:
+            record['first_viewed_at'] = min(filter(None, (record['first_viewed_at'], viewed_at)))
+            record['last_viewed_at'] = max(filter(None, (record['last_viewed_at'], viewed_at)))
+
+    return [merged[key] for key in sorted(merged, key=lambda key: (key[0], key[1], str(key[2])))]
+
+
+def upsert_lesson_progress(records, now=None):
+    """
+    Apply coalesced progress records with a single INSERT ... ON CONFLICT.
+
+    Existing rows only move forward (see UPSERT_PROGRESS_SQL). Returns the
+    resulting rows as dicts keyed like LessonProgressDetailSerializer.
+    """
+    if not records:
+        return []
+
+    now = now or timezone.now()
+    params = []
+    for record in records:
+        started_at = record.get('first_viewed_at') or now
+        viewed_at = record.get('last_viewed_at') or now
+        params.extend([
+            record['classroom_id'],
+            record['lesson_id'],
+            record['student_id'],
+            record['current_step'],
+            record['progress_percent'],
+            record['status'],
+            started_at,
+            viewed_at,
+            viewed_at if record['status'] == 'completed' else None,
+        ])
+
+    placeholders = '(' + ', '.join(['%s'] * len(PROGRESS_COLUMNS)) + ')'
+    query = UPSERT_PROGRESS_SQL.format(
+        columns=', '.join(PROGRESS_COLUMNS),
+        values=', '.join([placeholders] * len(records)),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+
+    keys = ('id', 'classroom', 'lesson', 'student', 'current_step', 'progress_percent',
+            'status', 'started_at', 'last_viewed_at', 'completed_at')
+    return [dict(zip(keys, row)) for row in rows]
+
+
+BEACON_TOKEN_SALT = 'lessons.progress-beacon'
+
+
+def issue_beacon_token(user):
+    """Sign a token that lets page-unload beacons post progress for a user."""
+    return signing.dumps(str(user.id), salt=BEACON_TOKEN_SALT, compress=True)
+
+
+def read_beacon_token(token):
+    """Return the user id a beacon token was issued to, or None if invalid or expired."""
+    try:
+        return signing.loads(token, salt=BEACON_TOKEN_SALT, max_age=settings.LESSON_PROGRESS_BEACON_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return None
+
+
+def merge_progress_events(batch_size=1000):
+    """
+    Fold staged beacon records into LessonProgress.
+
+    Claims up to ``batch_size`` staged rows (skipping rows another merger
+    holds), drops records for classrooms the student cannot access or
+    unpublished lessons, upserts the rest in one statement and deletes the
+    claimed rows. Returns the number of staged rows consumed.
+    """
+    with transaction.atomic():
+        events = list(
+            LessonProgressEvent.objects.select_for_update(skip_locked=True)
+            .order_by('id')
+            .values('id', 'classroom_id', 'lesson_id', 'student_id', 'current_step',
+                    'progress_percent', 'status', 'viewed_at')[:batch_size]
+        )
+        if not events:
+            return 0
+
+        classroom_ids = {event['classroom_id'] for event in events}
+        student_ids = {event['student_id'] for event in events}
+        allowed = set(
+            Enrollment.objects.filter(
+                classroom_id__in=classroom_ids,
+                student_id__in=student_ids,
+                classroom__is_published=True,
+            ).values_list('classroom_id', 'student_id')
+        )
+        allowed.update(
+            Classroom.objects.filter(
+                id__in=classroom_ids,
+                teacher_id__in=student_ids,
+                is_published=True,
+            ).values_list('id', 'teacher_id')
+        )
+        published = set(
+            Lesson.objects.filter(
+                id__in={event['lesson_id'] for event in events},
+                is_published=True,
+            ).values_list('id', flat=True)
+        )
+
+        upsert_lesson_progress(coalesce_progress_events(
+            event for event in events
+            if (event['classroom_id'], event['student_id']) in allowed and event['lesson_id'] in published
+        ))
+        LessonProgressEvent.objects.filter(id__in=[event['id'] for event in events]).delete()
+
+    return len(events)
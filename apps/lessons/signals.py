@@ -0,0 +1,95 @@
+"""
+Signal handlers that keep compiled lesson bundles and offline packages in
+sync with content edits.
+"""
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from apps.gis_data.models import (
+    Boundary,
+    LineFeature,
+    MapLayer,
+    PointOfInterest,
+    PolygonFeature,
+    Route,
+    VietnamProvince,
+)
+from apps.quizzes.models import Quiz
+from .models import Lesson, LessonStep, MapAction
+from .offline import invalidate_lesson_packages
+from .services import rebuild_lesson_bundle
+
+
+def rebuild_lesson_bundles(lesson_ids):
+    """Rebuild the bundles of several lessons, once each."""
+    for lesson_id in set(lesson_ids):
+        if lesson_id:
+            rebuild_lesson_bundle(lesson_id)
+
+
+@receiver(post_save, sender=Lesson)
+def rebuild_bundle_on_lesson_save(sender, instance, **kwargs):
+    """Lesson fields are part of the bundle."""
+    rebuild_lesson_bundle(instance.id)
+
+
+@receiver([post_save, post_delete], sender=LessonStep)
+def rebuild_bundle_on_step_change(sender, instance, **kwargs):
+    """Adding, editing or removing a step changes the playback sequence."""
+    # Steps deleted along with their lesson take the bundle with them
+    if isinstance(kwargs.get('origin'), Lesson):
+        return
+    rebuild_lesson_bundle(instance.lesson_id)
+
+
+@receiver(post_save, sender=MapAction)
+def rebuild_bundle_on_map_action_save(sender, instance, **kwargs):
+    """Map actions are embedded in every step that uses them."""
+    rebuild_lesson_bundles(LessonStep.objects.filter(map_action=instance).values_list('lesson_id', flat=True))
+
+
+@receiver(pre_delete, sender=MapAction)
+def remember_map_action_lessons(sender, instance, **kwargs):
+    # Steps are detached (SET_NULL) before post_delete fires, so capture them now
+    instance._bundle_lesson_ids = list(
+        LessonStep.objects.filter(map_action=instance).values_list('lesson_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=MapAction)
+def rebuild_bundle_on_map_action_delete(sender, instance, **kwargs):
+    rebuild_lesson_bundles(getattr(instance, '_bundle_lesson_ids', []))
+
+
+@receiver(m2m_changed, sender=Lesson.layers.through)
+def rebuild_bundle_on_layers_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Linking or unlinking layers changes the layer descriptors."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        rebuild_lesson_bundle(instance.id)
+    elif pk_set:
+        rebuild_lesson_bundles(pk_set)
+
+
+@receiver(post_save, sender=MapLayer)
+def rebuild_bundle_on_layer_save(sender, instance, **kwargs):
+    """Layer descriptors are copied into the bundles of lessons using the layer."""
+    rebuild_lesson_bundles(instance.lessons.values_list('id', flat=True))
+
+
+@receiver([post_save, post_delete], sender=Quiz)
+def rebuild_bundle_on_quiz_change(sender, instance, **kwargs):
+    """The linked quiz id depends on the lesson's published quizzes."""
+    rebuild_lesson_bundles([instance.lesson_id])
+
+
+@receiver([post_save, post_delete], sender=VietnamProvince)
+@receiver([post_save, post_delete], sender=PointOfInterest)
+@receiver([post_save, post_delete], sender=LineFeature)
+@receiver([post_save, post_delete], sender=PolygonFeature)
+@receiver([post_save, post_delete], sender=Boundary)
+@receiver([post_save, post_delete], sender=Route)
+def invalidate_packages_on_feature_change(sender, instance, **kwargs):
+    """Packages embed the clipped features of these tables, not just the bundle."""
+    invalidate_lesson_packages()
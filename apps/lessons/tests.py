@@ -0,0 +1,270 @@
+import io
+import json
+import shutil
+import tempfile
+import zipfile
+from decimal import Decimal
+from pathlib import Path
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.contrib.gis.geos import Point
+from django.db import router
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.classrooms.models import Classroom, Enrollment, LessonProgress, LessonProgressEvent
+from apps.core.db_routers import ReplicaRoutingMiddleware
+from apps.gis_data.models import MapLayer, PointOfInterest
+from apps.lessons.models import Lesson, LessonBundle, LessonStep, MapAction
+from apps.lessons.offline import build_lesson_package, package_data_version
+from apps.lessons.services import merge_progress_events
+
+
+User = get_user_model()
+
+
+class LessonBundleApiTests(APITestCase):
+    def setUp(self):
+        self.student = User.objects.create_user(
+            email='student-bundle@example.com',
+            password='password123',
+            role='student',
+        )
+        self.client.force_authenticate(user=self.student)
+        self.lesson = Lesson.objects.create(title='Bài 2', description='Bản đồ', module_code='module-01')
+        self.action = MapAction.objects.create(action_type='flyTo', payload={'center': [105.8, 21.0], 'zoom': 6})
+        LessonStep.objects.create(lesson=self.lesson, order=1, popup_text='Bước 1', map_action=self.action)
+        self.url = f'/api/v1/lessons/{self.lesson.id}/bundle/'
+
+    def test_bundle_is_compiled_on_save(self):
+        bundle = LessonBundle.objects.get(lesson=self.lesson)
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['ETag'], f'"{bundle.content_hash}"')
+        steps = response.data['lesson']['steps']
+        self.assertEqual(steps[0]['map_action']['action_type'], 'flyTo')
+
+    def test_versioned_url_is_long_cacheable_and_revalidates(self):
+        first = self.client.get(self.url)
+        versioned = self.client.get(first.data['versioned_url'])
+        revalidated = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertIn('immutable', versioned['Cache-Control'])
+        self.assertIn('must-revalidate', first['Cache-Control'])
+        self.assertEqual(revalidated.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_bundle_is_rebuilt_when_map_action_changes(self):
+        first = self.client.get(self.url)
+
+        self.action.payload = {'center': [106.7, 10.8], 'zoom': 7}
+        self.action.save()
+
+        second = self.client.get(self.url)
+        self.assertNotEqual(first['ETag'], second['ETag'])
+        self.assertEqual(second.data['version'], first.data['version'] + 1)
+        self.assertEqual(second.data['lesson']['steps'][0]['map_action']['payload']['zoom'], 7)
+
+
+class LessonOfflinePackageApiTests(APITestCase):
+    def setUp(self):
+        self.package_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.package_dir, ignore_errors=True)
+        settings_override = self.settings(LESSON_PACKAGE_DIR=self.package_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.student = User.objects.create_user(
+            email='student-offline@example.com',
+            password='password123',
+            role='student',
+        )
+        self.client.force_authenticate(user=self.student)
+        self.lesson = Lesson.objects.create(title='Bài 3', description='Địa hình', module_code='module-01')
+        action = MapAction.objects.create(action_type='flyTo', payload={'center': [105.8, 21.0], 'zoom': 8})
+        LessonStep.objects.create(lesson=self.lesson, order=1, popup_text='Bước 1', map_action=action)
+        self.url = f'/api/v1/lessons/{self.lesson.id}/offline-package/'
+
+    def test_package_contains_bundle_and_manifest(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        with zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content))) as archive:
+            manifest = json.loads(archive.read('manifest.json'))
+            lesson = json.loads(archive.read('lesson.json'))
+
+        bundle = LessonBundle.objects.get(lesson=self.lesson)
+        self.assertEqual(manifest['content_hash'], bundle.content_hash)
+        self.assertEqual(lesson['title'], 'Bài 3')
+        xmin, ymin, xmax, ymax = manifest['extent']
+        self.assertLess(xmin, 105.8)
+        self.assertGreater(xmax, 105.8)
+
+    def test_steps_fitting_to_layers_package_layers_unclipped(self):
+        action = MapAction.objects.create(action_type='flyTo', payload={
+            'center': [105.8, 21.0], 'zoom': 8, 'layers_off': 'all', 'layers_on': [1], 'fit_to_layers': True,
+        })
+        LessonStep.objects.create(lesson=self.lesson, order=2, popup_text='Bước 2', map_action=action)
+
+        with zipfile.ZipFile(build_lesson_package(self.lesson.id)) as archive:
+            manifest = json.loads(archive.read('manifest.json'))
+
+        self.assertIsNone(manifest['extent'])
+
+    def test_unchanged_package_returns_not_modified(self):
+        first = self.client.get(self.url)
+        second = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(second.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_feature_edits_rebuild_the_package(self):
+        first = build_lesson_package(self.lesson.id)
+        self.assertEqual(build_lesson_package(self.lesson.id), first)
+
+        PointOfInterest.objects.create(name='Hồ Gươm', category='lake', geometry=Point(105.85, 21.03, srid=4326))
+        second = build_lesson_package(self.lesson.id)
+
+        self.assertNotEqual(second, first)
+        self.assertEqual([entry.name for entry in Path(self.package_dir).iterdir()], [second.name])
+        with zipfile.ZipFile(second) as archive:
+            self.assertEqual(json.loads(archive.read('manifest.json'))['data_version'], package_data_version())
+
+    @override_settings(DATABASE_REPLICAS=['replica_1'], DATABASE_REPLICA_APPS=['gis_data', 'lessons'])
+    def test_package_features_are_read_from_the_primary_during_replica_routed_requests(self):
+        aliases = []
+
+        def export(layer, extent, tolerance):
+            aliases.append(router.db_for_read(MapLayer))
+            return {'type': 'FeatureCollection', 'features': []}
+
+        def view(request):
+            aliases.append(router.db_for_read(MapLayer))
+            with patch('apps.lessons.offline.get_lesson_bundle') as get_bundle, \
+                    patch('apps.lessons.offline.export_layer_features', side_effect=export):
+                get_bundle.return_value = LessonBundle(
+                    lesson=self.lesson, version=1, content_hash='abc',
+                    payload={'title': 'Bài 3', 'steps': [], 'layers': [{'id': 1, 'name': 'Tỉnh'}]},
+                )
+                build_lesson_package(self.lesson.id)
+            return HttpResponse()
+
+        ReplicaRoutingMiddleware(view)(RequestFactory().get(self.url))
+
+        self.assertEqual(aliases, ['replica_1', 'default'])
+
+    def test_failed_build_leaves_no_partial_package(self):
+        with patch('apps.lessons.offline.get_lesson_bundle') as get_bundle, \
+                patch('apps.lessons.offline.export_layer_features', side_effect=RuntimeError('db gone')):
+            get_bundle.return_value = LessonBundle(
+                lesson=self.lesson, version=1, content_hash='abc',
+                payload={'title': 'Bài 3', 'steps': [], 'layers': [{'id': 1, 'name': 'Tỉnh'}]},
+            )
+            with self.assertRaises(RuntimeError):
+                build_lesson_package(self.lesson.id)
+
+        self.assertEqual(list(Path(self.package_dir).iterdir()), [])
+
+        path = build_lesson_package(self.lesson.id)
+        self.assertEqual([entry.name for entry in Path(self.package_dir).iterdir()], [path.name])
+        with zipfile.ZipFile(path) as archive:
+            self.assertIsNone(archive.testzip())
+
+
+class LessonProgressBatchApiTests(APITestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            email='teacher-progress@example.com',
+            password='password123',
+            role='teacher',
+        )
+        self.student = User.objects.create_user(
+            email='student-progress@example.com',
+            password='password123',
+            role='student',
+        )
+        self.classroom = Classroom.objects.create(name='Lớp 10A4', teacher=self.teacher)
+        Enrollment.objects.create(student=self.student, classroom=self.classroom)
+        self.lesson = Lesson.objects.create(title='Bài 4', description='Khí hậu', module_code='module-01')
+        self.client.force_authenticate(user=self.student)
+        self.url = '/api/v1/lessons/progress/batch/'
+
+    def event(self, **overrides):
+        return {'classroom_id': self.classroom.id, 'lesson_id': self.lesson.id, **overrides}
+
+    def test_events_are_coalesced_into_one_row(self):
+        response = self.client.post(self.url, {'events': [
+            self.event(current_step=1, progress_percent='25.00'),
+            self.event(current_step=3, progress_percent='75.00'),
+            self.event(current_step=2, progress_percent='50.00'),
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['received'], 3)
+        self.assertEqual(response.data['applied'], 1)
+        progress = LessonProgress.objects.get(classroom=self.classroom, lesson=self.lesson, student=self.student)
+        self.assertEqual(progress.current_step, 3)
+        self.assertEqual(progress.progress_percent, Decimal('75.00'))
+        self.assertIsNotNone(progress.started_at)
+
+    def test_progress_never_moves_backwards(self):
+        self.client.post(self.url, {'events': [
+            self.event(current_step=4, progress_percent='100.00', status='completed'),
+        ]}, format='json')
+        self.client.post(self.url, {'events': [
+            self.event(current_step=1, progress_percent='20.00', status='in_progress'),
+        ]}, format='json')
+
+        progress = LessonProgress.objects.get(classroom=self.classroom, lesson=self.lesson, student=self.student)
+        self.assertEqual(progress.current_step, 4)
+        self.assertEqual(progress.status, 'completed')
+        self.assertIsNotNone(progress.completed_at)
+
+    def test_rejects_classroom_without_access(self):
+        other = Classroom.objects.create(name='Lớp 10A5', teacher=self.teacher)
+
+        response = self.client.post(self.url, {'events': [
+            self.event(classroom_id=other.id, current_step=1),
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(LessonProgress.objects.exists())
+
+    def test_beacon_records_are_merged_into_progress(self):
+        token = self.client.get('/api/v1/lessons/progress/beacon-token/').data['token']
+        self.client.force_authenticate(user=None)
+        other = Classroom.objects.create(name='Lớp 10A6', teacher=self.teacher)
+
+        response = self.client.post(
+            '/api/v1/lessons/progress/beacon/',
+            json.dumps({'token': token, 'records': [
+                [self.classroom.id, self.lesson.id, 2, '40.00', 'in_progress'],
+                [self.classroom.id, self.lesson.id, 5, '100.00', 'completed'],
+                [other.id, self.lesson.id, 1, '10.00', 'in_progress'],
+            ]}),
+            content_type='text/plain',
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(LessonProgressEvent.objects.count(), 3)
+        self.assertEqual(merge_progress_events(), 3)
+        self.assertFalse(LessonProgressEvent.objects.exists())
+        progress = LessonProgress.objects.get(student=self.student)
+        self.assertEqual(progress.classroom, self.classroom)
+        self.assertEqual(progress.current_step, 5)
+        self.assertEqual(progress.status, 'completed')
+
+    def test_beacon_rejects_bad_token(self):
+        self.client.force_authenticate(user=None)
+
+        response = self.client.post(
+            '/api/v1/lessons/progress/beacon/',
+            json.dumps({'token': 'forged', 'records': [[self.classroom.id, self.lesson.id, 1, '10', 'in_progress']]}),
+            content_type='text/plain',
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
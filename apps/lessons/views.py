@@ -1,16 +1,38 @@
 """
 Views for interactive lesson system.
 """
+from django.conf import settings
+from django.http import FileResponse
 from django.utils import timezone
+from django.utils.http import parse_etags
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.parsers import JSONParser
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
-from drf_spectacular.utils import extend_schema, OpenApiParameter
-from apps.classrooms.models import Classroom, Enrollment, LessonProgress
-from apps.classrooms.serializers import LessonProgressUpsertSerializer
+from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiResponse
+from apps.classrooms.models import Classroom, Enrollment, LessonProgress, LessonProgressEvent
+from apps.classrooms.serializers import (
+    LessonProgressBatchSerializer,
+    LessonProgressBeaconSerializer,
+    LessonProgressUpsertSerializer,
+)
+from apps.core.parsers import PlainTextJSONParser
 from .models import Lesson
-from .serializers import LessonListSerializer, LessonDetailSerializer, LessonProgressDetailSerializer
+from .offline import build_lesson_package
+from .serializers import (
+    LessonDetailSerializer,
+    LessonListSerializer,
+    LessonProgressDetailSerializer,
+    LessonProgressRowSerializer,
+)
+from .services import (
+    coalesce_progress_events,
+    get_lesson_bundle,
+    issue_beacon_token,
+    read_beacon_token,
+    upsert_lesson_progress,
+)
 
 
 CURATED_MODULE_CODES = [
@@ -82,6 +104,99 @@ class LessonViewSet(viewsets.ReadOnlyModelViewSet):
     def retrieve(self, request, *args, **kwargs):
         return super().retrieve(request, *args, **kwargs)
 
+    @extend_schema(
+        summary="Get compiled lesson bundle",
+        description=(
+            "Get the precompiled lesson bundle (steps, map actions, layer descriptors, linked quiz id). "
+            "Requests carrying the current content hash as `v` are cacheable for a long time."
+        ),
+        parameters=[OpenApiParameter(name='v', type=str, required=False, description='Bundle content hash')],
+        responses={
+            200: OpenApiResponse(description="Compiled lesson bundle"),
+            304: OpenApiResponse(description="Bundle unchanged"),
+            404: OpenApiResponse(description="Lesson not found"),
+        },
+        tags=['Lessons']
+    )
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated], url_path='bundle')
+    def bundle(self, request, pk=None):
+        """
+        GET /api/v1/lessons/{id}/bundle/
+
+        Serve the stored bundle with its content hash as ETag. The hash-versioned
+        URL (``?v=<content_hash>``) never changes content, so it gets a long
+        max-age; the plain URL must be revalidated.
+        """
+        try:
+            bundle = get_lesson_bundle(int(pk))
+        except (TypeError, ValueError):
+            bundle = None
+        if bundle is None:
+            return Response({'detail': 'Lesson not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+        etag = f'"{bundle.content_hash}"'
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response({
+                'lesson_id': bundle.lesson_id,
+                'version': bundle.version,
+                'content_hash': bundle.content_hash,
+                'versioned_url': f"{request.path}?v={bundle.content_hash}",
+                'lesson': bundle.payload,
+            })
+
+        response['ETag'] = etag
+        if request.query_params.get('v') == bundle.content_hash:
+            response['Cache-Control'] = f'private, max-age={settings.LESSON_BUNDLE_MAX_AGE}, immutable'
+        else:
+            response['Cache-Control'] = 'private, max-age=0, must-revalidate'
+        return response
+
+    @extend_schema(
+        summary="Download offline lesson package",
+        description=(
+            "Download a zip with the lesson bundle and the GeoJSON of every linked layer, "
+            "clipped to the lesson's map extent and simplified, for offline playback."
+        ),
+        responses={
+            200: OpenApiResponse(description="Zip archive (manifest.json, lesson.json, layers/*.geojson)"),
+            304: OpenApiResponse(description="Package unchanged"),
+            404: OpenApiResponse(description="Lesson not found"),
+        },
+        tags=['Lessons']
+    )
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated], url_path='offline-package')
+    def offline_package(self, request, pk=None):
+        """
+        GET /api/v1/lessons/{id}/offline-package/
+
+        The archive is built once per bundle and feature data version and
+        reused afterwards; its ETag is the package key so clients can skip
+        re-downloads.
+        """
+        try:
+            path = build_lesson_package(int(pk))
+        except (TypeError, ValueError):
+            path = None
+        if path is None:
+            return Response({'detail': 'Lesson not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+        etag = f'"{path.stem}"'
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = FileResponse(
+                path.open('rb'),
+                as_attachment=True,
+                filename=f'lesson-{pk}.zip',
+                content_type='application/zip',
+            )
+
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, max-age=0, must-revalidate'
+        return response
+
     @extend_schema(
         summary="Get lesson progress",
         description="Get current user's progress for this lesson in a classroom context",
@@ -159,3 +274,96 @@ class LessonViewSet(viewsets.ReadOnlyModelViewSet):
 
         result = LessonProgressDetailSerializer(progress)
         return Response(result.data)
+
+    @extend_schema(
+        summary="Batch update lesson progress",
+        description=(
+            "Apply several progress events at once. Events are coalesced per classroom and lesson "
+            "and written with a single upsert; step, percent and status never move backwards."
+        ),
+        request=LessonProgressBatchSerializer,
+        responses={200: OpenApiResponse(description="Resulting progress rows")},
+        tags=['Lessons']
+    )
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated], url_path='progress/batch')
+    def batch_progress(self, request):
+        """
+        POST /api/v1/lessons/progress/batch/
+
+        Body: {"events": [{"classroom_id", "lesson_id", "current_step", "progress_percent", "status"}, ...]}
+        """
+        serializer = LessonProgressBatchSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+
+        events = serializer.validated_data['events']
+        records = coalesce_progress_events(
+            {**event, 'student_id': request.user.id} for event in events
+        )
+        rows = upsert_lesson_progress(records)
+        return Response({
+            'received': len(events),
+            'applied': len(rows),
+            'progress': LessonProgressRowSerializer(rows, many=True).data,
+        })
+
+    @extend_schema(
+        summary="Get progress beacon token",
+        description=(
+            "Get a signed token for posting progress with navigator.sendBeacon, which cannot "
+            "send an Authorization header."
+        ),
+        responses={200: OpenApiResponse(description="Beacon token and its lifetime in seconds")},
+        tags=['Lessons']
+    )
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated], url_path='progress/beacon-token')
+    def beacon_token(self, request):
+        """
+        GET /api/v1/lessons/progress/beacon-token/
+        """
+        return Response({
+            'token': issue_beacon_token(request.user),
+            'expires_in': settings.LESSON_PROGRESS_BEACON_TOKEN_MAX_AGE,
+        })
+
+    @extend_schema(
+        summary="Send progress beacon",
+        description=(
+            "sendBeacon-compatible progress intake (JSON sent as text/plain). Records for several "
+            "lessons are staged as-is and merged into lesson progress in bulk by the "
+            "merge_lesson_progress command. Repeated beacons are harmless: merged progress never "
+            "moves backwards."
+        ),
+        request=LessonProgressBeaconSerializer,
+        responses={
+            204: OpenApiResponse(description="Records staged"),
+            400: OpenApiResponse(description="Malformed records"),
+            403: OpenApiResponse(description="Invalid or expired beacon token"),
+        },
+        tags=['Lessons']
+    )
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='progress/beacon',
+        authentication_classes=[],
+        permission_classes=[AllowAny],
+        parser_classes=[JSONParser, PlainTextJSONParser],
+    )
+    def beacon(self, request):
+        """
+        POST /api/v1/lessons/progress/beacon/
+
+        Body: {"token": "...", "records": [[classroom_id, lesson_id, current_step, progress_percent, status, ts_ms?], ...]}
+        """
+        serializer = LessonProgressBeaconSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        student_id = read_beacon_token(serializer.validated_data['token'])
+        if student_id is None:
+            return Response({'detail': 'Invalid or expired beacon token.'}, status=status.HTTP_403_FORBIDDEN)
+
+        LessonProgressEvent.objects.bulk_create([
+            LessonProgressEvent(student_id=student_id, **record)
+            for record in serializer.validated_data['records']
+        ])
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -2,7 +2,7 @@
 Admin configuration for quizzes app.
 """
 from django.contrib import admin
-from .models import Quiz, QuizQuestion, QuizAnswer, QuizSubmission
+from .models import BufferedQuizSubmission, Quiz, QuizQuestion, QuizAnswer, QuizSubmission
 
 
 class QuizAnswerInline(admin.TabularInline):
@@ -80,3 +80,17 @@ class QuizSubmissionAdmin(admin.ModelAdmin):
     def has_add_permission(self, request):
         """Prevent manual creation of submissions through admin."""
         return False
+
+
+@admin.register(BufferedQuizSubmission)
+class BufferedQuizSubmissionAdmin(admin.ModelAdmin):
+    """Admin interface for the buffered quiz submission intake."""
+    list_display = ('id', 'quiz_id', 'student', 'status', 'received_at', 'processed_at')
+    list_filter = ('status', 'received_at')
+    search_fields = ('student__email',)
+    readonly_fields = ('received_at', 'processed_at', 'answers')
+    raw_id_fields = ('student', 'submission')
+
+    def has_add_permission(self, request):
+        """Buffered rows are only written by the submission endpoint."""
+        return False
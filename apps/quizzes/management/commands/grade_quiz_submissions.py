@@ -0,0 +1,49 @@
+"""
+Management command to grade buffered quiz submissions in batches.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.quizzes.services import grade_buffered_submissions
+
+
+class Command(BaseCommand):
+    help = 'Grade pending buffered quiz submissions in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Maximum number of buffered submissions graded per transaction',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling the buffer instead of exiting once it is drained',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help='Seconds to wait between polls when the buffer is empty (with --loop)',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        total = 0
+
+        while True:
+            processed = grade_buffered_submissions(batch_size=batch_size)
+            total += processed
+
+            if processed:
+                self.stdout.write(f'Graded batch of {processed} buffered submissions')
+                continue
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f'Processed {total} buffered submissions'))
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('quizzes', '0005_quiz_curriculum_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BufferedQuizSubmission',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quiz_id', models.PositiveIntegerField(help_text='Quiz the answers are for')),
+                ('answers', models.JSONField(default=dict, help_text='Raw answers as {question_id: answer_id}')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('graded', 'Graded'), ('rejected', 'Rejected')], default='pending', max_length=10)),
+                ('error', models.TextField(blank=True, help_text='Reason the submission was rejected')),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('student', models.ForeignKey(help_text='Student who submitted the answers', on_delete=django.db.models.deletion.CASCADE, related_name='buffered_quiz_submissions', to=settings.AUTH_USER_MODEL)),
+                ('submission', models.ForeignKey(blank=True, help_text='Quiz submission produced by the grader', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='buffered_entries', to='quizzes.quizsubmission')),
+            ],
+            options={
+                'verbose_name': 'Buffered Quiz Submission',
+                'verbose_name_plural': 'Buffered Quiz Submissions',
+                'db_table': 'quiz_submission_buffer',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['status', 'id'], name='idx_quiz_buffer_status')],
+            },
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0006_bufferedquizsubmission'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bufferedquizsubmission',
+            name='question_results',
+            field=models.JSONField(blank=True, help_text='Per-question breakdown against the answer key used for grading', null=True),
+        ),
+    ]
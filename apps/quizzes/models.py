@@ -1,12 +1,64 @@
 """
 Models for quiz and assessment system.
 """
+from datetime import timedelta
+
 from django.db import models
+from django.db.models import Q
 from django.conf import settings
 from django.utils import timezone
 from apps.classrooms.models import Classroom
 
 
+DEADLINE_COLORS = {
+    'overdue': 'red',
+    'due_soon': 'yellow',
+    'upcoming_soon': 'yellow',
+    'upcoming': 'green',
+    'no_deadline': 'gray',
+}
+
+
+def get_deadline_status(due_date, now=None):
+    """
+    Get deadline status for a due date.
+    Returns: 'upcoming', 'upcoming_soon', 'due_soon', 'overdue', or 'no_deadline'
+    """
+    if not due_date:
+        return 'no_deadline'
+
+    now = now or timezone.now()
+    if now > due_date:
+        return 'overdue'
+
+    time_left = due_date - now
+    if time_left.days < 1:  # Less than 24 hours
+        return 'due_soon'
+    elif time_left.days <= 7:  # 1-7 days
+        return 'upcoming_soon'
+
+    return 'upcoming'
+
+
+def deadline_status_filter(status, now=None):
+    """
+    Translate a deadline status into an equivalent ``due_date`` filter.
+
+    Mirrors get_deadline_status so the status can be applied in SQL.
+    Returns None for statuses that can never match a dated quiz.
+    """
+    now = now or timezone.now()
+    if status == 'overdue':
+        return Q(due_date__lt=now)
+    if status == 'due_soon':
+        return Q(due_date__gte=now, due_date__lt=now + timedelta(days=1))
+    if status == 'upcoming_soon':
+        return Q(due_date__gte=now + timedelta(days=1), due_date__lt=now + timedelta(days=8))
+    if status == 'upcoming':
+        return Q(due_date__gte=now + timedelta(days=8))
+    return None
+
+
 class Quiz(models.Model):
     """
     Quiz model for assessments.
@@ -88,20 +140,7 @@ class Quiz(models.Model):
         Get deadline status.
         Returns: 'upcoming', 'due_soon', 'overdue', or 'no_deadline'
         """
-        if not self.due_date:
-            return 'no_deadline'
-
-        now = timezone.now()
-        if now > self.due_date:
-            return 'overdue'
-
-        time_left = self.due_date - now
-        if time_left.days < 1:  # Less than 24 hours
-            return 'due_soon'
-        elif time_left.days <= 7:  # 1-7 days
-            return 'upcoming_soon'
-
-        return 'upcoming'
+        return get_deadline_status(self.due_date)
 
     @property
     def deadline_color(self):
@@ -109,14 +148,7 @@ class Quiz(models.Model):
         Get color hint for frontend.
         Returns: 'green', 'yellow', or 'red'
         """
-        status = self.deadline_status
-        if status == 'overdue':
-            return 'red'
-        elif status in ['due_soon', 'upcoming_soon']:
-            return 'yellow'
-        elif status == 'upcoming':
-            return 'green'
-        return 'gray'  # no_deadline
+        return DEADLINE_COLORS[self.deadline_status]
 
 
 class QuizQuestion(models.Model):
@@ -245,3 +277,70 @@ class QuizSubmission(models.Model):
     def final_score(self):
         """Return adjusted score if exists, else auto-calculated score."""
         return self.adjusted_score if self.adjusted_score is not None else self.score
+
+
+class BufferedQuizSubmission(models.Model):
+    """
+    Append-only intake row for quiz submissions accepted in buffered mode.
+
+    Rows are written with no validation beyond the payload shape and graded
+    later in batches by the ``grade_quiz_submissions`` command.
+
+    Fields:
+        id: Auto-incrementing primary key
+        quiz_id: Quiz the answers are for (validated when graded)
+        student: Student who submitted
+        answers: Raw {question_id: answer_id} payload
+        status: pending, graded or rejected
+        error: Reason the row was rejected
+        submission: Resulting quiz submission once graded
+        question_results: Per-question breakdown recorded by the grader
+        received_at: When the submission was accepted
+        processed_at: When the grader handled the row
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_GRADED = 'graded'
+    STATUS_REJECTED = 'rejected'
+    STATUS_CHOICES = (
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_GRADED, 'Graded'),
+        (STATUS_REJECTED, 'Rejected'),
+    )
+
+    quiz_id = models.PositiveIntegerField(help_text='Quiz the answers are for')
+    student = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='buffered_quiz_submissions',
+        help_text='Student who submitted the answers'
+    )
+    answers = models.JSONField(default=dict, help_text='Raw answers as {question_id: answer_id}')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    error = models.TextField(blank=True, help_text='Reason the submission was rejected')
+    submission = models.ForeignKey(
+        QuizSubmission,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='buffered_entries',
+        help_text='Quiz submission produced by the grader'
+    )
+    question_results = models.JSONField(
+        null=True,
+        blank=True,
+        help_text='Per-question breakdown against the answer key used for grading'
+    )
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'quiz_submission_buffer'
+        verbose_name = 'Buffered Quiz Submission'
+        verbose_name_plural = 'Buffered Quiz Submissions'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'id'], name='idx_quiz_buffer_status'),
+        ]
+
+    def __str__(self):
+        return f"Buffered submission {self.id} for quiz {self.quiz_id} ({self.status})"
@@ -3,14 +3,29 @@ Serializers for quiz and assessment system.
 """
 from rest_framework import serializers
 from django.utils import timezone
-from .models import Quiz, QuizQuestion, QuizAnswer, QuizSubmission
+from .models import BufferedQuizSubmission, Quiz, QuizQuestion, QuizAnswer, QuizSubmission
+from .services import check_answers, get_answer_key, get_curated_quiz_queryset, grade_answers
 
 
-CURATED_MODULE_CODES = {'module-01', 'module-02', 'module-03', 'module-04', 'module-05', 'module-06'}
+def format_time_remaining(due_date, now=None):
+    """Get human-readable time remaining until deadline."""
+    if not due_date:
+        return None
 
+    now = now or timezone.now()
+    if now > due_date:
+        return 'Overdue'
 
-def get_curated_quiz_queryset():
-    return Quiz.objects.filter(is_published=True, module_code__in=CURATED_MODULE_CODES)
+    time_left = due_date - now
+    days = time_left.days
+    hours = time_left.seconds // 3600
+
+    if days > 0:
+        return f"{days} day{'s' if days != 1 else ''}"
+    elif hours > 0:
+        return f"{hours} hour{'s' if hours != 1 else ''}"
+    else:
+        return "Less than 1 hour"
 
 
 class QuizAnswerSerializer(serializers.ModelSerializer):
@@ -111,63 +126,36 @@ class QuizSubmissionCreateSerializer(serializers.Serializer):
         help_text='Dictionary of question_id: answer_id'
     )
 
-    def validate_quiz_id(self, value):
-        """Validate that the quiz exists and is curated."""
-        if not get_curated_quiz_queryset().filter(id=value).exists():
-            raise serializers.ValidationError("Quiz not found.")
-        return value
-
     def validate(self, attrs):
-        """Validate the answers."""
-        quiz_id = attrs['quiz_id']
-        answers = attrs['answers']
-
-        # Get all questions for this quiz
-        quiz = get_curated_quiz_queryset().get(id=quiz_id)
-        questions = quiz.questions.all()
-
-        # Check that all questions are answered
-        question_ids = set(str(q.id) for q in questions)
-        answer_question_ids = set(answers.keys())
-
-        if question_ids != answer_question_ids:
-            raise serializers.ValidationError(
-                "All questions must be answered."
-            )
-
-        # Validate that all answer IDs are valid
-        for question_id, answer_id in answers.items():
-            try:
-                question = QuizQuestion.objects.get(id=question_id)
-                QuizAnswer.objects.get(id=answer_id, question=question)
-            except (QuizQuestion.DoesNotExist, QuizAnswer.DoesNotExist):
-                raise serializers.ValidationError(
-                    f"Invalid answer ID {answer_id} for question {question_id}."
-                )
+        """Validate the answers against the quiz's cached answer key."""
+        quiz = get_curated_quiz_queryset().filter(id=attrs['quiz_id']).first()
+        if quiz is None:
+            raise serializers.ValidationError({'quiz_id': "Quiz not found."})
+
+        answer_key = get_answer_key(quiz.id)
 
+        # Check that all questions are answered with valid answer IDs
+        error = check_answers(answer_key, attrs['answers'])
+        if error:
+            raise serializers.ValidationError(error)
+
+        attrs['quiz'] = quiz
+        attrs['answer_key'] = answer_key
         return attrs
 
     def create(self, validated_data):
         """
         Create a quiz submission and calculate the score.
         Auto-detects late submissions based on quiz deadline.
+
+        The per-question breakdown is attached as ``question_results``.
         """
-        quiz_id = validated_data['quiz_id']
+        quiz = validated_data['quiz']
         answers = validated_data['answers']
         student = self.context['request'].user
 
-        quiz = get_curated_quiz_queryset().get(id=quiz_id)
-
         # Calculate score
-        total_questions = quiz.questions.count()
-        correct_answers = 0
-
-        for question_id, answer_id in answers.items():
-            answer = QuizAnswer.objects.get(id=answer_id)
-            if answer.is_correct:
-                correct_answers += 1
-
-        score = int((correct_answers / total_questions) * 100) if total_questions > 0 else 0
+        score, question_results = grade_answers(validated_data['answer_key'], answers)
 
         # Check if submission is late
         is_late = False
@@ -185,10 +173,47 @@ class QuizSubmissionCreateSerializer(serializers.Serializer):
                 'is_late': is_late
             }
         )
+        submission.question_results = question_results
 
         return submission
 
 
+class BufferedQuizSubmissionCreateSerializer(serializers.Serializer):
+    """
+    Serializer for accepting quiz answers into the submission buffer.
+
+    Only the payload shape is checked here; answers are validated and
+    scored later by the batch grader.
+    """
+    quiz_id = serializers.IntegerField(min_value=1)
+    answers = serializers.DictField(
+        child=serializers.CharField(),
+        help_text='Dictionary of question_id: answer_id'
+    )
+
+    def create(self, validated_data):
+        return BufferedQuizSubmission.objects.create(
+            quiz_id=validated_data['quiz_id'],
+            student=self.context['request'].user,
+            answers=validated_data['answers'],
+        )
+
+
+class BufferedQuizSubmissionStatusSerializer(serializers.ModelSerializer):
+    """
+    Serializer for polling a buffered quiz submission.
+    """
+    buffer_id = serializers.IntegerField(source='id', read_only=True)
+    submission_id = serializers.IntegerField(read_only=True)
+    score = serializers.IntegerField(source='submission.score', read_only=True, default=None)
+
+    class Meta:
+        model = BufferedQuizSubmission
+        fields = ('buffer_id', 'quiz_id', 'status', 'error', 'submission_id', 'score',
+                  'question_results', 'received_at', 'processed_at')
+        read_only_fields = fields
+
+
 class QuizSubmissionSerializer(serializers.ModelSerializer):
     """
     Serializer for quiz submission results.
@@ -238,23 +263,7 @@ class QuizDeadlineSerializer(serializers.ModelSerializer):
 
     def get_time_remaining(self, obj):
         """Get human-readable time remaining until deadline."""
-        if not obj.due_date:
-            return None
-
-        now = timezone.now()
-        if now > obj.due_date:
-            return 'Overdue'
-
-        time_left = obj.due_date - now
-        days = time_left.days
-        hours = time_left.seconds // 3600
-
-        if days > 0:
-            return f"{days} day{'s' if days != 1 else ''}"
-        elif hours > 0:
-            return f"{hours} hour{'s' if hours != 1 else ''}"
-        else:
-            return "Less than 1 hour"
+        return format_time_remaining(obj.due_date)
 
 
 class QuizSubmissionReviewSerializer(serializers.ModelSerializer):
@@ -0,0 +1,407 @@
+"""
+Service helpers for the quiz and assessment system.
+"""
+import hashlib
+import json
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router, transaction
+from django.db.models import Avg, Count, Max, Min, Value
+from django.db.models.functions import Coalesce, Least
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+
+from apps.classrooms.models import Classroom, Enrollment
+from apps.core.db_routers import primary_reads
+from .models import BufferedQuizSubmission, Quiz, QuizAnswer, QuizQuestion, QuizSubmission
+
+
+CURATED_MODULE_CODES = {'module-01', 'module-02', 'module-03', 'module-04', 'module-05', 'module-06'}
+DEADLINE_FEED_CACHE_PREFIX = 'quizzes:deadlines'
+ANSWER_KEY_CACHE_PREFIX = 'quizzes:answer-key'
+ANALYTICS_CACHE_PREFIX = 'quizzes:analytics'
+
+
+def get_curated_quiz_queryset():
+    return Quiz.objects.filter(is_published=True, module_code__in=CURATED_MODULE_CODES)
+
+
+def _deadline_feed_version_key(user_id):
+    return f'{DEADLINE_FEED_CACHE_PREFIX}:version:{user_id}'
+
+
+def get_deadline_feed_cache_key(user_id, status_filter=None, classroom_id=None):
+    """
+    Build the cache key for one user's deadline feed.
+
+    Keys embed a per-user version token, so invalidating a user only has to
+    replace that token instead of finding every filtered variant of the feed.
+    """
+    version_key = _deadline_feed_version_key(user_id)
+    version = cache.get(version_key)
+    if version is None:
+        cache.add(version_key, uuid.uuid4().hex, None)
+        version = cache.get(version_key)
+    return f'{DEADLINE_FEED_CACHE_PREFIX}:{user_id}:{version}:{status_filter or ""}:{classroom_id or ""}'
+
+
+def invalidate_deadline_feeds(user_ids):
+    """Drop the cached deadline feeds of the given users."""
+    user_ids = {user_id for user_id in user_ids if user_id}
+    if user_ids:
+        cache.set_many({_deadline_feed_version_key(user_id): uuid.uuid4().hex for user_id in user_ids}, None)
+
+
+def get_classroom_member_ids(classroom_id):
+    """Return the teacher and enrolled student ids of a classroom."""
+    if not classroom_id:
+        return set()
+
+    member_ids = set(
+        Enrollment.objects.filter(classroom_id=classroom_id).values_list('student_id', flat=True)
+    )
+    member_ids.update(
+        Classroom.objects.filter(id=classroom_id).values_list('teacher_id', flat=True)
+    )
+    return member_ids
+
+
+def build_etag(data):
+    """Build a strong ETag from the JSON representation of response data."""
+    payload = json.dumps(data, cls=JSONEncoder, sort_keys=True, ensure_ascii=False)
+    return f'"{hashlib.md5(payload.encode("utf-8")).hexdigest()}"'
+
+
+def _answer_key_cache_key(quiz_id):
+    return f'{ANSWER_KEY_CACHE_PREFIX}:{quiz_id}'
+
+
+@primary_reads()
+def build_answer_key(quiz_id):
+    """
+    Build the answer key of a quiz with two queries.
+
+    Returns:
+        {
+            "questions": {
+                "<question_id>": {
+                    "id": 1,
+                    "question_text": "...",
+                    "correct_answer_id": 5,  // None if no answer is marked correct
+                    "correct_answer_ids": [5],
+                    "answers": {"<answer_id>": "answer text", ...}
+                },
+                ...
+            }
+        }
+    Questions keep the quiz ordering; ids are stringified to match the
+    ``{question_id: answer_id}`` payload students submit.
+    """
+    questions = {}
+    for question in QuizQuestion.objects.filter(quiz_id=quiz_id).order_by('order', 'id').values('id', 'question_text'):
+        questions[str(question['id'])] = {
+            'id': question['id'],
+            'question_text': question['question_text'],
+            'correct_answer_id': None,
+            'correct_answer_ids': [],
+            'answers': {},
+        }
+
+    answers = QuizAnswer.objects.filter(question__quiz_id=quiz_id).order_by('id').values(
+        'id', 'question_id', 'answer_text', 'is_correct'
+    )
+    for answer in answers:
+        question = questions[str(answer['question_id'])]
+        question['answers'][str(answer['id'])] = answer['answer_text']
+        if answer['is_correct']:
+            question['correct_answer_ids'].append(answer['id'])
+            if question['correct_answer_id'] is None:
+                question['correct_answer_id'] = answer['id']
+
+    return {'questions': questions}
+
+
+def get_answer_key(quiz_id):
+    """Return the cached answer key of a quiz, building it on a miss."""
+    cache_key = _answer_key_cache_key(quiz_id)
+    answer_key = cache.get(cache_key)
+    if answer_key is None:
+        answer_key = build_answer_key(quiz_id)
+        cache.set(cache_key, answer_key, settings.QUIZ_ANSWER_KEY_CACHE_TIMEOUT)
+    return answer_key
+
+
+def invalidate_answer_key(quiz_id):
+    """Drop the cached answer key of a quiz."""
+    cache.delete(_answer_key_cache_key(quiz_id))
+
+
+def find_invalid_answer(answer_key, answers):
+    """
+    Check submitted answers against an answer key.
+
+    Returns the first ``(question_id, answer_id)`` pair that does not belong
+    to the quiz, or None when every answer is valid.
+    """
+    questions = answer_key['questions']
+    for question_id, answer_id in answers.items():
+        question = questions.get(str(question_id))
+        if question is None or str(answer_id) not in question['answers']:
+            return question_id, answer_id
+    return None
+
+
+def grade_answers(answer_key, answers):
+    """
+    Score submitted answers against an answer key without touching the database.
+
+    Returns:
+        (score, question_results) where score is 0-100.
+    """
+    question_results = []
+    correct_answers = 0
+
+    for question in answer_key['questions'].values():
+        selected_answer_id = answers.get(str(question['id']))
+        selected_answer_text = question['answers'].get(str(selected_answer_id)) if selected_answer_id is not None else None
+        if selected_answer_text is None:
+            selected_answer_id = None
+        else:
+            selected_answer_id = int(selected_answer_id)
+
+        correct_answer_id = question['correct_answer_id']
+        is_correct = selected_answer_id in question['correct_answer_ids']
+        if is_correct:
+            correct_answers += 1
+
+        question_results.append({
+            'question_id': question['id'],
+            'question_text': question['question_text'],
+            'selected_answer_id': selected_answer_id,
+            'selected_answer_text': selected_answer_text,
+            'correct_answer_id': correct_answer_id,
+            'correct_answer_text': question['answers'].get(str(correct_answer_id)) if correct_answer_id else None,
+            'is_correct': is_correct,
+        })
+
+    total_questions = len(question_results)
+    score = int((correct_answers / total_questions) * 100) if total_questions > 0 else 0
+    return score, question_results
+
+
+def check_answers(answer_key, answers):
+    """
+    Validate a complete set of answers against an answer key.
+
+    Returns an error message, or None when the answers are valid.
+    """
+    if set(answer_key['questions']) != set(answers.keys()):
+        return "All questions must be answered."
+
+    invalid_answer = find_invalid_answer(answer_key, answers)
+    if invalid_answer:
+        question_id, answer_id = invalid_answer
+        return f"Invalid answer ID {answer_id} for question {question_id}."
+
+    return None
+
+
+def grade_buffered_submissions(batch_size=200):
+    """
+    Grade one batch of pending buffered quiz submissions.
+
+    Pending rows are claimed with ``SKIP LOCKED`` so several graders can run
+    side by side. Answers are checked against cached answer keys, the latest
+    row per (quiz, student) is upserted in a single statement and every row
+    is marked graded or rejected.
+
+    Returns:
+        Number of buffered rows processed.
+    """
+    with transaction.atomic():
+        entries = list(
+            BufferedQuizSubmission.objects.select_for_update(skip_locked=True)
+            .filter(status=BufferedQuizSubmission.STATUS_PENDING)
+            .order_by('id')[:batch_size]
+        )
+        if not entries:
+            return 0
+
+        now = timezone.now()
+        quizzes = get_curated_quiz_queryset().in_bulk({entry.quiz_id for entry in entries})
+        graded = {}
+
+        for entry in entries:
+            entry.processed_at = now
+            quiz = quizzes.get(entry.quiz_id)
+            error = "Quiz not found." if quiz is None else None
+            if error is None and not isinstance(entry.answers, dict):
+                error = "Answers must be an object of question_id: answer_id."
+            if error is None:
+                answers = {str(key): str(value) for key, value in entry.answers.items()}
+                answer_key = get_answer_key(quiz.id)
+                error = check_answers(answer_key, answers)
+
+            if error:
+                entry.status = BufferedQuizSubmission.STATUS_REJECTED
+                entry.error = error
+                continue
+
+            score, entry.question_results = grade_answers(answer_key, answers)
+            entry.status = BufferedQuizSubmission.STATUS_GRADED
+            # Later rows for the same student and quiz win, like update_or_create
+            graded[(quiz.id, entry.student_id)] = QuizSubmission(
+                quiz_id=quiz.id,
+                student_id=entry.student_id,
+                score=score,
+                answers=answers,
+                is_late=bool(quiz.due_date and entry.received_at > quiz.due_date),
+            )
+
+        if graded:
+            QuizSubmission.objects.bulk_create(
+                graded.values(),
+                update_conflicts=True,
+                unique_fields=['quiz', 'student'],
+                update_fields=['score', 'answers', 'is_late'],
+            )
+            quiz_ids = {quiz_id for quiz_id, _ in graded}
+            student_ids = {student_id for _, student_id in graded}
+            submission_ids = {
+                (row['quiz_id'], row['student_id']): row['id']
+                for row in QuizSubmission.objects.filter(
+                    quiz_id__in=quiz_ids, student_id__in=student_ids
+                ).values('id', 'quiz_id', 'student_id')
+            }
+            for entry in entries:
+                if entry.status == BufferedQuizSubmission.STATUS_GRADED:
+                    entry.submission_id = submission_ids.get((entry.quiz_id, entry.student_id))
+
+            # bulk_create skips the post_save handlers in quizzes.signals
+            teacher_ids = Classroom.objects.filter(quizzes__id__in=quiz_ids).values_list('teacher_id', flat=True)
+            invalidate_deadline_feeds([*student_ids, *teacher_ids])
+            for quiz_id in quiz_ids:
+                invalidate_quiz_analytics(quiz_id)
+
+        BufferedQuizSubmission.objects.bulk_update(
+            entries, ['status', 'error', 'submission', 'question_results', 'processed_at']
+        )
+
+    return len(entries)
+
+
+def _analytics_cache_key(quiz_id):
+    return f'{ANALYTICS_CACHE_PREFIX}:{quiz_id}'
+
+
+def invalidate_quiz_analytics(quiz_id):
+    """Drop the cached analytics of a quiz."""
+    cache.delete(_analytics_cache_key(quiz_id))
+
+
+QUESTION_STATS_SQL = """
+    SELECT q.id,
+           COUNT(s.id) AS answered,
+           COUNT(s.id) FILTER (WHERE a.is_correct) AS correct
+    FROM {questions} q
+    LEFT JOIN {submissions} s
+           ON s.quiz_id = q.quiz_id AND s.answers ? q.id::text
+    LEFT JOIN {answers} a
+           ON a.question_id = q.id AND a.id::text = s.answers ->> q.id::text
+    WHERE q.quiz_id = %s
+    GROUP BY q.id
+""".format(
+    questions=QuizQuestion._meta.db_table,
+    submissions=QuizSubmission._meta.db_table,
+    answers=QuizAnswer._meta.db_table,
+)
+
+ANSWER_DISTRIBUTION_SQL = """
+    SELECT answer.key, answer.value #>> '{{}}', COUNT(*)
+    FROM {submissions} s
+    CROSS JOIN LATERAL jsonb_each(s.answers) AS answer
+    WHERE s.quiz_id = %s
+    GROUP BY 1, 2
+""".format(submissions=QuizSubmission._meta.db_table)
+
+
+@primary_reads()
+def compute_quiz_analytics(quiz):
+    """
+    Compute item statistics for a quiz in the database.
+
+    Per-question correct rates and answer distributions are aggregated from
+    the ``QuizSubmission.answers`` jsonb column; the score histogram uses the
+    final (teacher-adjusted when present) score in buckets of ten points.
+    """
+    submissions = QuizSubmission.objects.filter(quiz=quiz)
+    final_score = Coalesce('adjusted_score', 'score')
+    summary = submissions.aggregate(
+        total_submissions=Count('id'),
+        average_score=Avg(final_score),
+        min_score=Min(final_score),
+        max_score=Max(final_score),
+    )
+
+    histogram = {bucket: 0 for bucket in range(10)}
+    buckets = submissions.annotate(
+        bucket=Least(final_score / Value(10), Value(9))
+    ).values('bucket').annotate(count=Count('id')).order_by()
+    for row in buckets:
+        histogram[max(row['bucket'], 0)] += row['count']
+
+    with connections[router.db_for_read(QuizSubmission)].cursor() as cursor:
+        cursor.execute(QUESTION_STATS_SQL, [quiz.id])
+        question_stats = {question_id: (answered, correct) for question_id, answered, correct in cursor.fetchall()}
+        cursor.execute(ANSWER_DISTRIBUTION_SQL, [quiz.id])
+        distribution = {(question_id, answer_id): count for question_id, answer_id, count in cursor.fetchall()}
+
+    questions = []
+    for question_key, question in get_answer_key(quiz.id)['questions'].items():
+        answered, correct = question_stats.get(question['id'], (0, 0))
+        questions.append({
+            'question_id': question['id'],
+            'question_text': question['question_text'],
+            'answered': answered,
+            'correct': correct,
+            'correct_rate': round(correct / answered, 4) if answered else None,
+            'answer_distribution': [
+                {
+                    'answer_id': int(answer_id),
+                    'answer_text': answer_text,
+                    'is_correct': int(answer_id) in question['correct_answer_ids'],
+                    'count': distribution.get((question_key, answer_id), 0),
+                }
+                for answer_id, answer_text in question['answers'].items()
+            ],
+        })
+
+    average_score = summary['average_score']
+    return {
+        'quiz_id': quiz.id,
+        'quiz_title': quiz.title,
+        'total_submissions': summary['total_submissions'],
+        'average_score': round(float(average_score), 2) if average_score is not None else None,
+        'min_score': summary['min_score'],
+        'max_score': summary['max_score'],
+        'score_histogram': [
+            {
+                'range': f'{bucket * 10}-{bucket * 10 + 9}' if bucket < 9 else '90-100',
+                'count': histogram[bucket],
+            }
+            for bucket in range(10)
+        ],
+        'questions': questions,
+    }
+
+
+def get_quiz_analytics(quiz):
+    """Return cached analytics for a quiz, computing them on a miss."""
+    cache_key = _analytics_cache_key(quiz.id)
+    analytics = cache.get(cache_key)
+    if analytics is None:
+        analytics = compute_quiz_analytics(quiz)
+        cache.set(cache_key, analytics, settings.QUIZ_ANALYTICS_CACHE_TIMEOUT)
+    return analytics
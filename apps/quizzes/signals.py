@@ -0,0 +1,80 @@
+"""
+Signal handlers that keep cached quiz data in sync with writes.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.classrooms.models import Assignment, Classroom, Enrollment, Grade, Submission
+from .models import Quiz, QuizAnswer, QuizQuestion, QuizSubmission
+from .services import (
+    get_classroom_member_ids,
+    invalidate_answer_key,
+    invalidate_deadline_feeds,
+    invalidate_quiz_analytics,
+)
+
+
+@receiver([post_save, post_delete], sender=Quiz)
+@receiver([post_save, post_delete], sender=Assignment)
+def invalidate_classroom_deadline_feeds(sender, instance, **kwargs):
+    """A quiz or assignment changes the feed of everyone in its classroom."""
+    invalidate_deadline_feeds(get_classroom_member_ids(instance.classroom_id))
+
+
+@receiver([post_save, post_delete], sender=QuizSubmission)
+def invalidate_quiz_submission_deadline_feeds(sender, instance, **kwargs):
+    """A quiz submission changes the student's status and the teacher's counts."""
+    teacher_ids = Classroom.objects.filter(quizzes__id=instance.quiz_id).values_list('teacher_id', flat=True)
+    invalidate_deadline_feeds([instance.student_id, *teacher_ids])
+
+
+@receiver([post_save, post_delete], sender=QuizSubmission)
+def invalidate_submission_quiz_analytics(sender, instance, **kwargs):
+    """New, regraded or reviewed submissions change the quiz statistics."""
+    invalidate_quiz_analytics(instance.quiz_id)
+
+
+@receiver([post_save, post_delete], sender=Submission)
+def invalidate_submission_deadline_feeds(sender, instance, **kwargs):
+    """An assignment submission changes the student's status and the teacher's counts."""
+    teacher_ids = Classroom.objects.filter(assignments__id=instance.assignment_id).values_list('teacher_id', flat=True)
+    invalidate_deadline_feeds([instance.student_id, *teacher_ids])
+
+
+@receiver([post_save, post_delete], sender=Grade)
+def invalidate_grade_deadline_feeds(sender, instance, **kwargs):
+    """Grading changes the teacher's pending review count."""
+    teacher_ids = Classroom.objects.filter(
+        assignments__submissions__id=instance.submission_id
+    ).values_list('teacher_id', flat=True)
+    invalidate_deadline_feeds(teacher_ids)
+
+
+@receiver([post_save, post_delete], sender=Enrollment)
+def invalidate_enrollment_deadline_feeds(sender, instance, **kwargs):
+    """Joining or leaving a classroom changes which deadlines a student sees."""
+    invalidate_deadline_feeds([instance.student_id])
+
+
+@receiver([post_save, post_delete], sender=Quiz)
+def invalidate_quiz_answer_key(sender, instance, **kwargs):
+    """Editing a quiz drops its cached answer key and analytics."""
+    invalidate_answer_key(instance.id)
+    invalidate_quiz_analytics(instance.id)
+
+
+@receiver([post_save, post_delete], sender=QuizQuestion)
+def invalidate_question_answer_key(sender, instance, **kwargs):
+    """Adding, editing or removing a question changes the answer key."""
+    invalidate_answer_key(instance.quiz_id)
+    invalidate_quiz_analytics(instance.quiz_id)
+
+
+@receiver([post_save, post_delete], sender=QuizAnswer)
+def invalidate_answer_answer_key(sender, instance, **kwargs):
+    """Answer edits can change the correct answer or the valid answer ids."""
+    # The question may already be gone when answers are cascade-deleted;
+    # its own handler covers that case.
+    for quiz_id in QuizQuestion.objects.filter(id=instance.question_id).values_list('quiz_id', flat=True):
+        invalidate_answer_key(quiz_id)
+        invalidate_quiz_analytics(quiz_id)
@@ -0,0 +1,279 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.classrooms.models import Assignment, Classroom, Enrollment, Submission
+from apps.core.db_routers import ReplicaRoutingMiddleware
+from apps.quizzes.models import BufferedQuizSubmission, Quiz, QuizAnswer, QuizQuestion, QuizSubmission
+from apps.quizzes.services import get_answer_key, get_quiz_analytics, grade_buffered_submissions
+
+
+User = get_user_model()
+
+
+class QuizDeadlineApiTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user(
+            email='teacher-deadline@example.com',
+            password='password123',
+            role='teacher',
+        )
+        self.student = User.objects.create_user(
+            email='student-deadline@example.com',
+            password='password123',
+            role='student',
+        )
+        self.classroom = Classroom.objects.create(name='Lớp 10A2', teacher=self.teacher)
+        Enrollment.objects.create(student=self.student, classroom=self.classroom)
+
+        now = timezone.now()
+        self.late_quiz = Quiz.objects.create(
+            title='Quiz quá hạn',
+            classroom=self.classroom,
+            due_date=now - timedelta(days=1),
+        )
+        self.soon_quiz = Quiz.objects.create(
+            title='Quiz sắp đến hạn',
+            classroom=self.classroom,
+            due_date=now + timedelta(hours=5),
+        )
+        self.assignment = Assignment.objects.create(
+            classroom=self.classroom,
+            title='Bài tập 1',
+            description='Vẽ bản đồ',
+            due_date=now + timedelta(days=3),
+            created_by=self.teacher,
+        )
+        QuizSubmission.objects.create(quiz=self.late_quiz, student=self.student, score=80)
+        Submission.objects.create(assignment=self.assignment, student=self.student)
+        self.url = '/api/v1/quizzes/deadlines/'
+
+    def test_teacher_feed_is_sorted_with_stats(self):
+        self.client.force_authenticate(user=self.teacher)
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['title'] for item in response.data],
+            ['Quiz quá hạn', 'Quiz sắp đến hạn', 'Bài tập 1'],
+        )
+        self.assertEqual(response.data[0]['submission_count'], 1)
+        self.assertEqual(response.data[0]['pending_review_count'], 1)
+        self.assertEqual(response.data[2]['type'], 'assignment')
+        self.assertEqual(response.data[2]['pending_review_count'], 1)
+
+    def test_teacher_status_filter_applies_to_quizzes_and_assignments(self):
+        self.client.force_authenticate(user=self.teacher)
+
+        due_soon = self.client.get(self.url, {'status': 'due_soon'})
+        upcoming = self.client.get(self.url, {'status': 'upcoming'})
+
+        self.assertEqual([item['title'] for item in due_soon.data], ['Quiz sắp đến hạn'])
+        self.assertEqual([item['title'] for item in upcoming.data], ['Bài tập 1'])
+
+    def test_cached_feed_returns_not_modified_for_matching_etag(self):
+        self.client.force_authenticate(user=self.student)
+
+        first = self.client.get(self.url)
+        second = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_feed_is_invalidated_when_classroom_quiz_changes(self):
+        self.client.force_authenticate(user=self.student)
+        first = self.client.get(self.url)
+
+        Quiz.objects.create(
+            title='Quiz mới',
+            classroom=self.classroom,
+            due_date=timezone.now() + timedelta(days=2),
+        )
+        second = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertIn('Quiz mới', [item['title'] for item in second.data])
+
+
+class QuizSubmissionApiTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = User.objects.create_user(
+            email='student-submit@example.com',
+            password='password123',
+            role='student',
+        )
+        self.client.force_authenticate(user=self.student)
+        self.quiz = Quiz.objects.create(title='Quiz mô đun 1', module_code='module-01')
+        self.q1 = QuizQuestion.objects.create(quiz=self.quiz, question_text='Thủ đô?', order=1)
+        self.q1_right = QuizAnswer.objects.create(question=self.q1, answer_text='Hà Nội', is_correct=True)
+        self.q1_wrong = QuizAnswer.objects.create(question=self.q1, answer_text='Huế')
+        self.q2 = QuizQuestion.objects.create(quiz=self.quiz, question_text='Sông dài nhất?', order=2)
+        self.q2_right = QuizAnswer.objects.create(question=self.q2, answer_text='Mê Kông', is_correct=True)
+        self.q2_wrong = QuizAnswer.objects.create(question=self.q2, answer_text='Sông Hồng')
+        self.url = '/api/v1/quizzes/quiz_submissions/'
+
+    def submit(self, answers):
+        return self.client.post(self.url, {'quiz_id': self.quiz.id, 'answers': answers}, format='json')
+
+    def test_grades_submission_with_question_results(self):
+        response = self.submit({str(self.q1.id): str(self.q1_right.id), str(self.q2.id): str(self.q2_wrong.id)})
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['score'], 50)
+        results = response.data['question_results']
+        self.assertEqual([result['question_id'] for result in results], [self.q1.id, self.q2.id])
+        self.assertTrue(results[0]['is_correct'])
+        self.assertEqual(results[1]['selected_answer_text'], 'Sông Hồng')
+        self.assertEqual(results[1]['correct_answer_id'], self.q2_right.id)
+
+    def test_rejects_answer_from_another_question(self):
+        response = self.submit({str(self.q1.id): str(self.q2_right.id), str(self.q2.id): str(self.q2_wrong.id)})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_answer_key_is_rebuilt_after_answer_edit(self):
+        answers = {str(self.q1.id): str(self.q1_wrong.id), str(self.q2.id): str(self.q2_right.id)}
+        self.assertEqual(self.submit(answers).data['score'], 50)
+
+        self.q1_wrong.is_correct = True
+        self.q1_wrong.save()
+        self.q1_right.is_correct = False
+        self.q1_right.save()
+
+        self.assertEqual(self.submit(answers).data['score'], 100)
+
+    def test_buffered_submission_is_graded_in_batch(self):
+        buffered_url = '/api/v1/quizzes/quiz_submissions/buffered/'
+        first = self.client.post(buffered_url, {
+            'quiz_id': self.quiz.id,
+            'answers': {str(self.q1.id): str(self.q1_wrong.id), str(self.q2.id): str(self.q2_right.id)},
+        }, format='json')
+        second = self.client.post(buffered_url, {
+            'quiz_id': self.quiz.id,
+            'answers': {str(self.q1.id): str(self.q1_right.id), str(self.q2.id): str(self.q2_right.id)},
+        }, format='json')
+        rejected = self.client.post(buffered_url, {
+            'quiz_id': self.quiz.id,
+            'answers': {str(self.q1.id): str(self.q1_right.id)},
+        }, format='json')
+        self.assertEqual(first.status_code, status.HTTP_202_ACCEPTED)
+
+        self.assertEqual(grade_buffered_submissions(), 3)
+
+        submission = QuizSubmission.objects.get(quiz=self.quiz, student=self.student)
+        self.assertEqual(submission.score, 100)
+        status_response = self.client.get(second.data['status_url'])
+        self.assertEqual(status_response.data['status'], BufferedQuizSubmission.STATUS_GRADED)
+        self.assertEqual(status_response.data['submission_id'], submission.id)
+        self.assertEqual(status_response.data['score'], 100)
+        rejected_entry = BufferedQuizSubmission.objects.get(id=rejected.data['buffer_id'])
+        self.assertEqual(rejected_entry.status, BufferedQuizSubmission.STATUS_REJECTED)
+
+    def test_buffered_status_keeps_the_results_it_was_graded_with(self):
+        buffered = self.client.post('/api/v1/quizzes/quiz_submissions/buffered/', {
+            'quiz_id': self.quiz.id,
+            'answers': {str(self.q1.id): str(self.q1_right.id), str(self.q2.id): str(self.q2_right.id)},
+        }, format='json')
+        grade_buffered_submissions()
+
+        self.q1_right.is_correct = False
+        self.q1_right.save()
+        self.q1_wrong.is_correct = True
+        self.q1_wrong.save()
+
+        results = self.client.get(buffered.data['status_url']).data['question_results']
+        self.assertEqual([result['is_correct'] for result in results], [True, True])
+        self.assertEqual(results[0]['correct_answer_id'], self.q1_right.id)
+
+
+class QuizAnalyticsApiTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user(
+            email='teacher-analytics@example.com',
+            password='password123',
+            role='teacher',
+        )
+        self.classroom = Classroom.objects.create(name='Lớp 10A3', teacher=self.teacher)
+        self.quiz = Quiz.objects.create(title='Quiz thống kê', classroom=self.classroom, module_code='module-01')
+        self.question = QuizQuestion.objects.create(quiz=self.quiz, question_text='Thủ đô?', order=1)
+        self.right = QuizAnswer.objects.create(question=self.question, answer_text='Hà Nội', is_correct=True)
+        self.wrong = QuizAnswer.objects.create(question=self.question, answer_text='Huế')
+        for index, (answer, score) in enumerate([(self.right, 100), (self.right, 100), (self.wrong, 0)]):
+            student = User.objects.create_user(
+                email=f'student-analytics-{index}@example.com',
+                password='password123',
+                role='student',
+            )
+            QuizSubmission.objects.create(
+                quiz=self.quiz,
+                student=student,
+                score=score,
+                answers={str(self.question.id): str(answer.id)},
+            )
+        self.url = f'/api/v1/quizzes/{self.quiz.id}/analytics/'
+
+    def test_teacher_gets_item_statistics(self):
+        self.client.force_authenticate(user=self.teacher)
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_submissions'], 3)
+        question = response.data['questions'][0]
+        self.assertEqual(question['answered'], 3)
+        self.assertEqual(question['correct'], 2)
+        distribution = {item['answer_id']: item['count'] for item in question['answer_distribution']}
+        self.assertEqual(distribution, {self.right.id: 2, self.wrong.id: 1})
+        histogram = {item['range']: item['count'] for item in response.data['score_histogram']}
+        self.assertEqual(histogram['0-9'], 1)
+        self.assertEqual(histogram['90-100'], 2)
+
+    def test_analytics_refresh_after_new_submission(self):
+        self.client.force_authenticate(user=self.teacher)
+        self.client.get(self.url)
+
+        student = User.objects.create_user(email='late-analytics@example.com', password='password123', role='student')
+        QuizSubmission.objects.create(
+            quiz=self.quiz,
+            student=student,
+            score=0,
+            answers={str(self.question.id): str(self.wrong.id)},
+        )
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['total_submissions'], 4)
+
+    def test_students_cannot_view_analytics(self):
+        student = User.objects.get(email='student-analytics-0@example.com')
+        self.client.force_authenticate(user=student)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(DATABASE_REPLICAS=['replica_1'])
+    def test_cached_builds_read_from_the_primary_during_replica_routed_requests(self):
+        # replica_1 is not a configured connection: any query routed there fails
+        results = {}
+
+        def view(request):
+            results['routed'] = router.db_for_read(Quiz)
+            results['answer_key'] = get_answer_key(self.quiz.id)
+            results['analytics'] = get_quiz_analytics(self.quiz)
+            return HttpResponse()
+
+        ReplicaRoutingMiddleware(view)(RequestFactory().get(self.url))
+
+        self.assertEqual(results['routed'], 'replica_1')
+        self.assertEqual(results['answer_key']['questions'][str(self.question.id)]['correct_answer_ids'], [self.right.id])
+        self.assertEqual(results['analytics']['total_submissions'], 3)
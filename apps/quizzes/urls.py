@@ -4,6 +4,8 @@ URL configuration for quizzes app.
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
+    BufferedQuizSubmissionStatusView,
+    BufferedQuizSubmissionView,
     QuizViewSet,
     QuizSubmissionView,
     QuizDeadlineView,
@@ -22,6 +24,14 @@ urlpatterns = [
     # Quiz submission
     path('quiz_submissions/', QuizSubmissionView.as_view(), name='quiz-submission'),
 
+    # Buffered quiz submission for exam-time bursts (graded in the background)
+    path('quiz_submissions/buffered/', BufferedQuizSubmissionView.as_view(), name='quiz-submission-buffered'),
+    path(
+        'quiz_submissions/buffered/<int:pk>/',
+        BufferedQuizSubmissionStatusView.as_view(),
+        name='quiz-submission-buffered-status'
+    ),
+
     # Quiz submission review (teacher)
     path('quiz-submissions/<int:pk>/review/', QuizSubmissionReviewView.as_view(), name='quiz-submission-review'),
 
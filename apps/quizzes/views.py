@@ -1,23 +1,41 @@
 """
 Views for quiz and assessment system.
 """
-from rest_framework import viewsets, generics, status
+import heapq
+from operator import itemgetter
+
+from rest_framework import viewsets, generics, serializers, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
-from django.db.models import Count, Q, Prefetch
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Q, Prefetch
+from django.urls import reverse
+from django.utils.http import parse_etags
 from django.utils import timezone
 from datetime import datetime
 from drf_spectacular.utils import extend_schema, OpenApiResponse, OpenApiParameter
+from apps.core.db_routers import primary_reads
 from apps.core.permissions import IsStudent, IsTeacher
 from apps.classrooms.models import Assignment, Classroom, Enrollment, Submission
-from .models import Quiz, QuizSubmission
+from .models import (
+    DEADLINE_COLORS,
+    BufferedQuizSubmission,
+    Quiz,
+    QuizSubmission,
+    deadline_status_filter,
+    get_deadline_status,
+)
+from .services import build_etag, get_deadline_feed_cache_key, get_quiz_analytics
 CURATED_MODULE_CODES = [
     'module-01', 'module-02', 'module-03', 'module-04', 'module-05', 'module-06'
 ]
 
 from .serializers import (
+    BufferedQuizSubmissionCreateSerializer,
+    BufferedQuizSubmissionStatusSerializer,
     QuizListSerializer,
     QuizDetailSerializer,
     QuizSessionSerializer,
@@ -26,7 +44,8 @@ from .serializers import (
     QuizQuestionSerializer,
     QuizDeadlineSerializer,
     QuizSubmissionReviewSerializer,
-    QuizResultsSerializer
+    QuizResultsSerializer,
+    format_time_remaining,
 )
 
 
@@ -130,6 +149,38 @@ class QuizViewSet(viewsets.ReadOnlyModelViewSet):
             'submissions': serializer.data
         })
 
+    @extend_schema(
+        summary="Get quiz analytics (teacher only)",
+        description="Per-question correct rate, answer distribution and score histogram for a quiz",
+        responses={
+            200: OpenApiResponse(description="Quiz item statistics"),
+            403: OpenApiResponse(description="Only the classroom teacher can view analytics")
+        },
+        tags=['Quizzes']
+    )
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated, IsTeacher])
+    def analytics(self, request, pk=None):
+        """
+        Get item statistics for a quiz.
+        Aggregated in the database and cached until the next submission.
+        """
+        quiz = self.get_object()
+
+        # Verify teacher owns the classroom
+        if not quiz.classroom:
+            return Response(
+                {'error': 'Quiz is not assigned to a classroom'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if quiz.classroom.teacher != request.user:
+            return Response(
+                {'error': 'You do not have permission to view these analytics'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        return Response(get_quiz_analytics(quiz))
+
 
 class QuizSessionView(generics.RetrieveAPIView):
     """
@@ -224,34 +275,85 @@ class QuizSubmissionView(generics.CreateAPIView):
         serializer.is_valid(raise_exception=True)
         submission = serializer.save()
 
-        question_results = []
-        questions = submission.quiz.questions.prefetch_related('answers').all()
-        for question in questions:
-            selected_answer_id = submission.answers.get(str(question.id))
-            selected_answer = next((answer for answer in question.answers.all() if str(answer.id) == str(selected_answer_id)), None)
-            correct_answer = next((answer for answer in question.answers.all() if answer.is_correct), None)
-            question_results.append({
-                'question_id': question.id,
-                'question_text': question.question_text,
-                'selected_answer_id': selected_answer.id if selected_answer else None,
-                'selected_answer_text': selected_answer.answer_text if selected_answer else None,
-                'correct_answer_id': correct_answer.id if correct_answer else None,
-                'correct_answer_text': correct_answer.answer_text if correct_answer else None,
-                'is_correct': bool(selected_answer and selected_answer.is_correct),
-            })
-
         # Return submission details
         response_data = {
             'submission_id': submission.id,
             'score': submission.score,
             'quiz_title': submission.quiz.title,
             'submitted_at': submission.submitted_at,
-            'question_results': question_results,
+            'question_results': submission.question_results,
         }
 
         return Response(response_data, status=status.HTTP_201_CREATED)
 
 
+class BufferedQuizSubmissionView(generics.CreateAPIView):
+    """
+    POST /api/v1/quizzes/quiz_submissions/buffered/
+
+    Accept quiz answers into the submission buffer and acknowledge immediately.
+
+    Intended for exam-time bursts: the request only appends a row, and the
+    ``grade_quiz_submissions`` command validates and scores buffered rows in
+    batches. Poll the returned ``status_url`` for the result.
+
+    Response (202 Accepted):
+    {
+        "buffer_id": 42,
+        "status": "pending",
+        "status_url": "/api/v1/quizzes/quiz_submissions/buffered/42/"
+    }
+    """
+    serializer_class = BufferedQuizSubmissionCreateSerializer
+    permission_classes = [IsAuthenticated, IsStudent]
+
+    @extend_schema(
+        summary="Submit quiz answers (buffered)",
+        description="Accept quiz answers for background grading and return immediately",
+        request=BufferedQuizSubmissionCreateSerializer,
+        responses={
+            202: OpenApiResponse(description="Submission accepted for grading"),
+            400: OpenApiResponse(description="Malformed payload")
+        },
+        tags=['Quizzes']
+    )
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        entry = serializer.save()
+
+        return Response({
+            'buffer_id': entry.id,
+            'status': entry.status,
+            'status_url': reverse('quizzes:quiz-submission-buffered-status', kwargs={'pk': entry.id}),
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+class BufferedQuizSubmissionStatusView(generics.RetrieveAPIView):
+    """
+    GET /api/v1/quizzes/quiz_submissions/buffered/{id}/
+
+    Get grading status of a buffered quiz submission owned by the student.
+    """
+    serializer_class = BufferedQuizSubmissionStatusSerializer
+    permission_classes = [IsAuthenticated, IsStudent]
+
+    def get_queryset(self):
+        return BufferedQuizSubmission.objects.filter(student=self.request.user).select_related('submission')
+
+    @extend_schema(
+        summary="Get buffered submission status",
+        description="Poll a buffered quiz submission until it is graded or rejected",
+        responses={
+            200: BufferedQuizSubmissionStatusSerializer,
+            404: OpenApiResponse(description="Buffered submission not found")
+        },
+        tags=['Quizzes']
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
 class QuizDeadlineView(APIView):
     """
     GET /api/v1/quizzes/deadlines/
@@ -291,51 +393,57 @@ class QuizDeadlineView(APIView):
         status_filter = request.query_params.get('status')
         classroom_id = request.query_params.get('classroom_id')
 
-        # Build base queryset based on user role
+        # Feeds are cached per user and invalidated by quizzes.signals
+        cache_key = get_deadline_feed_cache_key(user.id, status_filter, classroom_id)
+        feed = cache.get(cache_key)
+        if feed is None:
+            # Cached for every later request, so never build it from a replica
+            with primary_reads():
+                if user.role == 'teacher':
+                    data = self._teacher_deadlines(user, status_filter, classroom_id)
+                else:
+                    data = self._student_deadlines(request, user, status_filter, classroom_id)
+            feed = {'etag': build_etag(data), 'data': data}
+            cache.set(cache_key, feed, settings.QUIZ_DEADLINE_CACHE_TIMEOUT)
+
+        if feed['etag'] in parse_etags(request.headers.get('If-None-Match', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(feed['data'])
+        response['ETag'] = feed['etag']
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def _student_deadlines(self, request, user, status_filter, classroom_id):
+        """Build the deadline feed for a student's enrolled classrooms."""
         assignment_items = []
 
-        if user.role == 'teacher':
-            # Teachers see quizzes from their owned classrooms
-            owned_classrooms = Classroom.objects.filter(teacher=user)
-            quizzes = Quiz.objects.filter(
-                classroom__in=owned_classrooms,
-                due_date__isnull=False
-            ).select_related('classroom').prefetch_related(
-                Prefetch('submissions', queryset=QuizSubmission.objects.select_related('student'))
-            ).annotate(
-                submission_count=Count('submissions'),
-                pending_review_count=Count('submissions', filter=Q(submissions__is_reviewed=False))
+        # Students see quizzes from enrolled classrooms
+        enrolled_classroom_ids = Enrollment.objects.filter(
+            student=user
+        ).values_list('classroom_id', flat=True)
+        enrolled_classrooms = Classroom.objects.filter(
+            id__in=enrolled_classroom_ids
+        ).distinct()
+        quizzes = Quiz.objects.filter(
+            classroom__in=enrolled_classrooms,
+            due_date__isnull=False
+        ).select_related('classroom').prefetch_related(
+            Prefetch(
+                'submissions',
+                queryset=QuizSubmission.objects.filter(student=user),
+                to_attr='user_submissions'
             )
-            assignments = Assignment.objects.filter(
-                classroom__in=owned_classrooms,
-            ).select_related('classroom').prefetch_related('submissions')
-        else:
-            # Students see quizzes from enrolled classrooms
-            enrolled_classroom_ids = Enrollment.objects.filter(
-                student=user
-            ).values_list('classroom_id', flat=True)
-            enrolled_classrooms = Classroom.objects.filter(
-                id__in=enrolled_classroom_ids
-            ).distinct()
-            quizzes = Quiz.objects.filter(
-                classroom__in=enrolled_classrooms,
-                due_date__isnull=False
-            ).select_related('classroom').prefetch_related(
-                Prefetch(
-                    'submissions',
-                    queryset=QuizSubmission.objects.filter(student=user),
-                    to_attr='user_submissions'
-                )
-            )
-            assignments = Assignment.objects.filter(
-                classroom__in=enrolled_classrooms,
-            ).select_related('classroom').prefetch_related(
-                Prefetch(
-                    'submissions',
-                    queryset=Submission.objects.filter(student=user),
-                    to_attr='user_submissions'
-                )
+        )
+        assignments = Assignment.objects.filter(
+            classroom__in=enrolled_classrooms,
+        ).select_related('classroom').prefetch_related(
+            Prefetch(
+                'submissions',
+                queryset=Submission.objects.filter(student=user),
+                to_attr='user_submissions'
             )
+        )
 
         # Apply filters
         if classroom_id:
@@ -353,42 +461,19 @@ class QuizDeadlineView(APIView):
             if not assignment.due_date:
                 continue
 
-            if user.role == 'teacher':
-                assignment_items.append({
-                    'id': assignment.id,
-                    'title': assignment.title,
-                    'classroom_id': assignment.classroom_id,
-                    'classroom_name': assignment.classroom.name,
-                    'due_date': assignment.due_date,
-                    'deadline_status': 'overdue' if assignment.is_overdue else 'upcoming',
-                    'deadline_color': 'red' if assignment.is_overdue else 'green',
-                    'user_submission_status': 'teacher_view',
-                    'time_remaining': None,
-                    'type': 'assignment',
-                    'submission_count': assignment.submissions.count(),
-                    'pending_review_count': assignment.submissions.filter(grade__isnull=True).count(),
-                })
-            else:
-                user_submission = assignment.user_submissions[0] if getattr(assignment, 'user_submissions', []) else None
-                assignment_items.append({
-                    'id': assignment.id,
-                    'title': assignment.title,
-                    'classroom_id': assignment.classroom_id,
-                    'classroom_name': assignment.classroom.name,
-                    'due_date': assignment.due_date,
-                    'deadline_status': 'overdue' if assignment.is_overdue else 'upcoming',
-                    'deadline_color': 'red' if assignment.is_overdue else 'green',
-                    'user_submission_status': 'submitted' if user_submission else 'not_submitted',
-                    'time_remaining': None,
-                    'type': 'assignment',
-                })
-
-        # For teachers, add submission stats
-        if user.role == 'teacher':
-            for i, quiz in enumerate(quizzes):
-                if i < len(data):
-                    data[i]['submission_count'] = quiz.submission_count
-                    data[i]['pending_review_count'] = quiz.pending_review_count
+            user_submission = assignment.user_submissions[0] if getattr(assignment, 'user_submissions', []) else None
+            assignment_items.append({
+                'id': assignment.id,
+                'title': assignment.title,
+                'classroom_id': assignment.classroom_id,
+                'classroom_name': assignment.classroom.name,
+                'due_date': assignment.due_date,
+                'deadline_status': 'overdue' if assignment.is_overdue else 'upcoming',
+                'deadline_color': 'red' if assignment.is_overdue else 'green',
+                'user_submission_status': 'submitted' if user_submission else 'not_submitted',
+                'time_remaining': None,
+                'type': 'assignment',
+            })
 
         combined = data + assignment_items
         if status_filter:
@@ -407,7 +492,92 @@ class QuizDeadlineView(APIView):
             return timezone.now()
 
         combined.sort(key=lambda item: _normalize_due_date(item.get('due_date')))
-        return Response(combined)
+        return combined
+
+    def _teacher_deadlines(self, user, status_filter, classroom_id):
+        """
+        Build the teacher deadline feed with a constant number of queries.
+
+        Submission stats are annotated in SQL, the status filter is translated
+        into due date ranges and both querysets come back ordered by due_date,
+        so the two streams only need to be merged.
+        """
+        now = timezone.now()
+        quizzes = Quiz.objects.filter(classroom__teacher=user, due_date__isnull=False)
+        assignments = Assignment.objects.filter(classroom__teacher=user)
+
+        if classroom_id:
+            quizzes = quizzes.filter(classroom_id=classroom_id)
+            assignments = assignments.filter(classroom_id=classroom_id)
+
+        if status_filter:
+            quiz_status_q = deadline_status_filter(status_filter, now)
+            quizzes = quizzes.filter(quiz_status_q) if quiz_status_q is not None else quizzes.none()
+
+            # Assignments only distinguish overdue from upcoming
+            if status_filter == 'overdue':
+                assignments = assignments.filter(due_date__lt=now)
+            elif status_filter == 'upcoming':
+                assignments = assignments.filter(due_date__gte=now)
+            else:
+                assignments = assignments.none()
+
+        quiz_rows = quizzes.annotate(
+            classroom_name=F('classroom__name'),
+            submission_count=Count('submissions'),
+            pending_review_count=Count('submissions', filter=Q(submissions__is_reviewed=False)),
+        ).order_by('due_date', 'id').values(
+            'id', 'title', 'classroom_id', 'classroom_name', 'due_date',
+            'submission_count', 'pending_review_count',
+        )
+        assignment_rows = assignments.annotate(
+            classroom_name=F('classroom__name'),
+            submission_count=Count('submissions'),
+            pending_review_count=Count('submissions', filter=Q(submissions__grade__isnull=True)),
+        ).order_by('due_date', 'id').values(
+            'id', 'title', 'classroom_id', 'classroom_name', 'due_date',
+            'submission_count', 'pending_review_count',
+        )
+
+        due_date_field = serializers.DateTimeField()
+
+        def quiz_items():
+            for row in quiz_rows:
+                deadline_status = get_deadline_status(row['due_date'], now)
+                yield row['due_date'], {
+                    'id': row['id'],
+                    'title': row['title'],
+                    'classroom_id': row['classroom_id'],
+                    'classroom_name': row['classroom_name'],
+                    'due_date': due_date_field.to_representation(row['due_date']),
+                    'deadline_status': deadline_status,
+                    'deadline_color': DEADLINE_COLORS[deadline_status],
+                    'user_submission_status': 'not_submitted',
+                    'time_remaining': format_time_remaining(row['due_date'], now),
+                    'submission_count': row['submission_count'],
+                    'pending_review_count': row['pending_review_count'],
+                }
+
+        def assignment_items():
+            for row in assignment_rows:
+                is_overdue = now > row['due_date']
+                yield row['due_date'], {
+                    'id': row['id'],
+                    'title': row['title'],
+                    'classroom_id': row['classroom_id'],
+                    'classroom_name': row['classroom_name'],
+                    'due_date': row['due_date'],
+                    'deadline_status': 'overdue' if is_overdue else 'upcoming',
+                    'deadline_color': 'red' if is_overdue else 'green',
+                    'user_submission_status': 'teacher_view',
+                    'time_remaining': None,
+                    'type': 'assignment',
+                    'submission_count': row['submission_count'],
+                    'pending_review_count': row['pending_review_count'],
+                }
+
+        merged = heapq.merge(quiz_items(), assignment_items(), key=itemgetter(0))
+        return [item for _, item in merged]
 
 
 class QuizSubmissionReviewView(APIView):
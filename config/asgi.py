@@ -3,6 +3,17 @@ ASGI config for webgis_backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with an ASGI server so async views such as the AI tutor event
+stream (ai-tutor/respond/stream/), ai-tutor/respond/async/ and
+layers/<id>/features/async/ wait on the provider and the database without
+pinning a thread:
+
+    uvicorn config.asgi:application --host 0.0.0.0 --port 8000
+
+In production run uvicorn workers under gunicorn (see config/gunicorn.conf.py):
+
+    gunicorn -c config/gunicorn.conf.py config.asgi:application
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
@@ -0,0 +1,53 @@
+"""
+Gunicorn configuration for the webgis_backend deployments.
+
+The same file serves both entry points; pick the worker class to match:
+
+    # ASGI: uvicorn workers run the async views on an event loop
+    gunicorn -c config/gunicorn.conf.py config.asgi:application
+
+    # WSGI: threaded sync workers (one thread per in-flight request)
+    GUNICORN_WORKER_CLASS=gthread gunicorn -c config/gunicorn.conf.py config.wsgi:application
+
+Every setting can be overridden through GUNICORN_* environment variables.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'uvicorn.workers.UvicornWorker')
+
+# One event loop per core is enough for I/O-bound ASGI workers; gthread
+# workers get their concurrency from GUNICORN_THREADS instead
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() + 1))
+
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+# Must outlast the slowest AI tutor stream (provider timeout x retries)
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers periodically so a slow leak cannot grow without bound
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+
+errorlog = os.environ.get('GUNICORN_ERROR_LOG', '-')
+
+
+def on_starting(server):
+    # Rate limits, single-flight locks, replica pins and /metrics counters
+    # live in the Django cache; a process-local backend would give every
+    # worker its own copy and silently multiply the limits
+    backend = os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+    if server.cfg.workers > 1 and backend.rsplit('.', 1)[-1] in ('LocMemCache', 'DummyCache'):
+        raise RuntimeError(
+            f'{backend} is per process but {server.cfg.workers} workers are configured; '
+            'set CACHE_BACKEND/CACHE_LOCATION to a shared cache (e.g. Redis) or GUNICORN_WORKERS=1'
+        )
@@ -51,12 +51,14 @@ LOCAL_APPS = [
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
+    'apps.core.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'apps.core.db_routers.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -93,6 +95,70 @@ DATABASES = {
         'PASSWORD': os.environ.get('DB_PASSWORD', 'webgis_password'),
         'HOST': os.environ.get('DB_HOST', 'localhost'),
         'PORT': os.environ.get('DB_PORT', '5432'),
+        # Keep connections open between requests instead of reconnecting (and
+        # redoing the PostGIS handshake) every time; 0 closes them after each
+        # request. Health checks drop a connection the server has closed
+        # before the next request reuses it.
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': os.environ.get('DB_CONN_HEALTH_CHECKS', 'True') == 'True',
+        'OPTIONS': {
+            'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', '5')),
+            'application_name': os.environ.get('DB_APPLICATION_NAME', 'webgis_backend'),
+        },
+    }
+}
+
+# Set DB_POOLER=pgbouncer when DB_HOST points at PgBouncer in transaction
+# pooling mode. Consecutive transactions may then run on different server
+# connections, so server-side (named) cursors, which outlive a transaction,
+# are turned off. psycopg2 binds parameters client-side and never creates
+# server-side prepared statements, so no further changes are needed. Run
+# ASGI workers with DB_CONN_MAX_AGE=0 behind the pooler: their
+# sync_to_async threads do not reliably close persistent connections.
+# The server's timezone must be UTC (the PostGIS image default) so Django
+# never needs a session-level SET TIME ZONE on connect.
+DB_POOLER = os.environ.get('DB_POOLER', '')
+if DB_POOLER == 'pgbouncer':
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+
+# Read replicas as a comma-separated list of host[:port][/name], e.g.
+# "replica1:5432,replica2:5432" or "localhost:5432/webgis_replica" for a
+# second local database. Each becomes a replica_<n> alias with the primary's
+# credentials; ReplicaRouter sends reads of DATABASE_REPLICA_APPS there.
+DATABASE_REPLICAS = []
+for index, replica in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), start=1):
+    address, _, name = replica.strip().partition('/')
+    host, _, port = address.partition(':')
+    alias = f'replica_{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'NAME': name or DATABASES['default']['NAME'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_REPLICA_APPS = os.environ.get('DB_REPLICA_APPS', 'gis_data,lessons,quizzes').split(',')
+
+# How long a user's reads stay on the primary after they write; keep it above
+# the replicas' usual replication lag
+DATABASE_REPLICA_PIN_SECONDS = int(os.environ.get('DB_REPLICA_PIN_SECONDS', '10'))
+
+DATABASE_ROUTERS = ['apps.core.db_routers.ReplicaRouter']
+
+
+# Cache
+# Local memory by default, which is only correct for a single process.
+# Every multi-process deployment (docker-compose runs web, asgi, grader and
+# progress_merger) must point CACHE_BACKEND/CACHE_LOCATION at the shared
+# Redis cache, e.g. django.core.cache.backends.redis.RedisCache and
+# redis://redis:6379/0, so invalidations, rate limits, single-flight locks,
+# replica pins and /metrics counters are seen by every process.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'webgis-default'),
     }
 }
 
@@ -203,6 +269,96 @@ AI_TUTOR_API_KEY = os.environ.get('AI_TUTOR_API_KEY', '')
 AI_TUTOR_MODEL = os.environ.get('AI_TUTOR_MODEL', 'firlaw')
 AI_TUTOR_PROVIDER_NAME = os.environ.get('AI_TUTOR_PROVIDER_NAME', 'openai-compatible')
 AI_TUTOR_TIMEOUT = int(os.environ.get('AI_TUTOR_TIMEOUT', '30'))
+AI_TUTOR_CONNECT_TIMEOUT = float(os.environ.get('AI_TUTOR_CONNECT_TIMEOUT', '5'))
+# Pooled provider client (per process): keep-alive connections, HTTP/2 when
+# the h2 package is installed, and at most AI_TUTOR_MAX_CONCURRENCY calls in
+# flight; callers wait AI_TUTOR_QUEUE_TIMEOUT seconds for a slot.
+AI_TUTOR_HTTP2 = os.environ.get('AI_TUTOR_HTTP2', 'True') == 'True'
+AI_TUTOR_MAX_CONNECTIONS = int(os.environ.get('AI_TUTOR_MAX_CONNECTIONS', '20'))
+AI_TUTOR_MAX_CONCURRENCY = int(os.environ.get('AI_TUTOR_MAX_CONCURRENCY', '8'))
+AI_TUTOR_QUEUE_TIMEOUT = float(os.environ.get('AI_TUTOR_QUEUE_TIMEOUT', '2'))
+# Retries on 429/5xx and connection errors, with full-jitter backoff (seconds).
+AI_TUTOR_MAX_RETRIES = int(os.environ.get('AI_TUTOR_MAX_RETRIES', '2'))
+AI_TUTOR_RETRY_BACKOFF = float(os.environ.get('AI_TUTOR_RETRY_BACKOFF', '0.5'))
+AI_TUTOR_RETRY_BACKOFF_MAX = float(os.environ.get('AI_TUTOR_RETRY_BACKOFF_MAX', '8'))
+# Circuit breaker: open after N consecutive failed calls, probe again after the timeout.
+AI_TUTOR_CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('AI_TUTOR_CIRCUIT_FAILURE_THRESHOLD', '5'))
+AI_TUTOR_CIRCUIT_RESET_TIMEOUT = float(os.environ.get('AI_TUTOR_CIRCUIT_RESET_TIMEOUT', '30'))
+# Cached tutor answers (seconds), keyed by normalized question + context
+# fingerprint. 0 disables the cache.
+AI_TUTOR_RESPONSE_CACHE_TIMEOUT = int(os.environ.get('AI_TUTOR_RESPONSE_CACHE_TIMEOUT', '3600'))
+# Identical in-flight questions share one provider call: later requests wait
+# up to AI_TUTOR_SINGLE_FLIGHT_WAIT seconds for it, polling the shared cache
+# every AI_TUTOR_SINGLE_FLIGHT_POLL_INTERVAL seconds when it runs in another worker.
+# 0 waits as long as one call can take with the timeouts, retries and backoff
+# above; the cross-worker lock always lasts at least that long.
+AI_TUTOR_SINGLE_FLIGHT_WAIT = float(os.environ.get('AI_TUTOR_SINGLE_FLIGHT_WAIT', '0'))
+AI_TUTOR_SINGLE_FLIGHT_POLL_INTERVAL = float(os.environ.get('AI_TUTOR_SINGLE_FLIGHT_POLL_INTERVAL', '0.1'))
+# Token buckets on the shared cache (requests per minute, burst size) for
+# questions without a cached answer, per user and per classroom, plus a cap
+# on provider calls in flight across all workers. Cached answers are never
+# limited; a question that ends up sharing another request's in-flight call
+# still spends a token. Over-limit requests get a 429 with Retry-After.
+# 0 disables a limit.
+AI_TUTOR_USER_RATE_PER_MINUTE = int(os.environ.get('AI_TUTOR_USER_RATE_PER_MINUTE', '10'))
+AI_TUTOR_USER_BURST = int(os.environ.get('AI_TUTOR_USER_BURST', '5'))
+AI_TUTOR_CLASSROOM_RATE_PER_MINUTE = int(os.environ.get('AI_TUTOR_CLASSROOM_RATE_PER_MINUTE', '120'))
+AI_TUTOR_CLASSROOM_BURST = int(os.environ.get('AI_TUTOR_CLASSROOM_BURST', '40'))
+AI_TUTOR_GLOBAL_MAX_INFLIGHT = int(os.environ.get('AI_TUTOR_GLOBAL_MAX_INFLIGHT', '32'))
+# Cached module/semester summaries used in tutor context (seconds). Dropped
+# whenever a lesson, quiz or lesson layer changes.
+AI_TUTOR_SUMMARY_CACHE_TIMEOUT = int(os.environ.get('AI_TUTOR_SUMMARY_CACHE_TIMEOUT', '86400'))
+# Multi-turn prompts: the last N user/assistant messages (each clipped to
+# AI_TUTOR_HISTORY_MESSAGE_CHARS) are sent verbatim; older turns are folded
+# into a rolling summary of at most AI_TUTOR_HISTORY_SUMMARY_CHARS.
+AI_TUTOR_HISTORY_WINDOW = int(os.environ.get('AI_TUTOR_HISTORY_WINDOW', '6'))
+AI_TUTOR_HISTORY_MESSAGE_CHARS = int(os.environ.get('AI_TUTOR_HISTORY_MESSAGE_CHARS', '800'))
+AI_TUTOR_HISTORY_SUMMARY_CHARS = int(os.environ.get('AI_TUTOR_HISTORY_SUMMARY_CHARS', '1200'))
+
+
+# Quiz deadline feed cache (seconds). Feeds are also invalidated on writes;
+# the timeout only bounds how stale the time-relative fields can get.
+QUIZ_DEADLINE_CACHE_TIMEOUT = int(os.environ.get('QUIZ_DEADLINE_CACHE_TIMEOUT', '300'))
+
+# Quiz answer key cache (seconds). Keys are dropped whenever a quiz,
+# question or answer is saved.
+QUIZ_ANSWER_KEY_CACHE_TIMEOUT = int(os.environ.get('QUIZ_ANSWER_KEY_CACHE_TIMEOUT', '3600'))
+
+# Quiz analytics cache (seconds). Dropped on every new or reviewed submission.
+QUIZ_ANALYTICS_CACHE_TIMEOUT = int(os.environ.get('QUIZ_ANALYTICS_CACHE_TIMEOUT', '3600'))
+
+
+# Lesson bundles: max-age (seconds) for hash-versioned bundle URLs.
+LESSON_BUNDLE_MAX_AGE = int(os.environ.get('LESSON_BUNDLE_MAX_AGE', '31536000'))
+
+# Offline lesson packages: where archives are written and the simplification
+# tolerance (degrees) applied to packaged layer geometries.
+LESSON_PACKAGE_DIR = os.environ.get('LESSON_PACKAGE_DIR', str(MEDIA_ROOT / 'lesson_packages'))
+LESSON_PACKAGE_SIMPLIFY_TOLERANCE = float(os.environ.get('LESSON_PACKAGE_SIMPLIFY_TOLERANCE', '0.001'))
+
+# Lesson progress beacons: lifetime (seconds) of the signed token a beacon
+# carries instead of an Authorization header, and max records per beacon.
+LESSON_PROGRESS_BEACON_TOKEN_MAX_AGE = int(os.environ.get('LESSON_PROGRESS_BEACON_TOKEN_MAX_AGE', '43200'))
+LESSON_PROGRESS_BEACON_MAX_RECORDS = int(os.environ.get('LESSON_PROGRESS_BEACON_MAX_RECORDS', '100'))
+
+
+# Request instrumentation (apps.core.middleware.RequestMetricsMiddleware)
+# Log requests slower than this, or running at least this many SQL queries,
+# together with their most expensive queries
+REQUEST_SLOW_THRESHOLD_MS = int(os.environ.get('REQUEST_SLOW_THRESHOLD_MS', '1000'))
+REQUEST_SLOW_QUERY_COUNT = int(os.environ.get('REQUEST_SLOW_QUERY_COUNT', '50'))
+REQUEST_SLOW_TOP_QUERIES = int(os.environ.get('REQUEST_SLOW_TOP_QUERIES', '5'))
+
+# Add a Server-Timing header (db / app / total) to every response
+REQUEST_SERVER_TIMING = os.environ.get('REQUEST_SERVER_TIMING', 'True') == 'True'
+
+# Seconds each worker buffers metric increments before adding them to the
+# shared cache counters served by /metrics
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', '5'))
+
+# Bearer token the Prometheus scraper must send to /metrics; leave empty to
+# serve it openly (then restrict the path at the reverse proxy)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
 
 
 # Logging Configuration
@@ -15,6 +15,7 @@ DATABASES = {
         'NAME': BASE_DIR.parent / 'db.sqlite3',
     }
 }
+DATABASE_REPLICAS = []
 
 # Remove GeoDjango and gis_data app from installed apps
 INSTALLED_APPS = [
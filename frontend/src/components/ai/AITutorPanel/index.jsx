@@ -154,7 +154,7 @@ const AITutorPanel = ({ isOpen, onClose, context = {}, title = 'AI Tutor', onAss
 
     const loadConversation = async () => {
       try {
-        const data = await aiTutorService.getConversation(conversationId)
+        const data = await aiTutorService.getConversation(conversationId, { include_context: false })
         setMessages(
           (data.messages || [])
             .filter((message) => message.role !== 'system')
@@ -36,6 +36,10 @@ export const ENDPOINTS = {
     LIST: '/lessons/',
     DETAIL: (id) => `/lessons/${id}/`,
     PROGRESS: (id) => `/lessons/${id}/progress/`,
+    PROGRESS_BATCH: '/lessons/progress/batch/',
+    PROGRESS_BEACON: '/lessons/progress/beacon/',
+    PROGRESS_BEACON_TOKEN: '/lessons/progress/beacon-token/',
+    OFFLINE_PACKAGE: (id) => `/lessons/${id}/offline-package/`,
   },
 
   // Quizzes
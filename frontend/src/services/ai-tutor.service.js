@@ -1,28 +1,76 @@
 ﻿import api from './api'
+import { API_BASE_URL } from '@constants'
 
 const endpoints = {
   RESPOND: '/ai-tutor/respond/',
+  RESPOND_STREAM: '/ai-tutor/respond/stream/',
   CONVERSATIONS: '/ai-tutor/conversations/',
   CONVERSATION_DETAIL: (id) => `/ai-tutor/conversations/${id}/`,
   FEEDBACK: (id) => `/ai-tutor/messages/${id}/feedback/`,
 }
 
+const cleanPayload = (payload) =>
+  Object.fromEntries(Object.entries(payload).filter(([, value]) => value !== null && value !== undefined))
+
 const aiTutorService = {
   async respond(payload) {
-    const cleanedPayload = Object.fromEntries(
-      Object.entries(payload).filter(([, value]) => value !== null && value !== undefined)
-    )
-    const response = await api.post(endpoints.RESPOND, cleanedPayload)
+    const response = await api.post(endpoints.RESPOND, cleanPayload(payload))
     return response.data
   },
 
-  async listConversations() {
-    const response = await api.get(endpoints.CONVERSATIONS)
+  // Streams the answer as server-sent events. onToken receives each text
+  // delta; resolves with the final response body (same shape as respond()).
+  async respondStream(payload, { onMeta, onToken, signal } = {}) {
+    const response = await fetch(`${API_BASE_URL}${endpoints.RESPOND_STREAM}`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        Authorization: `Bearer ${localStorage.getItem('access_token')}`,
+      },
+      body: JSON.stringify(cleanPayload(payload)),
+      signal,
+    })
+    if (!response.ok) {
+      const error = await response.json().catch(() => ({}))
+      throw new Error(error.detail || `HTTP ${response.status}`)
+    }
+
+    const reader = response.body.getReader()
+    const decoder = new TextDecoder()
+    let buffer = ''
+    for (;;) {
+      const { value, done } = await reader.read()
+      if (done) break
+      buffer += decoder.decode(value, { stream: true })
+
+      let boundary = buffer.indexOf('\n\n')
+      while (boundary !== -1) {
+        const block = buffer.slice(0, boundary)
+        buffer = buffer.slice(boundary + 2)
+        boundary = buffer.indexOf('\n\n')
+
+        const event = block.match(/^event: (.*)$/m)?.[1]
+        const data = JSON.parse(block.match(/^data: (.*)$/m)?.[1] || '{}')
+        if (event === 'meta') onMeta?.(data)
+        if (event === 'token') onToken?.(data.delta)
+        if (event === 'error') throw new Error(data.detail)
+        if (event === 'done') return data
+      }
+    }
+    throw new Error('AI Tutor stream ended unexpectedly')
+  },
+
+  // Keyset-paginated: { next, previous, results }. Pass { cursor } taken from
+  // the `next` URL to load older conversations.
+  async listConversations(params = {}) {
+    const response = await api.get(endpoints.CONVERSATIONS, { params })
     return response.data
   },
 
-  async getConversation(id) {
-    const response = await api.get(endpoints.CONVERSATION_DETAIL(id))
+  // One page of messages, oldest first. params: { before, after, limit,
+  // include_context } — page back with `before` set to the oldest loaded id.
+  async getConversation(id, params = {}) {
+    const response = await api.get(endpoints.CONVERSATION_DETAIL(id), { params })
     return response.data
   },
 
@@ -1,5 +1,5 @@
 import api from './api'
-import { ENDPOINTS } from '@constants'
+import { API_BASE_URL, ENDPOINTS } from '@constants'
 
 const lessonService = {
   async list(filters = {}) {
@@ -23,6 +23,31 @@ const lessonService = {
     const response = await api.post(ENDPOINTS.LESSONS.PROGRESS(id), payload)
     return response.data
   },
+
+  async saveProgressBatch(events) {
+    const response = await api.post(ENDPOINTS.LESSONS.PROGRESS_BATCH, { events })
+    return response.data
+  },
+
+  async getBeaconToken() {
+    const response = await api.get(ENDPOINTS.LESSONS.PROGRESS_BEACON_TOKEN)
+    return response.data
+  },
+
+  // records: [[classroomId, lessonId, currentStep, progressPercent, status, timestampMs], ...]
+  // Safe to call from pagehide/visibilitychange handlers; returns false if the
+  // browser refused to queue the beacon.
+  sendProgressBeacon(token, records) {
+    const body = new Blob([JSON.stringify({ token, records })], { type: 'text/plain' })
+    return navigator.sendBeacon(`${API_BASE_URL}${ENDPOINTS.LESSONS.PROGRESS_BEACON}`, body)
+  },
+
+  async downloadOfflinePackage(id) {
+    const response = await api.get(ENDPOINTS.LESSONS.OFFLINE_PACKAGE(id), {
+      responseType: 'blob',
+    })
+    return response.data
+  },
 }
 
 export default lessonService
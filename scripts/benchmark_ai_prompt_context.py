@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Compare AI tutor prompt sizes before and after context compaction.
+
+For every seeded grade-10 / HK1 / Cánh Diều lesson, builds the tutor context
+at each lesson step (lesson_explainer mode) plus the module_summary and
+semester_review contexts, and reports the size of the context block as the
+old ``repr`` interpolation and as the compact serializer emits it:
+
+    python scripts/benchmark_ai_prompt_context.py
+    python scripts/benchmark_ai_prompt_context.py --per-lesson
+
+Run it from the project root with DJANGO_SETTINGS_MODULE pointing at a
+database that has been seeded (seed_grade_10_canh_dieu_hk1).
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+
+CURRICULUM = {'grade_level': '10', 'semester': '1', 'textbook_series': 'canh-dieu'}
+
+
+def setup_django():
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.development')
+
+    import django
+    django.setup()
+
+
+def build_payloads():
+    from apps.lessons.models import Lesson
+
+    lessons = Lesson.objects.filter(is_published=True, **CURRICULUM).order_by('module_code', 'id')
+    for lesson in lessons.prefetch_related('steps'):
+        for step_index in range(max(lesson.steps.count(), 1)):
+            yield lesson, 'lesson_explainer', {
+                **CURRICULUM,
+                'module_code': lesson.module_code,
+                'lesson_id': lesson.id,
+                'lesson_step': step_index,
+            }
+
+    for module_code in sorted(set(lessons.values_list('module_code', flat=True))):
+        yield None, 'module_summary', {**CURRICULUM, 'module_code': module_code}
+    yield None, 'semester_review', {**CURRICULUM, 'module_code': ''}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--per-lesson', action='store_true', help='Print one line per lesson')
+    args = parser.parse_args()
+
+    setup_django()
+    from apps.ai_tutor.services import AiTutorContextBuilder, compact_context, estimate_tokens
+
+    builder = AiTutorContextBuilder(user=None)
+    by_mode = {}
+    by_lesson = {}
+    compact_seconds = 0.0
+
+    for lesson, mode, payload in build_payloads():
+        _, _, _, used_context = builder.build(payload)
+        before = str(used_context)
+        started = time.perf_counter()
+        after = compact_context(used_context)
+        compact_seconds += time.perf_counter() - started
+
+        sizes = (len(before), len(after), estimate_tokens(before), estimate_tokens(after))
+        by_mode.setdefault(used_context['mode'], []).append(sizes)
+        if lesson is not None:
+            by_lesson.setdefault(lesson.title, []).append(sizes)
+
+    if not by_mode:
+        print('No seeded grade-10 lessons found; run seed_grade_10_canh_dieu_hk1 first.')
+        return
+
+    if args.per_lesson:
+        print(f'{"lesson":<50} {"steps":>5} {"tokens before":>14} {"tokens after":>13}')
+        for title, rows in by_lesson.items():
+            print(
+                f'{title[:50]:<50} {len(rows):>5} '
+                f'{statistics.mean(r[2] for r in rows):>14.0f} {statistics.mean(r[3] for r in rows):>13.0f}'
+            )
+        print()
+
+    print(f'{"mode":<18} {"prompts":>7} {"chars before":>13} {"chars after":>12} '
+          f'{"tokens before":>14} {"tokens after":>13} {"saved":>7}')
+    all_rows = []
+    for mode, rows in sorted(by_mode.items()):
+        all_rows.extend(rows)
+        tokens_before = statistics.mean(r[2] for r in rows)
+        tokens_after = statistics.mean(r[3] for r in rows)
+        print(
+            f'{mode:<18} {len(rows):>7} {statistics.mean(r[0] for r in rows):>13.0f} '
+            f'{statistics.mean(r[1] for r in rows):>12.0f} {tokens_before:>14.0f} {tokens_after:>13.0f} '
+            f'{1 - tokens_after / tokens_before:>7.0%}'
+        )
+
+    total_before = sum(r[2] for r in all_rows)
+    total_after = sum(r[3] for r in all_rows)
+    print(f'\nTotal estimated context tokens: {total_before} -> {total_after} '
+          f'({1 - total_after / total_before:.0%} fewer) over {len(all_rows)} prompts')
+    print(f'Compaction time: {compact_seconds / len(all_rows) * 1000:.3f} ms per prompt')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Measure request latency with and without persistent database connections.
+
+Runs the layer list view in-process through the full request lifecycle
+(request_started / request_finished signals, which is where Django opens and
+closes connections) once per CONN_MAX_AGE value and reports latency
+percentiles and how many connections were opened:
+
+    python scripts/benchmark_db_connections.py
+    python scripts/benchmark_db_connections.py --conn-max-age 0 60 --requests 500
+
+    # Through PgBouncer (docker compose up pgbouncer)
+    DB_HOST=localhost DB_PORT=6432 DB_POOLER=pgbouncer \\
+        python scripts/benchmark_db_connections.py --conn-max-age 0 60
+
+Run it from the project root with DJANGO_SETTINGS_MODULE pointing at the
+target database.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+
+def setup_django():
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.development')
+
+    import django
+    django.setup()
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_requests(view, count, conn_max_age):
+    """Return (latencies in ms, connections opened) for ``count`` requests."""
+    from django.core.signals import request_finished, request_started
+    from django.db import connection
+    from django.db.backends.signals import connection_created
+    from rest_framework.test import APIRequestFactory
+
+    factory = APIRequestFactory()
+    connection.close()
+    connection.settings_dict['CONN_MAX_AGE'] = conn_max_age
+
+    opened = []
+
+    def count_connection(sender, **kwargs):
+        opened.append(sender)
+
+    connection_created.connect(count_connection)
+    latencies = []
+    try:
+        for _ in range(count):
+            started = time.perf_counter()
+            request_started.send(sender=__name__)
+            response = view(factory.get('/api/v1/layers/'))
+            response.render()
+            request_finished.send(sender=__name__)
+            latencies.append((time.perf_counter() - started) * 1000)
+    finally:
+        connection_created.disconnect(count_connection)
+        connection.close()
+
+    return latencies, len(opened)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--conn-max-age', type=int, nargs='+', default=[0, 60],
+                        help='CONN_MAX_AGE values to compare (0 = reconnect every request)')
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--warmup', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from apps.gis_data.simple_views import SimpleLayerViewSet
+
+    database = settings.DATABASES['default']
+    print(f'Database {database["HOST"]}:{database["PORT"]}/{database["NAME"]} '
+          f'pooler={settings.DB_POOLER or "none"} health_checks={database["CONN_HEALTH_CHECKS"]}')
+
+    view = SimpleLayerViewSet.as_view({'get': 'list'})
+    print(f'{"CONN_MAX_AGE":>12} {"requests":>8} {"connections":>11} {"mean ms":>8} '
+          f'{"p50 ms":>7} {"p95 ms":>7} {"p99 ms":>7}')
+    for conn_max_age in args.conn_max_age:
+        run_requests(view, args.warmup, conn_max_age)
+        latencies, opened = run_requests(view, args.requests, conn_max_age)
+        print(
+            f'{conn_max_age:>12} {len(latencies):>8} {opened:>11} {statistics.mean(latencies):>8.2f} '
+            f'{statistics.median(latencies):>7.2f} {percentile(latencies, 0.95):>7.2f} '
+            f'{percentile(latencies, 0.99):>7.2f}'
+        )
+
+
+if __name__ == '__main__':
+    main()
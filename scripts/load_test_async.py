@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Compare how many concurrent I/O-bound requests the WSGI and ASGI deployments
+sustain.
+
+Fires the same request mix at both servers with a fixed number of requests
+in flight and reports throughput, latency percentiles and errors. The WSGI
+target is the sync endpoint, the ASGI target its async twin:
+
+    layers    GET  layers/<id>/features/        vs  layers/<id>/features/async/
+    tutor     POST ai-tutor/respond/            vs  ai-tutor/respond/async/
+
+    python scripts/load_test_async.py --scenario layers --layer-id 1
+    python scripts/load_test_async.py --scenario tutor --token <access token> --concurrency 64
+
+Start both deployments first (docker compose up web asgi, or run gunicorn
+with config/gunicorn.conf.py twice: GUNICORN_WORKER_CLASS=gthread for
+config.wsgi:application and the default uvicorn worker for
+config.asgi:application) with the same worker count. For the tutor scenario
+every request asks a distinct question so the response cache does not hide
+the provider latency; set AI_TUTOR_USER_RATE_PER_MINUTE=0 on both servers,
+otherwise the per-user rate limit answers most requests with 429.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def build_request(args, deployment, index):
+    """Return (method, path, json body) for request ``index`` against one deployment."""
+    suffix = 'async/' if deployment == 'asgi' else ''
+    if args.scenario == 'layers':
+        return 'GET', f'layers/{args.layer_id}/features/{suffix}', None
+    return 'POST', f'ai-tutor/respond/{suffix}', {
+        'message': f'Hãy giải thích ngắn gọn về khí hậu Việt Nam (lần {index})',
+        'grade_level': '10',
+        'semester': '1',
+        'textbook_series': 'canh-dieu',
+    }
+
+
+async def run_load(args, deployment, base_url):
+    headers = {'Authorization': f'Bearer {args.token}'} if args.token else {}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = []
+    next_index = iter(range(args.requests))
+
+    async with httpx.AsyncClient(base_url=f'{base_url.rstrip("/")}/', headers=headers,
+                                 limits=limits, timeout=args.timeout) as client:
+        async def worker():
+            for index in next_index:
+                method, path, body = build_request(args, deployment, index)
+                started = time.perf_counter()
+                try:
+                    response = await client.request(method, path, json=body)
+                    await response.aread()
+                    status_code = response.status_code
+                except httpx.HTTPError as exc:
+                    status_code = type(exc).__name__
+                results.append((status_code, time.perf_counter() - started))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        wall_seconds = time.perf_counter() - started
+
+    return wall_seconds, results
+
+
+def report(deployment, base_url, wall_seconds, results):
+    latencies = [latency * 1000 for status_code, latency in results if status_code == 200]
+    status_counts = {}
+    for status_code, _ in results:
+        status_counts[status_code] = status_counts.get(status_code, 0) + 1
+
+    print(f'{deployment.upper()} {base_url}')
+    print(f'  requests: {len(results)}  wall time: {wall_seconds:.2f}s  '
+          f'throughput: {len(latencies) / wall_seconds:.1f} ok req/s')
+    print(f'  status codes: {status_counts}')
+    if latencies:
+        print(
+            '  latency ms: '
+            f'p50={statistics.median(latencies):.0f} p95={percentile(latencies, 0.95):.0f} '
+            f'p99={percentile(latencies, 0.99):.0f} max={max(latencies):.0f}'
+        )
+    return len(latencies) / wall_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--wsgi-url', default='http://localhost:8080/api/v1')
+    parser.add_argument('--asgi-url', default='http://localhost:8081/api/v1')
+    parser.add_argument('--scenario', choices=['layers', 'tutor'], default='layers')
+    parser.add_argument('--layer-id', type=int, default=1)
+    parser.add_argument('--token', help='JWT access token (required by the tutor scenario)')
+    parser.add_argument('--concurrency', type=int, default=32, help='Requests kept in flight')
+    parser.add_argument('--requests', type=int, default=500, help='Requests per deployment')
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('--only', choices=['wsgi', 'asgi'], help='Test a single deployment')
+    args = parser.parse_args()
+
+    if args.scenario == 'tutor' and not args.token:
+        parser.error('--token is required for the tutor scenario')
+
+    targets = [('wsgi', args.wsgi_url), ('asgi', args.asgi_url)]
+    throughput = {}
+    for deployment, base_url in targets:
+        if args.only and deployment != args.only:
+            continue
+        wall_seconds, results = asyncio.run(run_load(args, deployment, base_url))
+        throughput[deployment] = report(deployment, base_url, wall_seconds, results)
+
+    if throughput.get('wsgi') and throughput.get('asgi'):
+        print(f'\nASGI / WSGI throughput at concurrency {args.concurrency}: '
+              f'{throughput["asgi"] / throughput["wsgi"]:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
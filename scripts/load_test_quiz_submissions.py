@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Load test for quiz submissions at exam-time bursts.
+
+Simulates a class pressing "submit" at the same moment: every simulated
+student logs in first, then all threads are released together by a barrier
+and POST their answers. Compare the synchronous endpoint with the buffered
+one:
+
+    python scripts/load_test_quiz_submissions.py --quiz-id 1 --setup
+    python scripts/load_test_quiz_submissions.py --quiz-id 1 --mode sync
+    python scripts/load_test_quiz_submissions.py --quiz-id 1 --mode buffered --wait-graded
+
+Buffered mode needs a grader running (python manage.py grade_quiz_submissions --loop)
+for --wait-graded to finish.
+
+--setup creates the student accounts through the Django ORM, so run it from the
+project root with DJANGO_SETTINGS_MODULE pointing at the target database.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+
+def student_email(index):
+    return f'loadtest-student-{index:03d}@example.com'
+
+
+def setup_students(count, password):
+    """Create (or reset) the simulated student accounts."""
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.development')
+
+    import django
+    django.setup()
+    from django.contrib.auth import get_user_model
+
+    User = get_user_model()
+    for index in range(count):
+        user, _ = User.objects.get_or_create(email=student_email(index), defaults={'role': 'student'})
+        user.set_password(password)
+        user.save()
+    print(f'Prepared {count} student accounts')
+
+
+def request_json(method, url, payload=None, token=None, timeout=60):
+    """Send a JSON request and return (status_code, body)."""
+    data = json.dumps(payload).encode('utf-8') if payload is not None else None
+    request = urllib.request.Request(url, data=data, method=method)
+    request.add_header('Content-Type', 'application/json')
+    if token:
+        request.add_header('Authorization', f'Bearer {token}')
+
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            body = response.read()
+            return response.status, json.loads(body) if body else None
+    except urllib.error.HTTPError as exc:
+        body = exc.read()
+        try:
+            return exc.code, json.loads(body) if body else None
+        except ValueError:
+            return exc.code, None
+
+
+def login(base_url, index, password):
+    status_code, body = request_json('POST', f'{base_url}/auth/token/', {
+        'email': student_email(index),
+        'password': password,
+    })
+    if status_code != 200:
+        raise RuntimeError(f'Login failed for {student_email(index)}: {status_code} {body}')
+    return body['access']
+
+
+def build_answers(base_url, quiz_id, token):
+    """Pick the first answer of every question."""
+    status_code, quiz = request_json('GET', f'{base_url}/quizzes/{quiz_id}/', token=token)
+    if status_code != 200:
+        raise RuntimeError(f'Could not load quiz {quiz_id}: {status_code} {quiz}')
+    return {str(question['id']): str(question['answers'][0]['id']) for question in quiz['questions']}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://localhost:8080/api/v1')
+    parser.add_argument('--quiz-id', type=int, required=True)
+    parser.add_argument('--students', type=int, default=200)
+    parser.add_argument('--password', default='loadtest123')
+    parser.add_argument('--mode', choices=['sync', 'buffered'], default='buffered')
+    parser.add_argument('--setup', action='store_true', help='Create the student accounts and exit')
+    parser.add_argument('--wait-graded', action='store_true', help='Poll buffered submissions until graded')
+    args = parser.parse_args()
+
+    if args.setup:
+        setup_students(args.students, args.password)
+        return
+
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        tokens = list(pool.map(lambda index: login(args.base_url, index, args.password), range(args.students)))
+    answers = build_answers(args.base_url, args.quiz_id, tokens[0])
+    print(f'Logged in {len(tokens)} students, quiz {args.quiz_id} has {len(answers)} questions')
+
+    path = 'quizzes/quiz_submissions/buffered/' if args.mode == 'buffered' else 'quizzes/quiz_submissions/'
+    url = f'{args.base_url}/{path}'
+    barrier = threading.Barrier(args.students)
+    results = [None] * args.students
+
+    def submit(index):
+        barrier.wait()
+        started = time.perf_counter()
+        status_code, body = request_json('POST', url, {'quiz_id': args.quiz_id, 'answers': answers}, token=tokens[index])
+        results[index] = (status_code, time.perf_counter() - started, body)
+
+    threads = [threading.Thread(target=submit, args=(index,)) for index in range(args.students)]
+    burst_started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    burst_seconds = time.perf_counter() - burst_started
+
+    latencies = [latency * 1000 for _, latency, _ in results]
+    status_counts = {}
+    for status_code, _, _ in results:
+        status_counts[status_code] = status_counts.get(status_code, 0) + 1
+
+    print(f'Mode: {args.mode}  submitters: {args.students}  wall time: {burst_seconds:.2f}s')
+    print(f'Status codes: {status_counts}')
+    print(
+        'Latency ms: '
+        f'min={min(latencies):.0f} p50={statistics.median(latencies):.0f} '
+        f'p95={percentile(latencies, 0.95):.0f} p99={percentile(latencies, 0.99):.0f} max={max(latencies):.0f}'
+    )
+
+    if args.mode == 'buffered' and args.wait_graded:
+        pending = {
+            index: body['status_url']
+            for index, (status_code, _, body) in enumerate(results)
+            if status_code == 202
+        }
+        host = args.base_url.split('/api/', 1)[0]
+        while pending:
+            for index, status_url in list(pending.items()):
+                _, body = request_json('GET', f'{host}{status_url}', token=tokens[index])
+                if body and body.get('status') != 'pending':
+                    pending.pop(index)
+            if pending:
+                time.sleep(0.5)
+        print(f'All buffered submissions processed {time.perf_counter() - burst_started:.2f}s after the burst')
+
+
+if __name__ == '__main__':
+    main()